@@ -0,0 +1,327 @@
+"""
+Command line entry point for running the AFM analyses without the GUI.
+
+Examples:
+    python -m afm chainfit --files "exports/*-VFB-*.tsv" --output results --breaking-forces --histograms
+    python -m afm general --config general.json --workers 8
+    python -m afm sweep --files "exports/*.tsv" --max-residual-rms 15 20 25 --min-contour-length 200 300
+    python -m afm chainfit --files "exports/*.tsv" --output results --breaking-forces --histograms --watch 60
+    python -m afm chainfit --files "exports/*.tsv" --output results --breaking-forces --fitting-segments --backend polars
+    python -m afm refit --files "curves/*.tsv" --output exports --model wlc --workers 8
+    python -m afm uvvis --files "uv_vis/*.xlsm" --output results --peak MB 630 700 --ratio 664 610 --cache-dir .afm_cache
+
+Options can also be given in a JSON config file whose keys are the option names (ex. {"max_bending_length": 4000}). Options given on the command line take precedence over the config file.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import multiprocessing
+import profiling
+import writer
+
+
+def expand_files(patterns):
+    """
+    This function expands glob patterns into a sorted list of files, without duplicates.
+
+    Parameters:
+    patterns (list): The list of file names or glob patterns. ** matches any number of directories.
+
+    Returns:
+    files (list): The list of files.
+    """
+
+    files = []
+    seen = set()
+
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+
+        for file in matches:
+            if file not in seen:
+                seen.add(file)
+                files.append(file)
+
+    return files
+
+
+def create_parser():
+    parser = argparse.ArgumentParser(prog="afm", description="Analyse JPK force spectroscopy exports.")
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--config", help="JSON file with default values for the options.")
+    common.add_argument("--files", nargs="+", help="Files or glob patterns to analyse (quote patterns to avoid shell limits).")
+    common.add_argument("--output", help="Output directory. Defaults to the current directory.")
+    common.add_argument("--workers", type=int, help="Number of worker processes used to read the files.")
+    common.add_argument("--cache-dir", help="Cache parsed files in this directory.")
+    common.add_argument("--clear-cache", action="store_true", default=None, help="Remove every file from the --cache-dir cache before running, so every file is parsed again.")
+    common.add_argument("--profile", metavar="JSON", help="Record the time, rows and peak memory of each stage, print a summary and save the details to this JSON file.")
+    common.add_argument("--quiet", action="store_true", default=None, help="Only print errors.")
+
+    # Options of the analyses that filter the files and save the filtered data and compiled parameters
+    filtered = argparse.ArgumentParser(add_help=False)
+    filtered.add_argument("--stream", action="store_true", default=None, help="Read the files in chunks to bound memory use.")
+    filtered.add_argument("--save-filtered", action="store_true", default=None, help="Save the filtered data.")
+    filtered.add_argument("--output-format", choices=list(writer.FORMATS), help="Format of the saved filtered data (default csv). partitioned writes one Parquet dataset partitioned by sample.")
+    filtered.add_argument("--long-format", action="store_true", default=None, help="Save compiled parameters as Sample, Region, Parameter, Value rows instead of one column per file.")
+
+    # Options of the analyses whose per-file results can be stored
+    watched = argparse.ArgumentParser(add_help=False)
+    watched.add_argument("--incremental", action="store_true", default=None, help="Keep per-file results in the output directory and only analyse new or changed files.")
+    watched.add_argument("--watch", type=float, metavar="SECONDS", help="Run again every SECONDS, picking up new files matching the patterns (implies --incremental).")
+
+    # Options of the analyses that can run on another dataframe library
+    backends = argparse.ArgumentParser(add_help=False)
+    backends.add_argument("--backend", choices=["pandas", "polars"], help="Dataframe library the analysis runs on (default pandas). polars reads every file in one multithreaded query and must be installed separately.")
+
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+
+    chain_fit = subparsers.add_parser("chainfit", parents=[common, filtered, watched, backends], help="Analyse chain fit exports.")
+    chain_fit.add_argument("--max-bending-length", type=float, help="Maximum bending length [pm] (default 4000).")
+    chain_fit.add_argument("--min-bending-length", type=float, help="Minimum bending length [pm] (default 20).")
+    chain_fit.add_argument("--max-contour-length", type=float, help="Maximum contour length [nm] (default 5000).")
+    chain_fit.add_argument("--min-contour-length", type=float, help="Minimum contour length [nm] (default 300).")
+    chain_fit.add_argument("--max-residual-rms", type=float, help="Maximum residual RMS [pN] (default 25).")
+    chain_fit.add_argument("--no-filter", action="store_true", default=None, help="Do not filter the data.")
+    chain_fit.add_argument("--breaking-forces", action="store_true", default=None, help="Save breaking_forces.csv.")
+    chain_fit.add_argument("--histograms", action="store_true", default=None, help="Save the breaking forces histograms.")
+    chain_fit.add_argument("--x-axis-upper-bound", type=float, help="Upper bound of the histogram x-axis (default 500).")
+    chain_fit.add_argument("--fitting-segments", action="store_true", default=None, help="Save count_num_fitting_segments.csv.")
+    chain_fit.add_argument("--pie-charts", action="store_true", default=None, help="Save the fitting segments pie charts.")
+    chain_fit.add_argument("--contour-length-differences", action="store_true", default=None, help="Save the contour length differences.")
+    chain_fit.add_argument("--skip-unchanged-graphs", action="store_true", default=None, help="Do not redraw graphs whose data has not changed.")
+
+    general = subparsers.add_parser("general", parents=[common, filtered, watched, backends], help="Analyse general exports.")
+    general.add_argument("--min-position-threshold", type=float, help="Minimum position threshold [nm] (default 300).")
+    general.add_argument("--interaction-count", action="store_true", default=None, help="Save interaction_count.csv.")
+    general.add_argument("--area-adhesion", action="store_true", default=None, help="Save area_adhesion.csv.")
+
+    sweep = subparsers.add_parser("sweep", parents=[common], help="Evaluate a grid of chain fit filter thresholds.")
+    sweep.add_argument("--max-bending-length", type=float, nargs="+", help="Maximum bending lengths [pm] to try (default 4000).")
+    sweep.add_argument("--min-bending-length", type=float, nargs="+", help="Minimum bending lengths [pm] to try (default 20).")
+    sweep.add_argument("--max-contour-length", type=float, nargs="+", help="Maximum contour lengths [nm] to try (default 5000).")
+    sweep.add_argument("--min-contour-length", type=float, nargs="+", help="Minimum contour lengths [nm] to try (default 300).")
+    sweep.add_argument("--max-residual-rms", type=float, nargs="+", help="Maximum residual RMS values [pN] to try (default 25).")
+    sweep.add_argument("--by-file", action="store_true", default=None, help="Summarise each file separately.")
+
+    refit = subparsers.add_parser("refit", parents=[common], help="Fit a chain model to force curve segments and save chain fit exports.")
+    refit.add_argument("--model", choices=["wlc", "fjc"], help="Worm-like chain or freely jointed chain (default wlc).")
+    refit.add_argument("--temperature", type=float, help="Temperature [K] (default 298.15).")
+
+    uv_vis = subparsers.add_parser("uvvis", parents=[common], help="Summarise the UV-Vis spectra of plate reader workbooks.")
+    uv_vis.add_argument("--sheet", help="Sheet holding the spectra (default the first sheet).")
+    uv_vis.add_argument("--baseline", type=float, nargs=2, action="append", metavar=("START", "STOP"), help="Baseline window [nm], repeat for a linear baseline (default 750 800).")
+    uv_vis.add_argument("--peak", nargs=3, action="append", metavar=("NAME", "START", "STOP"), help="Named wavelength range [nm] searched for a peak, can be repeated (default Ag 380 480 and MB 630 700).")
+    uv_vis.add_argument("--ratio", type=float, nargs=2, action="append", metavar=("NUMERATOR", "DENOMINATOR"), help="Wavelengths [nm] of an absorbance ratio, can be repeated (default 664 610).")
+
+    return parser
+
+
+DEFAULTS = {
+    "output": ".",
+    "workers": 1,
+    "max_bending_length": 4000,
+    "min_bending_length": 20,
+    "max_contour_length": 5000,
+    "min_contour_length": 300,
+    "max_residual_rms": 25,
+    "x_axis_upper_bound": 500,
+    "min_position_threshold": 300,
+    "output_format": "csv",
+    "backend": "pandas",
+    "model": "wlc",
+}
+
+
+def load_options(args):
+    """
+    This function combines the defaults, the config file and the command line options, in increasing order of precedence.
+
+    Parameters:
+    args (argparse.Namespace): The parsed command line options.
+
+    Returns:
+    options (dict): The combined options.
+    """
+
+    options = dict(DEFAULTS)
+
+    if args.config:
+        with open(args.config) as config_file:
+            options.update({key.replace("-", "_"): value for key, value in json.load(config_file).items()})
+
+    options.update({key: value for key, value in vars(args).items() if value is not None})
+
+    if isinstance(options.get("files"), str):
+        options["files"] = [options["files"]]
+
+    return options
+
+
+def main(argv=None):
+    args = create_parser().parse_args(argv)
+    options = load_options(args)
+
+    files = expand_files(options.get("files") or [])
+
+    if len(files) == 0:
+        print("Error: no files selected.", file=sys.stderr)
+        return 1
+
+    # Cleared once, so watched runs keep caching the files between runs
+    if options.get("clear_cache") and options.get("cache_dir"):
+        import cache
+        cache.ParsedFileCache(options["cache_dir"]).clear()
+
+    if not options.get("watch"):
+        return run(args.mode, files, options)
+
+    # The patterns are expanded again before each run so new exports are picked up
+    options["incremental"] = True
+
+    try:
+        while True:
+            run(args.mode, files, options)
+            time.sleep(options["watch"])
+            files = expand_files(options["files"])
+    except KeyboardInterrupt:
+        return 0
+
+
+def run(mode, files, options):
+    """
+    This function runs one analysis with the combined options.
+
+    Parameters:
+    mode (str): The analysis mode (chainfit, general, sweep, refit or uvvis).
+    files (list): The list of files to analyse.
+    options (dict): The combined options.
+
+    Returns:
+    (int): The exit status.
+    """
+
+    # Imported here so --help stays fast
+    import pipeline
+
+    parsed_file_cache = None
+
+    if options.get("cache_dir"):
+        import cache
+        parsed_file_cache = cache.ParsedFileCache(options["cache_dir"])
+
+    if options.get("profile"):
+        profiling.reset()
+        profiling.enable()
+
+    completed = 0
+
+    def progress(file):
+        nonlocal completed
+        completed += 1
+        if not options.get("quiet"):
+            print(f"[{completed}/{len(files)}] {os.path.basename(file)}", file=sys.stderr)
+
+    def status(message):
+        if not options.get("quiet"):
+            print(message, file=sys.stderr)
+
+    if mode == "chainfit":
+        pipeline.run_chain_fit(
+            files,
+            options["output"],
+            options["max_bending_length"],
+            options["min_bending_length"],
+            options["max_contour_length"],
+            options["min_contour_length"],
+            options["max_residual_rms"],
+            x_axis_upper_bound=options["x_axis_upper_bound"],
+            workers=options["workers"],
+            parsed_file_cache=parsed_file_cache,
+            backend=options["backend"],
+            incremental=options.get("incremental", False),
+            apply_filter=not options.get("no_filter", False),
+            stream_files=options.get("stream", False),
+            save_filtered_data=options.get("save_filtered", False),
+            output_format=options["output_format"],
+            save_breaking_forces=options.get("breaking_forces", False),
+            save_breaking_forces_histograms=options.get("histograms", False),
+            save_count_num_fitting_segments=options.get("fitting_segments", False),
+            save_fitting_segment_pie_charts=options.get("pie_charts", False),
+            save_contour_length_differences=options.get("contour_length_differences", False),
+            skip_unchanged_graphs=options.get("skip_unchanged_graphs", False),
+            tidy_tables=options.get("long_format", False),
+            progress=progress,
+            status=status,
+        )
+    elif mode == "sweep":
+        pipeline.run_sweep(
+            files,
+            options["output"],
+            options["max_bending_length"],
+            options["min_bending_length"],
+            options["max_contour_length"],
+            options["min_contour_length"],
+            options["max_residual_rms"],
+            by_file=options.get("by_file", False),
+            workers=options["workers"],
+            parsed_file_cache=parsed_file_cache,
+            progress=progress,
+            status=status,
+        )
+    elif mode == "refit":
+        pipeline.run_refit(
+            files,
+            options["output"],
+            model=options["model"],
+            temperature=options.get("temperature"),
+            workers=options["workers"],
+            progress=progress,
+            status=status,
+        )
+    elif mode == "uvvis":
+        pipeline.run_uv_vis(
+            files,
+            options["output"],
+            workers=options["workers"],
+            parsed_file_cache=parsed_file_cache,
+            sheet=options.get("sheet"),
+            baseline_windows=options.get("baseline"),
+            peak_ranges=None if options.get("peak") is None else {name: (float(start), float(stop)) for name, start, stop in options["peak"]},
+            ratios=options.get("ratio"),
+            progress=progress,
+            status=status,
+        )
+    else:
+        pipeline.run_general(
+            files,
+            options["output"],
+            options["min_position_threshold"],
+            workers=options["workers"],
+            parsed_file_cache=parsed_file_cache,
+            backend=options["backend"],
+            incremental=options.get("incremental", False),
+            stream_files=options.get("stream", False),
+            save_filtered_data=options.get("save_filtered", False),
+            output_format=options["output_format"],
+            save_interaction_count=options.get("interaction_count", False),
+            save_area_adhesion=options.get("area_adhesion", False),
+            tidy_tables=options.get("long_format", False),
+            progress=progress,
+            status=status,
+        )
+
+    if options.get("profile"):
+        profiling.disable()
+        profiling.dump_json(options["profile"])
+        status(profiling.format_report())
+
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,589 @@
+"""
+Benchmarks of the analysis and graph functions on synthetic JPK exports.
+
+Examples:
+    python benchmark.py run --scenario small many_files
+    python benchmark.py run --scenario large --repeat 1
+    python benchmark.py compare 0a36a70 HEAD
+    python benchmark.py fitting-segments
+    python benchmark.py refit --segments 10000 100000 --workers 4
+    python benchmark.py backends --scenario small many_files
+    python benchmark.py startup
+    python benchmark.py units --rows 1000000
+
+Each run appends its timings to benchmark_results.jsonl together with the git commit it was run on, so the timings of two commits can be compared. The synthetic exports are generated once per scenario and kept in the data directory.
+"""
+import argparse
+import datetime
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import data_analysis as da
+
+# Scenarios of the format (number of files, rows per file)
+SCENARIOS = {
+    "small": (1, 1_000),
+    "medium": (10, 100_000),
+    "many_files": (1000, 1_000),
+    "large": (1, 10_000_000),
+}
+
+REGIONS = ["M", "E", "CD"]
+
+DEFAULT_RESULTS = Path(__file__).with_name("benchmark_results.jsonl")
+DEFAULT_DATA_DIRECTORY = Path(tempfile.gettempdir()) / "afm_benchmark_data"
+
+# Graphs are drawn from the first files only, since drawing every date of a large scenario would take hours
+DEFAULT_MAX_GRAPH_FILES = 6
+
+
+def export_file_name(i, kind):
+    """
+    This function returns the name of the i-th synthetic export. Consecutive files cycle through the root regions, so every three files form one sample date.
+
+    Parameters:
+    i (int): The number of the file.
+    kind (str): The type of export (chain_fit or general).
+
+    Returns:
+    name (str): The file name (ex. 20240001-VFB-M.tsv).
+    """
+
+    date = 20240000 + i // len(REGIONS)
+    region = REGIONS[i % len(REGIONS)]
+
+    if kind == "chain_fit":
+        return f"{date}-VFB-{region}.tsv"
+
+    return f"{date}-G-{region}.txt"
+
+
+def create_chain_fit_export(rows, rng, segments_per_curve=4):
+    """
+    This function creates a synthetic chain fit export with the columns and SI units of a JPK export.
+
+    Parameters:
+    rows (int): The number of fitted segments.
+    rng (numpy.random.Generator): The random number generator.
+    segments_per_curve (int): The average number of fitted segments of a curve.
+
+    Returns:
+    df (pandas.DataFrame): The export.
+    """
+
+    num_curves = max(rows // segments_per_curve, 1)
+    curves = np.sort(rng.integers(0, num_curves, rows))
+
+    # Segments are numbered within their curve
+    starts = np.searchsorted(curves, curves, side="left")
+
+    return pd.DataFrame({
+        "Filename": pd.Categorical.from_codes(curves, [f"force-save-{i}.jpk-force" for i in range(num_curves)]),
+        "Index": np.arange(rows) - starts,
+        "Bending Length [m]": rng.uniform(0, 5e-9, rows),
+        "Contour Length [m]": rng.uniform(0, 6e-6, rows),
+        "Residual RMS [N]": rng.uniform(0, 40e-12, rows),
+        "Breaking Force [N]": rng.uniform(0, 600e-12, rows),
+        "Fit Start [m]": rng.uniform(0, 1e-6, rows),
+    })
+
+
+def create_general_export(rows, rng):
+    """
+    This function creates a synthetic general export with the columns and SI units of a JPK export.
+
+    Parameters:
+    rows (int): The number of force curves.
+    rng (numpy.random.Generator): The random number generator.
+
+    Returns:
+    df (pandas.DataFrame): The export.
+    """
+
+    return pd.DataFrame({
+        "Filename": [f"force-save-{i}.jpk-force" for i in range(rows)],
+        "Adhesion [N]": rng.uniform(0, 1e-10, rows),
+        "Area [J]": rng.uniform(0, 1e-17, rows),
+        "Minimum Position [m]": rng.uniform(0, 1e-6, rows),
+        "Fitted Segment Count": rng.integers(0, 8, rows),
+        "Baseline Offset [N]": rng.normal(0, 1e-12, rows),
+    })
+
+
+def create_dataset(directory, kind, num_files, rows_per_file, seed=0):
+    """
+    This function writes a synthetic dataset of tab separated exports, unless it has already been written.
+
+    Parameters:
+    directory (str): The directory to write the dataset in.
+    kind (str): The type of export (chain_fit or general).
+    num_files (int): The number of files.
+    rows_per_file (int): The number of rows of each file.
+    seed (int): The seed of the random number generator.
+
+    Returns:
+    files (list): The list of files of the dataset.
+    """
+
+    directory = Path(directory) / f"{kind}-{num_files}x{rows_per_file}-{seed}"
+    directory.mkdir(parents=True, exist_ok=True)
+
+    rng = np.random.default_rng(seed)
+    create_export = create_chain_fit_export if kind == "chain_fit" else create_general_export
+
+    files = []
+
+    for i in range(num_files):
+        file = directory / export_file_name(i, kind)
+
+        if not file.exists():
+            # Written under a temporary name so an interrupted run does not leave a truncated file behind
+            temporary_file = file.with_name(f"{file.name}.tmp")
+            create_export(rows_per_file, rng).to_csv(temporary_file, sep="\t", index=False, float_format="%.6e")
+            os.replace(temporary_file, file)
+
+        files.append(str(file))
+
+    return files
+
+
+def create_filtered_data(num_files, rows_per_file=2000, curves_per_file=500, seed=0):
+    """
+    This function creates synthetic filtered chain fit data with a Filename column, as returned by analyse_chain_fit.
+
+    Parameters:
+    num_files (int): The number of files.
+    rows_per_file (int): The number of fitted segments in each file.
+    curves_per_file (int): The number of force curves in each file.
+    seed (int): The seed of the random number generator.
+
+    Returns:
+    filtered_data (list): The list of filtered data of the format (dataframe, file).
+    """
+
+    rng = np.random.default_rng(seed)
+    curve_names = np.array([f"force-save-{i}.jpk-force" for i in range(curves_per_file)])
+
+    filtered_data = []
+
+    for i in range(num_files):
+        df = pd.DataFrame({"Filename": pd.Categorical(rng.choice(curve_names, rows_per_file))})
+        filtered_data.append((df, f"{20240000 + i}-VFB-M.tsv"))
+
+    return filtered_data
+
+
+def time_function(function, *args, repeat=3, **kwargs):
+    """
+    This function returns the best wall time of several calls of a function [s].
+    """
+
+    best = float("inf")
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def benchmark_scenario(name, data_directory=DEFAULT_DATA_DIRECTORY, repeat=3, workers=1, max_graph_files=DEFAULT_MAX_GRAPH_FILES):
+    """
+    This function times the analysis and graph functions on the synthetic datasets of a scenario.
+
+    Parameters:
+    name (str): The name of the scenario, a key of SCENARIOS.
+    data_directory (str): The directory the synthetic datasets are kept in.
+    repeat (int): The number of calls of each function. The best time is kept.
+    workers (int): The number of worker processes used to read the files.
+    max_graph_files (int): The number of files the graphs are drawn from. Use a multiple of three so every date has all root regions.
+
+    Returns:
+    results (list): One dictionary per function with the scenario, the function, the number of files and rows and the best time [s].
+    """
+
+    import graph
+
+    num_files, rows_per_file = SCENARIOS[name]
+    results = []
+
+    def record(function_name, seconds, files=num_files):
+        results.append({"scenario": name, "function": function_name, "files": files, "rows": files * rows_per_file, "seconds": seconds})
+        print(f"{name:>12} {function_name:<32} {seconds:10.4f} s", file=sys.stderr)
+
+    chain_fit_files = create_dataset(data_directory, "chain_fit", num_files, rows_per_file)
+    general_files = create_dataset(data_directory, "general", num_files, rows_per_file)
+
+    thresholds = (4000, 20, 5000, 300, 25)
+
+    record("analyse_chain_fit", time_function(da.analyse_chain_fit, chain_fit_files, *thresholds, workers=workers, repeat=repeat))
+    record("analyse_general", time_function(da.analyse_general, general_files, 300, workers=workers, repeat=repeat))
+
+    filtered_data = da.analyse_chain_fit(chain_fit_files, *thresholds, workers=workers)
+
+    record("count_fitting_segments", time_function(da.count_fitting_segments, filtered_data, repeat=repeat))
+    record("get_contour_length_differences", time_function(da.get_contour_length_differences, filtered_data, repeat=repeat))
+    record("compile_parameter", time_function(da.compile_parameter, filtered_data, "Breaking Force [pN]", repeat=repeat))
+
+    # The graphs need the three root regions of each date, so the filtered data is repeated and renamed when there are too few files
+    graph_data = [(df, export_file_name(i, "chain_fit")) for i, (df, _) in zip(range(max_graph_files), itertools.cycle(filtered_data))]
+    breaking_forces_dictionary, _ = da.compile_parameter(graph_data, "Breaking Force [pN]")
+    count_num_fitting_segments_dictionary, _ = da.count_fitting_segments(graph_data)
+
+    with tempfile.TemporaryDirectory() as graph_directory:
+        record("create_histograms_root", time_function(graph.create_histograms_root, breaking_forces_dictionary, graph_directory, 500, workers=workers, repeat=repeat), len(graph_data))
+        record("create_pie_charts_root", time_function(graph.create_pie_charts_root, count_num_fitting_segments_dictionary, graph_directory, workers=workers, repeat=repeat), len(graph_data))
+
+    return results
+
+
+def benchmark_startup(repeat=5):
+    """
+    This function times how long a fresh interpreter takes to import the GUI and the command line, which is what delays the window appearing. The display is not needed since no window is created.
+
+    Parameters:
+    repeat (int): The number of interpreters started for each module. The best time is kept.
+
+    Returns:
+    results (list): One dictionary per module with the best time [s] and the heavy libraries it imported.
+    """
+
+    results = []
+
+    for module in ["main", "afm"]:
+        code = f"import sys, time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start); print(','.join(m for m in ('pandas', 'numpy', 'matplotlib', 'pyarrow') if m in sys.modules))"
+
+        best = float("inf")
+
+        for _ in range(repeat):
+            output = subprocess.run([sys.executable, "-c", code], cwd=Path(__file__).parent, capture_output=True, text=True, check=True).stdout.split("\n")
+            best = min(best, float(output[0]))
+
+        results.append({"scenario": "startup", "function": f"import {module}", "files": 0, "rows": 0, "seconds": best, "imported": output[1]})
+        print(f"{'startup':>12} {'import ' + module:<32} {best:10.4f} s  heavy modules: {output[1] or 'none'}", file=sys.stderr)
+
+    return results
+
+
+def git_commit():
+    """
+    This function returns the abbreviated commit the working tree is on, with a + appended when it has uncommitted changes.
+
+    Returns:
+    commit (str): The commit, or None outside of a git repository.
+    """
+
+    directory = Path(__file__).parent
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=directory, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=directory, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    return commit + ("+" if dirty else "")
+
+
+def save_results(results, path=DEFAULT_RESULTS):
+    """
+    This function appends benchmark results to a JSON lines file, with the commit, the date and the versions they were measured with.
+
+    Parameters:
+    results (list): The list of results returned by benchmark_scenario.
+    path (str): The file to append the results to.
+    """
+
+    context = {
+        "commit": git_commit(),
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": platform.node(),
+    }
+
+    with open(path, "a") as results_file:
+        for result in results:
+            results_file.write(json.dumps({**context, **result}) + "\n")
+
+
+def load_results(path=DEFAULT_RESULTS):
+    """
+    This function reads the saved benchmark results.
+
+    Parameters:
+    path (str): The file the results were saved to.
+
+    Returns:
+    results_df (pandas.DataFrame): One row per saved result.
+    """
+
+    return pd.read_json(path, lines=True, dtype={"commit": str})
+
+
+def resolve_commit(commit):
+    """
+    This function abbreviates a commit name (ex. HEAD) the same way results are saved. Unknown names are returned unchanged.
+    """
+
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", commit], cwd=Path(__file__).parent, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return commit
+
+
+def compare_results(baseline, candidate, path=DEFAULT_RESULTS, threshold=1.1):
+    """
+    This function compares the latest timings of two commits.
+
+    Parameters:
+    baseline (str): The commit to compare against.
+    candidate (str): The commit to compare.
+    path (str): The file the results were saved to.
+    threshold (float): The ratio of the times above which a function is marked as a regression.
+
+    Returns:
+    comparison_df (pandas.DataFrame): One row per scenario and function measured on both commits, with the latest times (baseline and candidate), their ratio and whether it is a regression.
+    """
+
+    results_df = load_results(path)
+
+    def latest(commit):
+        # Results measured with uncommitted changes are saved as the commit followed by a +
+        commit_df = results_df[results_df["commit"].str.rstrip("+") == resolve_commit(commit)]
+        return commit_df.groupby(["scenario", "function"])["seconds"].last()
+
+    comparison_df = pd.concat({"baseline": latest(baseline), "candidate": latest(candidate)}, axis=1).dropna()
+    comparison_df["ratio"] = comparison_df["candidate"] / comparison_df["baseline"]
+    comparison_df["regression"] = comparison_df["ratio"] > threshold
+
+    return comparison_df
+
+
+def benchmark_count_fitting_segments(file_counts=(10, 100, 1000, 3000)):
+    """
+    This function times count_fitting_segments for an increasing number of files. The time per file should stay roughly constant.
+    """
+
+    print("count_fitting_segments")
+
+    for num_files in file_counts:
+        filtered_data = create_filtered_data(num_files)
+        elapsed = time_function(da.count_fitting_segments, filtered_data)
+        print(f"{num_files:>6} files: {elapsed*1000:9.1f} ms total, {elapsed/num_files*1e6:7.1f} us per file")
+
+
+def benchmark_units(rows=1_000_000):
+    """
+    This function compares converting the chain fit columns one at a time with change_column_prefix (one renamed copy per column) and all at once with change_column_prefixes, and prints their times and peak allocations.
+
+    Parameters:
+    rows (int): The number of rows of the dataframe.
+    """
+
+    import tracemalloc
+    import units
+
+    columns = {"Bending Length [m]": "p", "Contour Length [m]": "n", "Residual RMS [N]": "p", "Breaking Force [N]": "p"}
+
+    def create_data():
+        data = pd.DataFrame(np.random.default_rng(0).random((rows, len(columns) + 4)), columns=list(columns) + ["Index", "A [m]", "B [m]", "C [m]"])
+        data["Filename"] = "force-save.jpk-force"
+        return data
+
+    def rename_each(data):
+        for column_name, new_prefix in columns.items():
+            data = units.change_column_prefix(data, column_name, new_prefix)
+
+    print(f"unit prefix conversion of {len(columns)} columns, {rows} rows")
+
+    for name, function in (("change_column_prefix per column", rename_each), ("change_column_prefixes", lambda data: units.change_column_prefixes(data, columns))):
+        data = create_data()
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        function(data)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        print(f"{name:<32} {elapsed*1000:9.1f} ms, peak allocation {peak/1e6:7.1f} MB")
+
+
+def compare_frames(expected, actual):
+    """
+    This function compares the pandas outputs of two backends, ignoring unused categories and the dtype of empty columns.
+
+    Returns:
+    (bool): Whether the outputs are equal.
+    """
+
+    try:
+        pd.testing.assert_frame_equal(expected.reset_index(drop=True), actual.reset_index(drop=True), check_categorical=False, check_dtype=len(expected) > 0)
+    except AssertionError:
+        return False
+
+    return [getattr(dtype, "ordered", None) for dtype in expected.dtypes] == [getattr(dtype, "ordered", None) for dtype in actual.dtypes]
+
+
+def benchmark_backends(scenarios=("small", "medium"), data_directory=DEFAULT_DATA_DIRECTORY, repeat=3, backend="polars"):
+    """
+    This function runs the analysis functions on pandas and on another backend, prints their times and checks that both give the same outputs.
+
+    Parameters:
+    scenarios (list): The names of the scenarios, keys of SCENARIOS.
+    data_directory (str): The directory the synthetic datasets are kept in.
+    repeat (int): The number of calls of each function. The best time is kept.
+    backend (str): The backend compared with pandas, one of data_analysis.BACKENDS.
+
+    Returns:
+    matched (bool): Whether every output of the backend matched pandas.
+    """
+
+    backend_module = da.get_backend(backend)
+    thresholds = (4000, 20, 5000, 300, 25)
+    matched = True
+
+    print(f"{'scenario':>12} {'function':<32} {'pandas [s]':>10} {backend + ' [s]':>10}  parity")
+
+    for name in scenarios:
+        num_files, rows_per_file = SCENARIOS[name]
+
+        chain_fit_files = create_dataset(data_directory, "chain_fit", num_files, rows_per_file)
+        general_files = create_dataset(data_directory, "general", num_files, rows_per_file)
+
+        expected = {}
+        actual = {}
+        times = {}
+
+        for current, outputs in (("pandas", expected), (backend, actual)):
+            filtered_data = da.analyse_chain_fit(chain_fit_files, *thresholds, backend=current)
+            general_data, interaction_count_df = da.analyse_general(general_files, 300, backend=current)
+
+            times["analyse_chain_fit", current] = time_function(da.analyse_chain_fit, chain_fit_files, *thresholds, backend=current, repeat=repeat)
+            times["analyse_general", current] = time_function(da.analyse_general, general_files, 300, backend=current, repeat=repeat)
+            times["count_fitting_segments", current] = time_function(da.count_fitting_segments, filtered_data, backend=current, repeat=repeat)
+            times["get_contour_length_differences", current] = time_function(da.get_contour_length_differences, filtered_data, backend=current, repeat=repeat)
+            times["compile_parameter", current] = time_function(da.compile_parameter, filtered_data, "Breaking Force [pN]", backend=current, repeat=repeat)
+
+            # The filtered frames are converted like the saved filtered data
+            convert = (lambda df: df) if current == "pandas" else backend_module.to_pandas
+
+            outputs["analyse_chain_fit"] = [convert(df) for df, _ in filtered_data]
+            outputs["analyse_general"] = [convert(df) for df, _ in general_data] + [interaction_count_df]
+            outputs["count_fitting_segments"] = [da.count_fitting_segments(filtered_data, backend=current)[1]]
+            outputs["get_contour_length_differences"] = [df for df, _ in da.get_contour_length_differences(filtered_data, backend=current)]
+            outputs["compile_parameter"] = [da.compile_parameter(filtered_data, "Breaking Force [pN]", tidy=tidy, backend=current)[1] for tidy in (False, True)] + [da.compile_parameter(general_data, ["Area [aJ]", "Adhesion [pN]"], backend=current)[1]]
+
+        for function_name in expected:
+            same = len(expected[function_name]) == len(actual[function_name]) and all(compare_frames(*frames) for frames in zip(expected[function_name], actual[function_name]))
+            matched = matched and same
+
+            print(f"{name:>12} {function_name:<32} {times[function_name, 'pandas']:10.4f} {times[function_name, backend]:10.4f}  {'ok' if same else 'DIFFERENT'}")
+
+    return matched
+
+
+def benchmark_refit(segment_counts=(1_000, 10_000, 100_000), model="wlc", workers=1, noise=5e-12, seed=0):
+    """
+    This function fits synthetic segments with known parameters and prints the fitting time and the relative errors of the fitted parameters.
+    """
+
+    import fitting
+
+    rng = np.random.default_rng(seed)
+
+    print(f"fit_segment_frame ({model}, {workers} workers, {noise*1e12:g} pN noise)")
+
+    for num_segments in segment_counts:
+        # Parameters spread over the default filter ranges of chain fit mode
+        bending_lengths = 10 ** rng.uniform(np.log10(20e-12), np.log10(4000e-12), num_segments)
+        contour_lengths = rng.uniform(300e-9, 5000e-9, num_segments)
+
+        segments_df = fitting.simulate_segments(bending_lengths, contour_lengths, model=model, noise=noise, seed=seed)
+
+        start = time.perf_counter()
+        chain_fit_df = fitting.fit_segment_frame(segments_df, model=model, workers=workers)
+        elapsed = time.perf_counter() - start
+
+        bending_length_errors = np.abs(chain_fit_df["Bending Length [m]"].to_numpy() / bending_lengths - 1)
+        contour_length_errors = np.abs(chain_fit_df["Contour Length [m]"].to_numpy() / contour_lengths - 1)
+
+        print(f"{num_segments:>8} segments: {elapsed:7.2f} s, {elapsed/num_segments*1e6:6.1f} us per segment, "
+              f"bending length error {np.median(bending_length_errors)*100:.2f}% median {np.percentile(bending_length_errors, 95)*100:.2f}% p95, "
+              f"contour length error {np.median(contour_length_errors)*100:.2f}% median {np.percentile(contour_length_errors, 95)*100:.2f}% p95")
+
+
+def create_parser():
+    parser = argparse.ArgumentParser(description="Benchmark the AFM analysis on synthetic exports.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="Time the analysis and graph functions and save the results.")
+    run.add_argument("--scenario", nargs="+", choices=list(SCENARIOS), default=["small", "medium"], help="Scenarios to run (default small medium).")
+    run.add_argument("--repeat", type=int, default=3, help="Calls of each function, the best time is kept (default 3).")
+    run.add_argument("--workers", type=int, default=1, help="Worker processes used to read the files and draw the graphs (default 1).")
+    run.add_argument("--data-dir", default=DEFAULT_DATA_DIRECTORY, help="Directory the synthetic exports are kept in.")
+    run.add_argument("--results", default=DEFAULT_RESULTS, help="JSON lines file the results are appended to.")
+
+    compare = subparsers.add_parser("compare", help="Compare the saved results of two commits.")
+    compare.add_argument("baseline", help="Commit to compare against.")
+    compare.add_argument("candidate", help="Commit to compare.")
+    compare.add_argument("--results", default=DEFAULT_RESULTS, help="JSON lines file the results were saved to.")
+    compare.add_argument("--threshold", type=float, default=1.1, help="Time ratio above which a function is marked as a regression (default 1.1).")
+
+    subparsers.add_parser("fitting-segments", help="Time count_fitting_segments for an increasing number of files.")
+
+    refit = subparsers.add_parser("refit", help="Fit synthetic segments with known parameters and report the time and parameter errors.")
+    refit.add_argument("--segments", type=int, nargs="+", default=[1_000, 10_000, 100_000], help="Numbers of segments to fit (default 1000 10000 100000).")
+    refit.add_argument("--model", choices=["wlc", "fjc"], default="wlc", help="Chain model (default wlc).")
+    refit.add_argument("--workers", type=int, default=1, help="Worker processes used to fit the batches (default 1).")
+    refit.add_argument("--noise", type=float, default=5e-12, help="Standard deviation of the force noise [N] (default 5e-12).")
+
+    backends = subparsers.add_parser("backends", help="Time the analysis functions on pandas and polars and check that both give the same outputs.")
+    backends.add_argument("--scenario", nargs="+", choices=list(SCENARIOS), default=["small", "medium"], help="Scenarios to run (default small medium).")
+    backends.add_argument("--repeat", type=int, default=3, help="Calls of each function, the best time is kept (default 3).")
+    backends.add_argument("--data-dir", default=DEFAULT_DATA_DIRECTORY, help="Directory the synthetic exports are kept in.")
+
+    startup = subparsers.add_parser("startup", help="Time the import of the GUI and the command line and save the results.")
+    startup.add_argument("--repeat", type=int, default=5, help="Interpreters started for each module, the best time is kept (default 5).")
+    startup.add_argument("--results", default=DEFAULT_RESULTS, help="JSON lines file the results are appended to.")
+
+    units = subparsers.add_parser("units", help="Compare converting the unit prefixes one column at a time and all at once.")
+    units.add_argument("--rows", type=int, default=1_000_000, help="Rows of the converted dataframe (default 1000000).")
+
+    return parser
+
+
+if __name__ == "__main__":
+    args = create_parser().parse_args()
+
+    if args.command == "run":
+        results = []
+
+        for scenario in args.scenario:
+            results += benchmark_scenario(scenario, args.data_dir, repeat=args.repeat, workers=args.workers)
+
+        save_results(results, args.results)
+    elif args.command == "compare":
+        comparison_df = compare_results(args.baseline, args.candidate, args.results, args.threshold)
+        print(comparison_df.rename(columns={"baseline": f"{args.baseline} [s]", "candidate": f"{args.candidate} [s]"}).to_string())
+        sys.exit(1 if comparison_df["regression"].any() else 0)
+    elif args.command == "refit":
+        benchmark_refit(args.segments, args.model, args.workers, args.noise)
+    elif args.command == "backends":
+        sys.exit(0 if benchmark_backends(args.scenario, args.data_dir, args.repeat) else 1)
+    elif args.command == "units":
+        benchmark_units(args.rows)
+    elif args.command == "startup":
+        save_results(benchmark_startup(args.repeat), args.results)
+    else:
+        benchmark_count_fitting_segments()
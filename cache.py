@@ -0,0 +1,164 @@
+from pathlib import Path
+import hashlib
+import importlib.util
+import os
+import uuid
+
+# Checked without importing pyarrow (or pandas) so the GUI can create a cache before the first run. Falls back to pickle when pyarrow is not installed.
+CACHE_FORMAT = "parquet" if importlib.util.find_spec("pyarrow") is not None else "pkl"
+
+DEFAULT_DIRECTORY = Path.home() / ".afm_cache"
+DEFAULT_MAX_SIZE = 1024**3
+
+
+class ParsedFileCache:
+    """
+    An on-disk cache of parsed and unit-converted dataframes. Entries are keyed by the file path, modification time, size and parser version, so a file is parsed again as soon as it changes. The least recently used entries are evicted once the cache grows beyond its maximum size.
+
+    Parameters:
+    directory (str): The directory to store the cached dataframes in.
+    max_size (int): The maximum total size of the cache [bytes].
+    """
+
+    def __init__(self, directory=DEFAULT_DIRECTORY, max_size=DEFAULT_MAX_SIZE):
+        self.directory = Path(directory)
+        self.max_size = max_size
+
+    def key(self, file, parser):
+        """
+        This function creates the cache key of a file.
+
+        Parameters:
+        file (str): The file that was parsed.
+        parser (str): The name and version of the parser used to read the file (ex. chain_fit-1).
+
+        Returns:
+        key (str): The cache key.
+        """
+
+        stat = os.stat(file)
+
+        identity = f"{Path(file).resolve()}|{stat.st_mtime_ns}|{stat.st_size}|{parser}"
+
+        return hashlib.sha1(identity.encode("utf-8")).hexdigest()
+
+    def path(self, key):
+        return self.directory / f"{key}.{CACHE_FORMAT}"
+
+    def get(self, file, parser):
+        """
+        This function returns the cached dataframe of a file, or None if it is not cached.
+
+        Parameters:
+        file (str): The file that was parsed.
+        parser (str): The name and version of the parser used to read the file.
+
+        Returns:
+        df (pandas.DataFrame | None): The cached dataframe.
+        """
+
+        import pandas as pd
+
+        path = self.path(self.key(file, parser))
+
+        try:
+            if CACHE_FORMAT == "parquet":
+                df = pd.read_parquet(path)
+            else:
+                df = pd.read_pickle(path)
+        except (OSError, ValueError, EOFError):
+            return None
+
+        # Mark the entry as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        return df
+
+    def put(self, file, parser, df):
+        """
+        This function stores the parsed dataframe of a file and evicts old entries if the cache is too large.
+
+        Parameters:
+        file (str): The file that was parsed.
+        parser (str): The name and version of the parser used to read the file.
+        df (pandas.DataFrame): The parsed dataframe.
+        """
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        path = self.path(self.key(file, parser))
+
+        # Write to a temporary file first so concurrent workers never read a partial entry
+        temporary_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+
+        if CACHE_FORMAT == "parquet":
+            df.to_parquet(temporary_path)
+        else:
+            df.to_pickle(temporary_path)
+
+        os.replace(temporary_path, path)
+
+        self.evict()
+
+    def load(self, file, parser, read_function):
+        """
+        This function returns the cached dataframe of a file, reading and caching it first if necessary.
+
+        Parameters:
+        file (str): The file to load.
+        parser (str): The name and version of the parser used to read the file.
+        read_function (callable): The function used to read the file when it is not cached.
+
+        Returns:
+        df (pandas.DataFrame): The parsed dataframe.
+        """
+
+        df = self.get(file, parser)
+
+        if df is None:
+            df = read_function(file)
+            self.put(file, parser, df)
+
+        return df
+
+    def evict(self):
+        """
+        This function removes the least recently used entries until the cache is within its maximum size.
+        """
+
+        entries = []
+
+        for path in self.directory.glob(f"*.{CACHE_FORMAT}"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+
+        # Oldest entries first
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+
+            try:
+                path.unlink()
+            except OSError:
+                continue
+
+            total -= size
+
+    def clear(self):
+        """
+        This function removes every entry from the cache.
+        """
+
+        for path in self.directory.glob(f"*.{CACHE_FORMAT}"):
+            try:
+                path.unlink()
+            except OSError:
+                pass
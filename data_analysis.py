@@ -1,161 +1,792 @@
 import pandas as pd
 from pathlib import Path
-import units, graph
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import product
+import units, reader, writer, profiling
 import numpy as np
-import os
 
+# Increase when the way files are read or converted changes so cached dataframes are parsed again
+PARSER_VERSION = 2
 
-def analyse_chain_fit(files, max_bending_length, min_bending_length, max_contour_length, min_contour_length, max_residual_rms, apply_filter = True):
+# Names under which parsed files are cached
+CHAIN_FIT_PARSER = f"chain_fit-{PARSER_VERSION}"
+GENERAL_PARSER = f"general-{PARSER_VERSION}"
+
+# New unit prefixes of the columns read from each type of export
+CHAIN_FIT_PREFIXES = {
+    "Bending Length [m]": "p",
+    "Contour Length [m]": "n",
+    "Residual RMS [N]": "p",
+    "Breaking Force [N]": "p",
+}
+GENERAL_PREFIXES = {
+    "Adhesion [N]": "p",
+    "Area [J]": "a",
+    "Minimum Position [m]": "n",
+}
+
+# Dataframe libraries the analysis can run on. Polars is optional and only imported when it is selected.
+BACKENDS = ("pandas", "polars")
+DEFAULT_BACKEND = "pandas"
+
+# Interaction classes in the order of their codes in the Interaction Class column
+INTERACTION_CLASSES = ["No Interaction", "Specific", "Non-specific"]
+NO_INTERACTION, SPECIFIC, NON_SPECIFIC = range(len(INTERACTION_CLASSES))
+
+INTERACTION_COUNT_COLUMNS = ['File Name', 'No Interaction', 'Specific', 'Non-specific','No Interaction %', 'Specific %', 'Non-specific %']
+
+# Number of rows read at a time in streaming mode
+DEFAULT_CHUNKSIZE = 1_000_000
+
+
+def map_files(function, files, workers=1, progress=None, on_result=None):
+    """
+    This function applies a function to each file, in parallel when more than one worker is requested. The results are always returned in the same order as the files.
+    
+    Parameters:
+    function (callable): The function to apply to each file. Must be picklable (a module level function or a functools.partial of one).
+    files (list): The list of files to process.
+    workers (int): The number of worker processes to use. A value of 1 processes the files one after another in the current process.
+    progress (callable): Called with each file once it has been processed. Any exception it raises stops the remaining files from being processed.
+    on_result (callable): Called with each result as soon as it is available, in input order (ex. to save it while the next file is processed).
+    
+    Returns:
+    results (list): The list of results in input order.
+    """
+    
+    results = []
+    
+    if workers is None or workers <= 1 or len(files) <= 1:
+        for file in files:
+            results.append(function(file))
+            
+            if on_result is not None:
+                on_result(results[-1])
+            
+            if progress is not None:
+                progress(file)
+        
+        return results
+    
+    recorded = profiling.is_enabled()
+    
+    if recorded:
+        # Stages run in the worker processes are sent back with the results
+        function = profiling.record_in_workers(function)
+    
+    executor = ProcessPoolExecutor(max_workers=min(workers, len(files)))
+    
+    try:
+        # executor.map yields results in submission order regardless of completion order
+        for file, result in zip(files, executor.map(function, files)):
+            if recorded:
+                result, records = result
+                profiling.add_records(records)
+            
+            results.append(result)
+            
+            if on_result is not None:
+                on_result(result)
+            
+            if progress is not None:
+                progress(file)
+    finally:
+        # Drop files that have not started yet if processing stopped early
+        executor.shutdown(cancel_futures=True)
+    
+    return results
+
+
+def get_backend(backend):
+    """
+    This function returns the module implementing the analysis on another dataframe library.
+    
+    Parameters:
+    backend (str): The name of the backend, one of BACKENDS other than pandas.
+    
+    Returns:
+    module (module): The module implementing the analysis functions for the backend.
+    """
+    
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend}, expected one of {', '.join(BACKENDS)}")
+    
+    try:
+        import polars_analysis
+    except ImportError as error:
+        raise ImportError("The polars backend needs polars, install it with pip install polars") from error
+    
+    return polars_analysis
+
+
+def read_chain_fit_file(file):
+    """
+    This function reads the columns used by the chain fit analysis from a single file and adjusts units.
+    
+    Parameters:
+    file (str): The file to read.
+    
+    Returns:
+    df (pandas.DataFrame): The dataframe with adjusted units.
+    """
+    
+    with profiling.stage("read_csv", file) as stage:
+        df = reader.read_chain_fit_export(file)
+        stage.rows_out = len(df)
+
+    with profiling.stage("change_column_prefix", file, len(df)):
+        return convert_chain_fit_units(df)
+
+
+def convert_chain_fit_units(df):
+    """
+    This function adjusts the units of the chain fit columns.
+    
+    Parameters:
+    df (pandas.DataFrame): The dataframe as read from the file.
+    
+    Returns:
+    df (pandas.DataFrame): The dataframe with adjusted units.
+    """
+    
+    return units.change_column_prefixes(df, CHAIN_FIT_PREFIXES)
+
+
+def filter_chain_fit(df, max_bending_length, min_bending_length, max_contour_length, min_contour_length, max_residual_rms):
+    """
+    This function filters out data that is not within the expected range.
+    
+    Parameters:
+    df (pandas.DataFrame): The dataframe with adjusted units.
+    max_bending_length (float): The maximum bending length [pm].
+    min_bending_length (float): The minimum bending length [pm].
+    max_contour_length (float): The maximum contour length [pm].
+    min_contour_length (float): The minimum contour length [pm].
+    max_residual_rms (float): The maximum residual RMS [pN].
+    
+    Returns:
+    df (pandas.DataFrame): The filtered dataframe.
+    """
+    
+    return df[(df["Bending Length [pm]"] < max_bending_length) & (df["Bending Length [pm]"] > min_bending_length) & (df["Contour Length [nm]"] < max_contour_length) & (df["Contour Length [nm]"] > min_contour_length) & (df["Residual RMS [pN]"] < max_residual_rms)]
+
+
+def load_chain_fit_file(file, cache = None):
+    """
+    This function returns the chain fit data of a file with adjusted units, from the cache when possible.
+    
+    Parameters:
+    file (str): The file to load.
+    cache (cache.ParsedFileCache): The cache of parsed files. The file is always parsed when this is None.
+    
+    Returns:
+    df (pandas.DataFrame): The dataframe with adjusted units.
+    """
+    
+    if cache is None:
+        return read_chain_fit_file(file)
+    
+    return cache.load(file, CHAIN_FIT_PARSER, read_chain_fit_file)
+
+
+def analyse_chain_fit_file(file, max_bending_length, min_bending_length, max_contour_length, min_contour_length, max_residual_rms, apply_filter = True, cache = None):
+    """
+    This function reads a single chain fits file, adjusts units and filters out data that is not within the expected range.
+    
+    Parameters:
+    file (str): The file to analyze.
+    max_bending_length (float): The maximum bending length [pm].
+    min_bending_length (float): The minimum bending length [pm].
+    max_contour_length (float): The maximum contour length [pm].
+    min_contour_length (float): The minimum contour length [pm].
+    max_residual_rms (float): The maximum residual RMS [pN].
+    apply_filter (bool): Whether to filter the data.
+    cache (cache.ParsedFileCache): The cache of parsed files. The file is always parsed when this is None.
+    
+    Returns:
+    (tuple): The filtered dataframe and the file.
+    """
+    
+    df = load_chain_fit_file(file, cache)
+
+    if apply_filter:
+        # Filter out data that is not within the expected range
+        with profiling.stage("filter", file, len(df)) as stage:
+            df = filter_chain_fit(df, max_bending_length, min_bending_length, max_contour_length, min_contour_length, max_residual_rms)
+            stage.rows_out = len(df)
+    
+    return (df, file)
+
+
+def analyse_chain_fit(files, max_bending_length, min_bending_length, max_contour_length, min_contour_length, max_residual_rms, apply_filter = True, workers = 1, cache = None, progress = None, writer = None, backend = DEFAULT_BACKEND):
     """
     This function analyzes the chain fits data and filters out data that is not within the expected range and adjusts units.
     
     Parameters:
     files (list): The list of files to analyze.
-    directory (str): The directory to save the filtered data.
     max_bending_length (float): The maximum bending length [pm].
     min_bending_length (float): The minimum bending length [pm].
     max_contour_length (float): The maximum contour length [pm].
     min_contour_length (float): The minimum contour length [pm].
     max_residual_rms (float): The maximum residual RMS [pN].
+    apply_filter (bool): Whether to filter the data.
+    workers (int): The number of worker processes used to read the files.
+    cache (cache.ParsedFileCache): The cache of parsed files. The files are always parsed when this is None.
+    progress (callable): Called with each file once it has been analyzed.
+    writer (writer.OutputWriter): Saves the filtered data of each file while the next file is analyzed. The filtered data is not saved when this is None.
+    backend (str): The dataframe library to run on, one of BACKENDS. The polars backend scans every file in one query and ignores workers and cache.
     
     Returns:
-    filtered_dfs (list): The list of filtered dataframes.
+    filtered_dfs (list): The list of filtered dataframes, polars dataframes with the polars backend.
     """
     
-    filtered_dfs = []
+    if backend != "pandas":
+        return get_backend(backend).analyse_chain_fit(files, max_bending_length, min_bending_length, max_contour_length, min_contour_length, max_residual_rms, apply_filter=apply_filter, progress=progress, writer=writer)
+    
+    function = partial(analyse_chain_fit_file, max_bending_length=max_bending_length, min_bending_length=min_bending_length, max_contour_length=max_contour_length, min_contour_length=min_contour_length, max_residual_rms=max_residual_rms, apply_filter=apply_filter, cache=cache)
     
-    for file in files:
-        df = pd.read_csv(file, sep="\t")
+    on_result = None if writer is None else lambda result: writer.write(*result)
+    
+    filtered_dfs = map_files(function, list(files), workers, progress, on_result)
+    
+    return filtered_dfs
 
-        # Adjust units
-        df = units.change_column_prefix(df, "Bending Length [m]", "p")
-        df = units.change_column_prefix(df, "Contour Length [m]", "n")
-        df = units.change_column_prefix(df, "Residual RMS [N]", "p")
-        df = units.change_column_prefix(df, "Breaking Force [N]", "p")
 
-        if apply_filter:
-            # Filter out data that is not within the expected range
-            df = df[(df["Bending Length [pm]"] < max_bending_length) & (df["Bending Length [pm]"] > min_bending_length) & (df["Contour Length [nm]"] < max_contour_length) & (df["Contour Length [nm]"] > min_contour_length) & (df["Residual RMS [pN]"] < max_residual_rms)]
+@profiling.profiled("sweep_chain_fit")
+def sweep_chain_fit(files, max_bending_lengths, min_bending_lengths, max_contour_lengths, min_contour_lengths, max_residual_rmses, by_file = False, workers = 1, cache = None, progress = None):
+    """
+    This function evaluates every combination of the given filter thresholds on the chain fits data. The files are only read and converted once, and the condition of each threshold value is only evaluated once and shared by all combinations using it.
+    
+    Parameters:
+    files (list): The list of files to analyze.
+    max_bending_lengths (float | list): The maximum bending lengths [pm] to try.
+    min_bending_lengths (float | list): The minimum bending lengths [pm] to try.
+    max_contour_lengths (float | list): The maximum contour lengths [nm] to try.
+    min_contour_lengths (float | list): The minimum contour lengths [nm] to try.
+    max_residual_rmses (float | list): The maximum residual RMS values [pN] to try.
+    by_file (bool): Whether to summarise each file separately instead of all files together.
+    workers (int): The number of worker processes used to read the files.
+    cache (cache.ParsedFileCache): The cache of parsed files. The files are always parsed when this is None.
+    progress (callable): Called with each file once it has been read.
+    
+    Returns:
+    sweep_df (pandas.DataFrame): The dataframe containing the thresholds, the number of remaining rows and the breaking force statistics of each combination.
+    """
+    
+    files = list(files)
+    
+    dfs = map_files(partial(load_chain_fit_file, cache=cache), files, workers, progress)
+    
+    lengths = [len(df) for df in dfs]
+    
+    def column(name):
+        return np.concatenate([df[name].to_numpy(dtype=float) for df in dfs]) if dfs else np.array([], dtype=float)
+    
+    bending_length = column("Bending Length [pm]")
+    contour_length = column("Contour Length [nm]")
+    residual_rms = column("Residual RMS [pN]")
+    breaking_force = column("Breaking Force [pN]")
+    
+    # The rows of each file are contiguous, so they are selected by slicing instead of comparing file numbers
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    
+    def as_list(values):
+        return list(np.atleast_1d(values))
+    
+    # Evaluate the condition of each threshold value once
+    conditions = [
+        ("Max Bending Length [pm]", {value: bending_length < value for value in as_list(max_bending_lengths)}),
+        ("Min Bending Length [pm]", {value: bending_length > value for value in as_list(min_bending_lengths)}),
+        ("Max Contour Length [nm]", {value: contour_length < value for value in as_list(max_contour_lengths)}),
+        ("Min Contour Length [nm]", {value: contour_length > value for value in as_list(min_contour_lengths)}),
+        ("Max Residual RMS [pN]", {value: residual_rms < value for value in as_list(max_residual_rmses)}),
+    ]
+    
+    rows = []
+    
+    for combination in product(*[list(masks) for _, masks in conditions]):
         
-        filtered_dfs.append((df,file))
+        mask = np.ones(len(breaking_force), dtype=bool)
+        for (_, masks), value in zip(conditions, combination):
+            mask &= masks[value]
+        
+        thresholds = dict(zip([name for name, _ in conditions], combination))
+        
+        if by_file:
+            for file, start, stop in zip(files, offsets[:-1], offsets[1:]):
+                rows.append({**thresholds, "File": Path(file).stem, **summarise_breaking_forces(breaking_force[start:stop][mask[start:stop]])})
+        else:
+            rows.append({**thresholds, **summarise_breaking_forces(breaking_force[mask])})
     
-    return filtered_dfs
+    return pd.DataFrame(rows)
+
+
+def summarise_breaking_forces(breaking_forces):
+    """
+    This function summarises the breaking forces remaining after filtering.
+    
+    Parameters:
+    breaking_forces (numpy.ndarray): The breaking forces [pN].
+    
+    Returns:
+    (dict): The number of rows and the mean, standard deviation and quartiles of the breaking forces.
+    """
+    
+    if len(breaking_forces) == 0:
+        return {"Rows": 0, "Mean [pN]": np.nan, "Std [pN]": np.nan, "Q1 [pN]": np.nan, "Median [pN]": np.nan, "Q3 [pN]": np.nan}
+    
+    q1, median, q3 = np.percentile(breaking_forces, [25, 50, 75])
+    
+    return {
+        "Rows": len(breaking_forces),
+        "Mean [pN]": breaking_forces.mean(),
+        "Std [pN]": breaking_forces.std(ddof=1) if len(breaking_forces) > 1 else np.nan,
+        "Q1 [pN]": q1,
+        "Median [pN]": median,
+        "Q3 [pN]": q3,
+    }
+
+
+def read_general_file(file):
+    """
+    This function reads the columns used by the general analysis from a single file and adjusts units.
+    
+    Parameters:
+    file (str): The file to read.
+    
+    Returns:
+    df (pandas.DataFrame): The dataframe with adjusted units.
+    """
+    
+    with profiling.stage("read_csv", file) as stage:
+        df = reader.read_general_export(file)
+        stage.rows_out = len(df)
+
+    with profiling.stage("change_column_prefix", file, len(df)):
+        return convert_general_units(df)
+
+
+def convert_general_units(df):
+    """
+    This function adjusts the units of the general columns.
+    
+    Parameters:
+    df (pandas.DataFrame): The dataframe as read from the file.
+    
+    Returns:
+    df (pandas.DataFrame): The dataframe with adjusted units.
+    """
+    
+    return units.change_column_prefixes(df, GENERAL_PREFIXES)
+
+
+def classify_interactions(df, min_position_threshold):
+    """
+    This function labels each curve with its interaction class: no interaction (no fitted segments), non-specific (a single segment below the minimum position threshold) or specific (any other curve with fitted segments).
+    
+    Parameters:
+    df (pandas.DataFrame): The dataframe with adjusted units.
+    min_position_threshold (float): The minimum position threshold [nm].
+    
+    Returns:
+    classes (numpy.ndarray): The int8 interaction class of each curve, an index into INTERACTION_CLASSES or -1 if the curve does not fall into any class.
+    """
+    
+    # Missing counts are NaN, so their curves do not fall into any class
+    segments = df["Fitted Segment Count"].to_numpy(dtype=float, na_value=np.nan)
+    position = df["Minimum Position [nm]"].to_numpy()
+    
+    single = segments == 1
+    
+    return np.select(
+        [segments == 0, segments > 1, single & (position >= min_position_threshold), single & (position < min_position_threshold)],
+        [NO_INTERACTION, SPECIFIC, SPECIFIC, NON_SPECIFIC],
+        default=-1,
+    ).astype(np.int8)
+
+
+def count_interactions(classes):
+    """
+    This function counts the number of curves for each interaction type.
+    
+    Parameters:
+    classes (numpy.ndarray): The interaction class of each curve, as returned by classify_interactions.
+    
+    Returns:
+    counts (numpy.ndarray): The number of curves with no interaction, specific interaction and non-specific interaction.
+    """
+    
+    # Shift by one so curves without a class (-1) land in the first bin, which is dropped
+    return np.bincount(classes.astype(np.int64) + 1, minlength=len(INTERACTION_CLASSES) + 1)[1:]
+
+
+def add_interaction_class(df, classes):
+    """
+    This function adds the interaction class of each curve to the dataframe as a categorical column.
+    
+    Parameters:
+    df (pandas.DataFrame): The dataframe with adjusted units.
+    classes (numpy.ndarray): The interaction class of each curve, as returned by classify_interactions.
+    
+    Returns:
+    df (pandas.DataFrame): A new dataframe with the Interaction Class column. The dataframe passed in is left unchanged, as it may be shared by a cache or a session.DatasetStore.
+    """
+    
+    return df.assign(**{"Interaction Class": pd.Categorical.from_codes(classes, categories=INTERACTION_CLASSES)})
+
+
+def create_interaction_count_row(file, no_interaction, specific, non_specific):
+    """
+    This function creates the row of the interaction count dataframe for a file.
+    
+    Parameters:
+    file (str): The file the interactions were counted in.
+    no_interaction (int): The number of curves with no interaction.
+    specific (int): The number of curves with specific interaction.
+    non_specific (int): The number of curves with non-specific interaction.
+    
+    Returns:
+    el (list): The row of the interaction count dataframe.
+    """
+    
+    total = no_interaction + specific + non_specific
+    
+    return [Path(file).stem, no_interaction, specific, non_specific, round(no_interaction/total*100,1), round(specific/total*100,1), round(non_specific/total*100,1)]
+
+
+def load_general_file(file, cache = None):
+    """
+    This function returns the general data of a file with adjusted units, from the cache when possible.
+    
+    Parameters:
+    file (str): The file to load.
+    cache (cache.ParsedFileCache): The cache of parsed files. The file is always parsed when this is None.
+    
+    Returns:
+    df (pandas.DataFrame): The dataframe with adjusted units.
+    """
+    
+    if cache is None:
+        return read_general_file(file)
+    
+    return cache.load(file, GENERAL_PARSER, read_general_file)
+
+
+def analyse_general_file(file, min_position_threshold, cache = None):
+    """
+    This function reads a single general file, adjusts units, counts the interactions and filters the data considered as having no interaction.
+    
+    Parameters:
+    file (str): The file to analyze.
+    min_position_threshold (float): The minimum position threshold [nm].
+    cache (cache.ParsedFileCache): The cache of parsed files. The file is always parsed when this is None.
+    
+    Returns:
+    (tuple): The filtered dataframe, the file and the interaction count row.
+    """
+    
+    df = load_general_file(file, cache)
+
+    with profiling.stage("classify_and_filter", file, len(df)) as stage:
+        # Classify and count interactions
+        classes = classify_interactions(df, min_position_threshold)
+        el = create_interaction_count_row(file, *count_interactions(classes))
+        
+        df = add_interaction_class(df, classes)
+
+        # Filter out data that is considered as having no interaction
+        df = df[classes != NO_INTERACTION]
+        stage.rows_out = len(df)
 
+    return (df, file, el)
 
-def analyse_general(files, min_position_threshold):
+
+def analyse_general(files, min_position_threshold, workers = 1, cache = None, progress = None, writer = None, backend = DEFAULT_BACKEND):
     """
     This function analyzes the general data and filters the data considered as having no interaction and adjusts units. It also counts the number of interactions for each interaction type.
     
     Parameters:
     files (list): The list of files to analyze.
-    min_position_threshold (float): The minimum position threshold [m].
+    min_position_threshold (float): The minimum position threshold [nm].
+    workers (int): The number of worker processes used to read the files.
+    cache (cache.ParsedFileCache): The cache of parsed files. The files are always parsed when this is None.
+    progress (callable): Called with each file once it has been analyzed.
+    writer (writer.OutputWriter): Saves the filtered data of each file while the next file is analyzed. The filtered data is not saved when this is None.
+    backend (str): The dataframe library to run on, one of BACKENDS. The polars backend scans every file in one query and ignores workers and cache.
     
     Returns:
-    (tuple): The filtered data and the interaction count dataframe.
+    (tuple): The filtered data (polars dataframes with the polars backend) and the interaction count dataframe.
     """
 
+    if backend != "pandas":
+        return get_backend(backend).analyse_general(files, min_position_threshold, progress=progress, writer=writer)
+
     filtered_data = []
     interaction_count_list = []
 
-    for file in files:
-        df = pd.read_csv(file, sep="\t")
-
-        df = units.change_column_prefix(df, "Adhesion [N]", "p")
-        df = units.change_column_prefix(df, "Area [J]", "a")
-        df = units.change_column_prefix(df, "Minimum Position [m]", "n")
-
-        # Count interactions and append them to the interaction counts list
-        no_interaction = (df["Fitted Segment Count"] == 0).sum()
-        non_specific = ((df["Fitted Segment Count"] == 1) & (
-            df["Minimum Position [nm]"] < min_position_threshold
-        )).sum()
-        specific = (
-            (df["Fitted Segment Count"] > 1)| 
-            ((df["Fitted Segment Count"] == 1) & (df["Minimum Position [nm]"] >= min_position_threshold))
-        ).sum()
-
-        total = no_interaction + specific + non_specific
-        el = [Path(file).stem, no_interaction, specific, non_specific, round(no_interaction/total*100,1), round(specific/total*100,1), round(non_specific/total*100,1)]
-        interaction_count_list.append(el)
-
-        # Filter out data that is considered as having no interaction
-        df = df[df["Fitted Segment Count"] >= 1]
+    function = partial(analyse_general_file, min_position_threshold=min_position_threshold, cache=cache)
 
+    on_result = None if writer is None else lambda result: writer.write(result[0], result[1])
+    
+    for (df, file, el) in map_files(function, list(files), workers, progress, on_result):
+        # Append the interaction counts to the interaction counts list
+        interaction_count_list.append(el)
         filtered_data.append((df,file))
 
-    interaction_count_df = pd.DataFrame(interaction_count_list, columns=['File Name', 'No Interaction', 'Specific', 'Non-specific','No Interaction %', 'Specific %', 'Non-specific %'])
+    interaction_count_df = pd.DataFrame(interaction_count_list, columns=INTERACTION_COUNT_COLUMNS)
 
     return filtered_data, interaction_count_df
 
 
-def count_fitting_segments(filtered_data, num_categories=5):
+def filtered_file_path(directory, file, output_format = writer.DEFAULT_FORMAT):
+    """
+    This function returns the path the filtered data of a file is saved to.
+    
+    Parameters:
+    directory (str): The directory to save the filtered data.
+    file (str): The file the data was read from.
+    output_format (str): The output format, one of writer.FORMATS.
+    
+    Returns:
+    path (pathlib.Path): The path of the filtered data.
+    """
+    
+    return writer.output_path(directory, file, "filtered", output_format)
+
+
+def stream_chain_fit(files, max_bending_length, min_bending_length, max_contour_length, min_contour_length, max_residual_rms, apply_filter = True, directory = None, keep_columns = ("Breaking Force [pN]",), chunksize = DEFAULT_CHUNKSIZE, num_categories = 5, progress = None, output_format = writer.DEFAULT_FORMAT):
+    """
+    This function analyzes the chain fits data one chunk at a time so the memory used is bounded by the chunk size rather than the file size. Each chunk has its units adjusted, is filtered and appended to the saved filtered data. The number of fitting segments is counted as the chunks are read.
+    
+    Parameters:
+    files (list): The list of files to analyze.
+    max_bending_length (float): The maximum bending length [pm].
+    min_bending_length (float): The minimum bending length [pm].
+    max_contour_length (float): The maximum contour length [pm].
+    min_contour_length (float): The minimum contour length [pm].
+    max_residual_rms (float): The maximum residual RMS [pN].
+    apply_filter (bool): Whether to filter the data.
+    directory (str): The directory to save the filtered data. The filtered data is not saved when this is None.
+    keep_columns (tuple): The columns of the filtered data kept in memory and returned.
+    chunksize (int): The number of rows read at a time.
+    num_categories (int): The number of fitting segment categories.
+    progress (callable): Called with each file once it has been analyzed.
+    output_format (str): The format of the saved filtered data, one of writer.FORMATS. The chunks are written in a background thread while the next chunk is read.
+    
+    Returns:
+    (tuple): The kept columns of the filtered data of the format (dataframe, file), the fitting segments count dictionary and the fitting segments count dataframe.
+    """
+    
+    filtered_writer = None if directory is None else writer.OutputWriter(directory, output_format)
+    
+    kept_data = []
+    num_fitting_segments_data = []
+    
+    try:
+        for file in files:
+        
+            kept_chunks = []
+            num_fitting_segments = pd.Series(dtype="int64")
+        
+            for i, chunk in enumerate(reader.read_chain_fit_export(file, chunksize=chunksize)):
+            
+                with profiling.stage("change_column_prefix", file, len(chunk)):
+                    chunk = convert_chain_fit_units(chunk)
+            
+                if apply_filter:
+                    with profiling.stage("filter", file, len(chunk)) as stage:
+                        chunk = filter_chain_fit(chunk, max_bending_length, min_bending_length, max_contour_length, min_contour_length, max_residual_rms)
+                        stage.rows_out = len(chunk)
+            
+                # Segments of a curve can be split across chunks so they are added up per curve
+                num_fitting_segments = num_fitting_segments.add(chunk["Filename"].astype(str).value_counts(), fill_value=0)
+            
+                if filtered_writer is not None:
+                    filtered_writer.write(chunk, file, append=(i > 0))
+            
+                kept_chunks.append(chunk[list(keep_columns)])
+        
+            if kept_chunks:
+                kept_df = pd.concat(kept_chunks, ignore_index=True)
+            else:
+                kept_df = pd.DataFrame(columns=list(keep_columns))
+        
+            kept_data.append((kept_df, file))
+            num_fitting_segments_data.append((num_fitting_segments, file))
+        
+            if progress is not None:
+                progress(file)
+    finally:
+        # Wait for the last chunks to be written
+        if filtered_writer is not None:
+            filtered_writer.close()
+    
+    dictionary, count_num_fitting_segments_df = compile_fitting_segment_counts(num_fitting_segments_data, num_categories)
+    
+    return kept_data, dictionary, count_num_fitting_segments_df
+
+
+def stream_general(files, min_position_threshold, directory = None, keep_columns = ("Area [aJ]", "Adhesion [pN]"), chunksize = DEFAULT_CHUNKSIZE, progress = None, output_format = writer.DEFAULT_FORMAT):
+    """
+    This function analyzes the general data one chunk at a time so the memory used is bounded by the chunk size rather than the file size. Each chunk has its units adjusted, its interactions counted and is filtered and appended to the saved filtered data.
+    
+    Parameters:
+    files (list): The list of files to analyze.
+    min_position_threshold (float): The minimum position threshold [nm].
+    directory (str): The directory to save the filtered data. The filtered data is not saved when this is None.
+    keep_columns (tuple): The columns of the filtered data kept in memory and returned.
+    chunksize (int): The number of rows read at a time.
+    progress (callable): Called with each file once it has been analyzed.
+    output_format (str): The format of the saved filtered data, one of writer.FORMATS. The chunks are written in a background thread while the next chunk is read.
+    
+    Returns:
+    (tuple): The kept columns of the filtered data of the format (dataframe, file) and the interaction count dataframe.
+    """
+    
+    filtered_writer = None if directory is None else writer.OutputWriter(directory, output_format)
+    
+    kept_data = []
+    interaction_count_list = []
+    
+    try:
+        for file in files:
+        
+            kept_chunks = []
+            counts = np.zeros(3, dtype=np.int64)
+        
+            for i, chunk in enumerate(reader.read_general_export(file, chunksize=chunksize)):
+            
+                with profiling.stage("change_column_prefix", file, len(chunk)):
+                    chunk = convert_general_units(chunk)
+            
+                with profiling.stage("classify_and_filter", file, len(chunk)) as stage:
+                    classes = classify_interactions(chunk, min_position_threshold)
+                    counts += count_interactions(classes)
+                
+                    chunk = add_interaction_class(chunk, classes)
+                
+                    # Filter out data that is considered as having no interaction
+                    chunk = chunk[classes != NO_INTERACTION]
+                    stage.rows_out = len(chunk)
+            
+                if filtered_writer is not None:
+                    filtered_writer.write(chunk, file, append=(i > 0))
+            
+                kept_chunks.append(chunk[list(keep_columns)])
+        
+            if kept_chunks:
+                kept_df = pd.concat(kept_chunks, ignore_index=True)
+            else:
+                kept_df = pd.DataFrame(columns=list(keep_columns))
+        
+            kept_data.append((kept_df, file))
+            interaction_count_list.append(create_interaction_count_row(file, *counts))
+        
+            if progress is not None:
+                progress(file)
+    finally:
+        # Wait for the last chunks to be written
+        if filtered_writer is not None:
+            filtered_writer.close()
+    
+    interaction_count_df = pd.DataFrame(interaction_count_list, columns=INTERACTION_COUNT_COLUMNS)
+    
+    return kept_data, interaction_count_df
+
+
+@profiling.profiled("count_fitting_segments")
+def count_fitting_segments(filtered_data, num_categories=5, backend=DEFAULT_BACKEND):
     """
     This function counts the number of fitting segments for each file.
     
     Parameters:
-    filtered_data (list): The list of filtered data of the format (file, dataframe).
-    directory (str): The directory to save the count data.
+    filtered_data (list): The list of filtered data of the format (dataframe, file).
+    num_categories (int): The number of categories. The last category contains all curves with at least this many segments.
+    backend (str): The dataframe library of the filtered data, one of BACKENDS.
+    
+    Returns:
+    dictionary (dict): The dictionary containing the count data.
+    count_num_fitting_segments_df (pandas.DataFrame): The dataframe containing the count data.
+    """
+    if backend != "pandas":
+        return get_backend(backend).count_fitting_segments(filtered_data, num_categories)
+    
+    return compile_fitting_segment_counts([(df["Filename"].value_counts(), file) for (df, file) in filtered_data], num_categories)
+
+
+def compile_fitting_segment_counts(num_fitting_segments_data, num_categories=5):
+    """
+    This function sorts the number of fitting segments of each curve into categories for each file.
+    
+    Parameters:
+    num_fitting_segments_data (list): The list of the number of fitting segments of each curve of the format (series, file).
+    num_categories (int): The number of categories. The last category contains all curves with at least this many segments.
     
     Returns:
     dictionary (dict): The dictionary containing the count data.
     count_num_fitting_segments_df (pandas.DataFrame): The dataframe containing the count data.
     """
     dictionary = {}
-    count_num_fitting_segments_df = pd.DataFrame()
     
     # Create an index for the dataframe
     index = [str(i) for i in range(1, num_categories)]
     index.append(f"\u2265{num_categories}")
     
-    count_num_fitting_segments_df = pd.concat([count_num_fitting_segments_df, pd.Series(index, index=index)], axis=1)
+    columns = [pd.Series(index, index=index)]
     
-    for (df, file) in filtered_data:
-        
-        # Count number of occurrences of each file name
-        num_fitting_segments = df["Filename"].value_counts()
-        
-        count_num_fitting_segments = []
-        
-        # Determine the number of occurrences of each category
-        for i in range(1, num_categories):
-            count_num_fitting_segments.append((num_fitting_segments == i).sum())
+    for (num_fitting_segments, file) in num_fitting_segments_data:
         
-        # Determine the number of occurrences of the last category
-        count_num_fitting_segments.append((num_fitting_segments >= num_categories).sum())
+        # Curves with at least num_categories segments all fall into the last bin, and curves without segments into bin 0 which is dropped
+        segments = np.clip(np.asarray(num_fitting_segments, dtype=np.int64), 0, num_categories)
+        count_num_fitting_segments = np.bincount(segments, minlength=num_categories + 1)[1:]
         
-        # Convert the list to a series
+        # Convert the counts to a series
         count_num_fitting_segments_series = pd.Series(count_num_fitting_segments, index=index, name=Path(file).stem)
         
-        # Add the series to the dataframe
-        count_num_fitting_segments_df = pd.concat([count_num_fitting_segments_df, count_num_fitting_segments_series], axis=1)
+        columns.append(count_num_fitting_segments_series)
         
         dictionary[Path(file).stem] = count_num_fitting_segments_series
     
+    # Combine all the series at once
+    count_num_fitting_segments_df = pd.concat(columns, axis=1)
+    
     return dictionary, count_num_fitting_segments_df
 
-def get_contour_length_differences(filtered_data):
+
+@profiling.profiled("get_contour_length_differences")
+def get_contour_length_differences(filtered_data, backend=DEFAULT_BACKEND):
+    """
+    This function calculates the differences in contour length between consecutive fitted segments of each force curve.
+    
+    Parameters:
+    filtered_data (list): The list of filtered data of the format (dataframe, file).
+    backend (str): The dataframe library of the filtered data, one of BACKENDS.
+    
+    Returns:
+    contour_length_differences_data (list): The list of contour length differences of the format (pandas.DataFrame, file).
+    """
+    
+    if backend != "pandas":
+        return get_backend(backend).get_contour_length_differences(filtered_data)
     
     contour_length_differences_data = []
     
     for (df, file) in filtered_data:
         
-        filename_set = set(df["Filename"])
+        # A single stable sort groups the segments of each curve together in index order
+        df_sorted = df.sort_values(by=["Filename", "Index"], kind="stable")
         
-        contour_length_differences_list = []
+        filenames = df_sorted["Filename"].to_numpy()
+        contour_lengths = df_sorted["Contour Length [nm]"].to_numpy()
         
-        for filename in filename_set:
-            
-            df_filename = df[df["Filename"] == filename]
-            
-            df_filename = df_filename.sort_values(by=["Index"])
-                        
-            for i in range(1, len(df_filename)):
-                    
-                    contour_length_difference = df_filename["Contour Length [nm]"].iloc[i] - df_filename["Contour Length [nm]"].iloc[i-1]
-                    
-                    contour_length_differences_list.append([filename, contour_length_difference])
-                    
-        contour_length_differences_df = pd.DataFrame(contour_length_differences_list, columns=["Filename", "Contour Length Difference [nm]"])
+        # Only keep differences between consecutive segments belonging to the same curve
+        same_curve = filenames[1:] == filenames[:-1]
+        
+        contour_length_differences_df = pd.DataFrame({
+            "Filename": filenames[1:][same_curve],
+            "Contour Length Difference [nm]": np.diff(contour_lengths)[same_curve],
+        })
         
         contour_length_differences_data.append((contour_length_differences_df, file))
     
@@ -180,34 +811,42 @@ def max_length_dict(dictionary):
     return max_length
 
 
-def save_filtered_dfs(filtered_data, directory):
+def save_filtered_dfs(filtered_data, directory, output_format = writer.DEFAULT_FORMAT, suffix = "filtered"):
     """
-    This function saves the filtered data to new CSV files.
+    This function saves the filtered data, one file per input file or one dataset partitioned by sample.
     
     Parameters:
-    filtered_data (list): The list of filtered data of the format (file, dataframe).
+    filtered_data (list): The list of filtered data of the format (dataframe, file).
     directory (str): The directory to save the filtered data.
+    output_format (str): The output format, one of writer.FORMATS.
+    suffix (str): The suffix added to the file names, so different outputs saved in the same directory do not overwrite each other.
     """
     
-    if not os.path.exists(f"{directory}"):
-        os.makedirs(f"{directory}")
-    
-    for filtered_df, file in filtered_data:
-        filtered_df.to_csv(f"{directory}\\{Path(file).stem}_filtered.csv", index=False)
+    with writer.OutputWriter(directory, output_format, suffix=suffix) as filtered_writer:
+        for filtered_df, file in filtered_data:
+            filtered_writer.write(filtered_df, file)
 
 
-def compile_parameter(filtered_data, parameter_names):
+@profiling.profiled("compile_parameter")
+def compile_parameter(filtered_data, parameter_names, tidy=False, backend=DEFAULT_BACKEND):
     """
     This function compiles a parameter from the filtered data and and also adds it all onto one dataframe.
     
     Parameters:
-    filtered_data (list): The list of filtered data of the format (file, dataframe).
+    filtered_data (list): The list of filtered data of the format (dataframe, file).
     parameter_names (str | list): The name of the parameter(s) to compile.
+    tidy (bool): Whether to return the dataframe in long format with one row per value and the columns Sample, Region, Parameter and Value, instead of one NaN padded column per file and parameter.
+    backend (str): The dataframe library of the filtered data, one of BACKENDS.
     
     Returns:
-    parameters_dict (dict): The dictionary containing the parameter values.
+    parameters_dict (dict): The dictionary containing the parameter values as numpy arrays.
+    parameters_df (pandas.DataFrame): The dataframe containing all the parameter values.
     """
+    if backend != "pandas":
+        return get_backend(backend).compile_parameter(filtered_data, parameter_names, tidy)
+    
     parameters_dict = {}
+    labels = {}
     
     if isinstance(parameter_names, str):
         parameter_names = [parameter_names]
@@ -220,22 +859,38 @@ def compile_parameter(filtered_data, parameter_names):
             new_name = segments[0]+ "-" + parameter_name + "-" + segments[-1] 
             
             # Add each column to a dictionary
-            parameters_dict[new_name] = filtered_df[parameter_name].tolist()
+            parameters_dict[new_name] = filtered_df[parameter_name].to_numpy(dtype=float)
+            labels[new_name] = (segments[0], segments[-1], parameter_name)
     
-    # Ensure all lists in the dictionary are the same length
-    parameters_dict_padded = {}
+    if tidy:
+        lengths = [len(values) for values in parameters_dict.values()]
+        
+        parameters_df = pd.DataFrame({
+            "Sample": np.repeat([labels[key][0] for key in parameters_dict], lengths),
+            "Region": np.repeat([labels[key][1] for key in parameters_dict], lengths),
+            "Parameter": np.repeat([labels[key][2] for key in parameters_dict], lengths),
+            "Value": np.concatenate(list(parameters_dict.values())) if parameters_dict else np.array([], dtype=float),
+        })
+        
+        return parameters_dict, parameters_df
+    
+    # Fill one preallocated NaN padded array so all columns are the same length
     max_length = max_length_dict(parameters_dict)
-    for key in parameters_dict:
-        parameters_dict_padded[key] = list(np.pad(parameters_dict[key], (0, max_length - len(parameters_dict[key])), 'constant', constant_values=(np.nan)))
+    table = np.full((max_length, len(parameters_dict)), np.nan)
+    
+    for i, values in enumerate(parameters_dict.values()):
+        table[:len(values), i] = values
 
-    # Convert the dictionary to a dataframe
-    parameters_df = pd.DataFrame(parameters_dict_padded)
+    # Convert the array to a dataframe
+    parameters_df = pd.DataFrame(table, columns=list(parameters_dict))
     
     return parameters_dict, parameters_df
 
 
 if __name__ == "__main__":
     
+    import graph
+    
     # For testing purposes only.
     files =[r"c:\Users\samue\Downloads\OneDrive_2_5-28-2024\20230306-VFB-E.txt", r"c:\Users\samue\Downloads\OneDrive_2_5-28-2024\20230306-VFB-M.txt" ,r"c:\Users\samue\Downloads\OneDrive_2_5-28-2024\20230306-VFB-CD.txt"]
     directory = "."
@@ -0,0 +1,364 @@
+"""
+Batched polymer chain fits of force curve segments.
+
+Fits the worm-like chain (WLC) or freely jointed chain (FJC) model to many extension-force segments at once. The Levenberg-Marquardt iterations run on every segment of a batch together as NumPy array operations, and large maps are split into batches fitted in worker processes. The results have the columns of a chain fit export (Filename, Index, Bending Length [m], Contour Length [m], Residual RMS [N] and Breaking Force [N]), so they can be saved with save_chain_fit_export and analysed like the exports of the JPK software.
+
+The bending length is the persistence length of the WLC model or the Kuhn length of the FJC model. Forces are positive when the chain is stretched.
+
+Example:
+    segments_df = simulate_segments([400e-12, 800e-12], [1e-6, 2e-6])
+    chain_fit_df = fit_segment_frame(segments_df, model="wlc")
+"""
+from functools import partial
+import numpy as np
+import pandas as pd
+import reader
+
+BOLTZMANN_CONSTANT = 1.380649e-23
+DEFAULT_TEMPERATURE = 298.15
+
+# Number of segments fitted together in a worker process
+DEFAULT_BATCH_SIZE = 20_000
+
+# Contour lengths tried as initial guesses, relative to the largest extension of each segment
+INITIAL_CONTOUR_LENGTH_RATIOS = (1.01, 1.05, 1.2, 1.5, 2.0, 3.0)
+
+CHAIN_FIT_COLUMNS = list(reader.CHAIN_FIT_SCHEMA)
+
+
+def wlc_force(extension, persistence_length, contour_length, kT):
+    """
+    This function evaluates the Marko-Siggia interpolation of the worm-like chain model.
+
+    Parameters:
+    extension (numpy.ndarray): The extensions [m].
+    persistence_length (numpy.ndarray): The persistence lengths [m], broadcast against the extensions.
+    contour_length (numpy.ndarray): The contour lengths [m], broadcast against the extensions.
+    kT (float): The thermal energy [J].
+
+    Returns:
+    force (numpy.ndarray): The forces [N].
+    """
+
+    x = extension / contour_length
+
+    return kT / persistence_length * (0.25 / (1 - x) ** 2 - 0.25 + x)
+
+
+def fjc_force(extension, kuhn_length, contour_length, kT):
+    """
+    This function evaluates the freely jointed chain model, using the Cohen Padé approximation of the inverse Langevin function.
+
+    Parameters:
+    extension (numpy.ndarray): The extensions [m].
+    kuhn_length (numpy.ndarray): The Kuhn lengths [m], broadcast against the extensions.
+    contour_length (numpy.ndarray): The contour lengths [m], broadcast against the extensions.
+    kT (float): The thermal energy [J].
+
+    Returns:
+    force (numpy.ndarray): The forces [N].
+    """
+
+    x = extension / contour_length
+
+    return kT / kuhn_length * x * (3 - x**2) / (1 - x**2)
+
+
+MODELS = {
+    "wlc": wlc_force,
+    "fjc": fjc_force,
+}
+
+
+def _check_model(model):
+    if model not in MODELS:
+        raise ValueError(f"Unknown model {model}, expected one of: {', '.join(MODELS)}")
+
+    return MODELS[model]
+
+
+def pad_segments(extensions, forces):
+    """
+    This function stacks segments of different lengths into padded arrays. Missing points are NaN.
+
+    Parameters:
+    extensions (list): The extensions of each segment [m].
+    forces (list): The forces of each segment [N].
+
+    Returns:
+    (tuple): The padded extensions and forces, both of shape (segments, longest segment).
+    """
+
+    lengths = np.array([len(extension) for extension in extensions], dtype=np.int64)
+
+    padded_extensions = np.full((len(lengths), lengths.max(initial=0)), np.nan)
+    padded_forces = np.full_like(padded_extensions, np.nan)
+
+    # Position of every point in the padded arrays
+    rows = np.repeat(np.arange(len(lengths)), lengths)
+    columns = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+    if len(rows):
+        padded_extensions[rows, columns] = np.concatenate(extensions)
+        padded_forces[rows, columns] = np.concatenate(forces)
+
+    return padded_extensions, padded_forces
+
+
+def _unpack(theta, max_extension):
+    # Fitted in log space, with the contour length kept longer than the largest extension
+    return np.exp(theta[:, 0]), max_extension * (1 + np.exp(theta[:, 1]))
+
+
+def _residuals(function, theta, extension, force, valid, max_extension, kT):
+    bending_length, contour_length = _unpack(theta, max_extension)
+
+    residuals = function(extension, bending_length[:, None], contour_length[:, None], kT) - force
+
+    return np.where(valid, residuals, 0.0)
+
+
+def _initial_guess(function, extension, force, valid, max_extension, kT):
+    # The force is inversely proportional to the bending length, so the best bending length of each trial contour length is found by linear least squares
+    best_theta = np.zeros((len(extension), 2))
+    best_cost = np.full(len(extension), np.inf)
+
+    for ratio in INITIAL_CONTOUR_LENGTH_RATIOS:
+        shape = np.where(valid, function(extension, 1.0, max_extension[:, None] * ratio, kT), 0.0)
+        inverse_bending_length = np.sum(shape * force, axis=1) / np.maximum(np.sum(shape**2, axis=1), np.finfo(float).tiny)
+
+        theta = np.column_stack([-np.log(np.clip(inverse_bending_length, 1e-3, 1e15)), np.full(len(extension), np.log(ratio - 1))])
+        cost = np.sum(_residuals(function, theta, extension, force, valid, max_extension, kT) ** 2, axis=1)
+
+        better = cost < best_cost
+        best_theta[better] = theta[better]
+        best_cost[better] = cost[better]
+
+    return best_theta
+
+
+# Trial steps far from the solution can overflow, they are rejected because their cost is not finite
+@np.errstate(over="ignore", divide="ignore", invalid="ignore")
+def fit_segments(extensions, forces, model="wlc", temperature=DEFAULT_TEMPERATURE, max_iterations=100, tolerance=1e-10):
+    """
+    This function fits a chain model to every segment at once with the Levenberg-Marquardt algorithm. Each segment has its own damping and stops iterating once its cost no longer decreases.
+
+    Parameters:
+    extensions (numpy.ndarray): The extensions [m] of shape (segments, points), padded with NaN (see pad_segments).
+    forces (numpy.ndarray): The forces [N] of the same shape.
+    model (str): The chain model, one of MODELS (wlc or fjc).
+    temperature (float): The temperature [K].
+    max_iterations (int): The maximum number of iterations.
+    tolerance (float): The relative decrease of the cost below which a segment has converged.
+
+    Returns:
+    (tuple): The bending lengths [m], contour lengths [m], residual RMS [N] and breaking forces [N] of the segments. Segments with fewer than 3 points are NaN.
+    """
+
+    function = _check_model(model)
+    kT = BOLTZMANN_CONSTANT * temperature
+
+    extension = np.asarray(extensions, dtype=float)
+    force = np.asarray(forces, dtype=float)
+
+    valid = np.isfinite(extension) & np.isfinite(force)
+    num_points = valid.sum(axis=1)
+    fitted = num_points >= 3
+
+    extension = np.where(valid, extension, 0.0)
+    force = np.where(valid, force, 0.0)
+
+    max_extension = np.where(fitted, np.max(np.where(valid, extension, -np.inf), axis=1, initial=-np.inf), 1.0)
+    max_extension = np.where(max_extension > 0, max_extension, 1.0)
+
+    theta = _initial_guess(function, extension, force, valid, max_extension, kT)
+    cost = np.sum(_residuals(function, theta, extension, force, valid, max_extension, kT) ** 2, axis=1)
+    damping = np.full(len(theta), 1e-3)
+    active = fitted.copy()
+
+    step = 1e-6
+
+    for _ in range(max_iterations):
+        index = np.flatnonzero(active)
+
+        if len(index) == 0:
+            break
+
+        args = (extension[index], force[index], valid[index], max_extension[index], kT)
+
+        residuals = _residuals(function, theta[index], *args)
+
+        # Forward difference Jacobian, one column per parameter
+        columns = []
+
+        for parameter in range(2):
+            shifted = theta[index].copy()
+            shifted[:, parameter] += step
+            columns.append((_residuals(function, shifted, *args) - residuals) / step)
+
+        # The 2x2 normal equations of every segment are solved directly, with Marquardt scaling of the damping by their diagonal
+        a = np.sum(columns[0] ** 2, axis=1) * (1 + damping[index])
+        b = np.sum(columns[0] * columns[1], axis=1)
+        d = np.sum(columns[1] ** 2, axis=1) * (1 + damping[index])
+        g0 = np.sum(columns[0] * residuals, axis=1)
+        g1 = np.sum(columns[1] * residuals, axis=1)
+
+        determinant = a * d - b * b
+        delta = -np.column_stack([d * g0 - b * g1, a * g1 - b * g0]) / determinant[:, None]
+
+        candidate = theta[index] + delta
+        candidate_cost = np.sum(_residuals(function, candidate, *args) ** 2, axis=1)
+
+        improved = np.isfinite(candidate_cost) & (candidate_cost < cost[index])
+
+        converged = improved & ((cost[index] - candidate_cost) <= tolerance * cost[index])
+        stuck = ~improved & (damping[index] > 1e10)
+
+        theta[index[improved]] = candidate[improved]
+        cost[index[improved]] = candidate_cost[improved]
+        damping[index] = np.where(improved, damping[index] / 10, damping[index] * 10)
+
+        active[index[converged | stuck]] = False
+
+    bending_length, contour_length = _unpack(theta, max_extension)
+
+    residual_rms = np.sqrt(cost / np.maximum(num_points, 1))
+
+    # The segment breaks at its largest extension
+    last = np.argmax(np.where(valid, extension, -np.inf), axis=1)
+    breaking_force = force[np.arange(len(force)), last]
+
+    not_fitted = ~fitted
+
+    return tuple(np.where(not_fitted, np.nan, values) for values in (bending_length, contour_length, residual_rms, breaking_force))
+
+
+def _fit_batch(batch, model, temperature, max_iterations):
+    return fit_segments(*batch, model=model, temperature=temperature, max_iterations=max_iterations)
+
+
+def fit_segment_frame(segments_df, model="wlc", temperature=DEFAULT_TEMPERATURE, max_iterations=100, workers=1, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    This function fits a chain model to every segment of a dataframe of force curve points, in batches fitted in parallel when more than one worker is requested.
+
+    Parameters:
+    segments_df (pandas.DataFrame): One row per point, with the columns of reader.SEGMENT_SCHEMA. A segment is identified by its Filename (the force curve) and Index. Points missing either are left out.
+    model (str): The chain model, one of MODELS (wlc or fjc).
+    temperature (float): The temperature [K].
+    max_iterations (int): The maximum number of iterations.
+    workers (int): The number of worker processes to use.
+    batch_size (int): The number of segments fitted together.
+
+    Returns:
+    chain_fit_df (pandas.DataFrame): One row per segment with the columns of a chain fit export, in the order the segments first appear.
+    """
+
+    import data_analysis as da
+
+    _check_model(model)
+
+    # Points without a Filename or Index do not belong to any segment
+    segments_df = segments_df.dropna(subset=["Filename", "Index"])
+
+    # Segments are numbered in order of appearance and their points stay in file order
+    filename_codes, filenames = pd.factorize(segments_df["Filename"])
+    index_codes, indices = pd.factorize(segments_df["Index"])
+    codes, pairs = pd.factorize(filename_codes.astype(np.int64) * len(indices) + index_codes)
+
+    order = np.argsort(codes, kind="stable")
+    lengths = np.bincount(codes, minlength=len(pairs))
+    starts = np.cumsum(lengths) - lengths
+
+    extension = segments_df["Extension [m]"].to_numpy(dtype=float)[order]
+    force = segments_df["Force [N]"].to_numpy(dtype=float)[order]
+
+    batches = []
+
+    for first in range(0, len(pairs), batch_size):
+        last = min(first + batch_size, len(pairs))
+        batch_lengths = lengths[first:last]
+        points = slice(starts[first], starts[last - 1] + batch_lengths[-1])
+
+        batches.append(pad_segments(np.split(extension[points], np.cumsum(batch_lengths)[:-1]), np.split(force[points], np.cumsum(batch_lengths)[:-1])))
+
+    results = da.map_files(partial(_fit_batch, model=model, temperature=temperature, max_iterations=max_iterations), batches, workers)
+
+    columns = [np.concatenate(values) for values in zip(*results)] if results else [np.array([])] * 4
+
+    chain_fit_df = pd.DataFrame({
+        "Filename": pd.Categorical(np.asarray(filenames)[pairs // len(indices)]),
+        "Index": np.asarray(indices)[pairs % len(indices)].astype(np.int32),
+        "Bending Length [m]": columns[0],
+        "Contour Length [m]": columns[1],
+        "Residual RMS [N]": columns[2],
+        "Breaking Force [N]": columns[3],
+    })
+
+    return chain_fit_df[CHAIN_FIT_COLUMNS]
+
+
+def refit_file(file, model="wlc", temperature=DEFAULT_TEMPERATURE, max_iterations=100, workers=1, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    This function reads a file of force curve points and fits a chain model to each of its segments.
+
+    Parameters:
+    file (str): The file to fit, with the columns of reader.SEGMENT_SCHEMA.
+    model (str): The chain model, one of MODELS (wlc or fjc).
+    temperature (float): The temperature [K].
+    max_iterations (int): The maximum number of iterations.
+    workers (int): The number of worker processes to use.
+    batch_size (int): The number of segments fitted together.
+
+    Returns:
+    chain_fit_df (pandas.DataFrame): One row per segment with the columns of a chain fit export.
+    """
+
+    return fit_segment_frame(reader.read_segment_export(file), model, temperature, max_iterations, workers, batch_size)
+
+
+def save_chain_fit_export(chain_fit_df, path):
+    """
+    This function saves fitted segments as a tab separated chain fit export, which can be analysed like the exports of the JPK software.
+
+    Parameters:
+    chain_fit_df (pandas.DataFrame): The fitted segments, as returned by fit_segment_frame.
+    path (str): The file to save.
+    """
+
+    chain_fit_df.to_csv(path, sep="\t", index=False)
+
+
+def simulate_segments(bending_lengths, contour_lengths, model="wlc", temperature=DEFAULT_TEMPERATURE, points=100, max_relative_extension=0.9, noise=0.0, seed=0):
+    """
+    This function creates force curve segments following a chain model with known parameters, for example to check the fits.
+
+    Parameters:
+    bending_lengths (list): The bending length of each segment [m].
+    contour_lengths (list): The contour length of each segment [m].
+    model (str): The chain model, one of MODELS (wlc or fjc).
+    temperature (float): The temperature [K].
+    points (int): The number of points of each segment.
+    max_relative_extension (float): The largest extension of each segment relative to its contour length.
+    noise (float): The standard deviation of the Gaussian noise added to the forces [N].
+    seed (int): The seed of the random noise.
+
+    Returns:
+    segments_df (pandas.DataFrame): One row per point with the columns of reader.SEGMENT_SCHEMA. Segment i belongs to curve curve-<i> and has Index 0.
+    """
+
+    function = _check_model(model)
+    rng = np.random.default_rng(seed)
+
+    bending_lengths = np.asarray(bending_lengths, dtype=float)
+    contour_lengths = np.asarray(contour_lengths, dtype=float)
+
+    extension = contour_lengths[:, None] * np.linspace(0.05, max_relative_extension, points)
+    force = function(extension, bending_lengths[:, None], contour_lengths[:, None], BOLTZMANN_CONSTANT * temperature)
+    force += rng.normal(0, noise, force.shape) if noise else 0
+
+    return pd.DataFrame({
+        "Filename": pd.Categorical(np.repeat([f"curve-{i}" for i in range(len(bending_lengths))], points)),
+        "Index": np.zeros(extension.size, dtype=np.int32),
+        "Extension [m]": extension.ravel(),
+        "Force [N]": force.ravel(),
+    })
@@ -1,7 +1,19 @@
-import matplotlib.pyplot as plt
 import matplotlib as mpl
+import matplotlib.lines
+from matplotlib.figure import Figure
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
+import pandas as pd
+import hashlib
+import json
 import os
+import profiling
+
+# Increase when the appearance of the figures changes so unchanged figures are drawn again
+GRAPH_VERSION = 2
+
+# File in the graphs directory recording the inputs each figure was drawn from
+MANIFEST_NAME = ".figures.json"
 
 
 def create_custom_pie_chart_legend(axis, series, colors = list(mpl.rcParams["axes.prop_cycle"])):    
@@ -31,7 +43,9 @@ def create_pie_chart_set(dictionary, filename, directory):
     directory (str): The directory to save the pie chart in.
     """
     
-    figure, axis = plt.subplots(1, 3, figsize=(8, 3)) 
+    # Figures are created without pyplot so they can be drawn in any thread or process
+    figure = Figure(figsize=(8, 3))
+    axis = figure.subplots(1, 3)
 
     for i, (key, values) in enumerate(dictionary.items()):
         
@@ -42,11 +56,8 @@ def create_pie_chart_set(dictionary, filename, directory):
     figure.tight_layout()
     
     # Output Text
-    plt.rcParams['svg.fonttype'] = 'none'
-    
-    plt.savefig(f"{directory}\\{filename}.svg")
-    
-    plt.close()
+    with mpl.rc_context({'svg.fonttype': 'none'}):
+        figure.savefig(os.path.join(directory, f"{filename}.svg"))
     
 
 def create_sub_dictionaries(dictionary):
@@ -71,13 +82,15 @@ def create_sub_dictionaries(dictionary):
     return new_dict
 
 
-def create_pie_charts_root(dictionary, directory):
+def create_pie_charts_root(dictionary, directory, workers=1, skip_unchanged=False):
     """
     This function generates pie charts for data categorized in the different root sections: maturation, elongation, and cell division. 
     
     Parameters:
     dictionary (dict): The dictionary containing full name as the keys and pandas series as the values. The full names should end with -M, -E, or -CD for the three root sections (ex. 20240713-M). The pie charts would be then saved as 20240713-Pie.svg.
     directory (str): The directory to save the pie charts in.
+    workers (int): The number of worker processes used to draw the pie charts.
+    skip_unchanged (bool): Whether to skip pie charts whose data has not changed since they were last saved.
     """
     
     if not os.path.exists(directory):
@@ -85,6 +98,8 @@ def create_pie_charts_root(dictionary, directory):
     
     names = create_sub_dictionaries(dictionary)
     
+    figures = []
+    
     # Loop through each name and generate pie charts for them
     for name in names:
         
@@ -95,41 +110,62 @@ def create_pie_charts_root(dictionary, directory):
         # Reorder dictionary
         names[name] = {k: names[name][k] for k in ["M", "E", "CD"]}
     
-        create_pie_chart_set(names[name], f"{name}-Pie", directory)
+        figures.append((create_pie_chart_set, (names[name], f"{name}-Pie", directory), {}))
+    
+    render_figures(figures, directory, workers=workers, skip_unchanged=skip_unchanged)
     
 
 
 
 
-def create_histogram_set(dictionary, filename, y_label, directory, x_label, bar_width = 20, x_axis_range=[0,500], colors=["red","cyan","yellow"]):
+def bin_values(values, bins):
+    """
+    This function counts the number of values in each bin of a histogram.
+    
+    Parameters:
+    values (list | pandas.Series): The values to bin.
+    bins (numpy.ndarray): The edges of the bins.
+    
+    Returns:
+    (tuple): The count of each bin and the total number of values, including those outside of the bins.
+    """
+    
+    values = np.asarray(values, dtype=float)
+    
+    counts, _ = np.histogram(values, bins=bins)
+    
+    return counts, values.size
+
+
+def create_histogram_set(dictionary, filename, y_label, directory, x_label, bins, x_axis_range=[0,500], colors=["red","cyan","yellow"]):
     """
-    This function creates a set of three histograms.
+    This function creates a set of three histograms from binned data.
     
     Parameters:
-    dictionary (dict): The dictionary containing the data for the histograms. Should contain three elements.
+    dictionary (dict): The dictionary containing the binned data for the histograms of the format (counts, total), as returned by bin_values. Should contain three elements.
     filename (str): The name of the file to save the histograms as.
     y_label (str): The label for the y-axis can be either "Count" or "Frequency".
     directory (str): The directory to save the histograms in.
     x_label (str): The label for the x-axis.
-    bar_width (int): The width of the bars in the histogram.
-    legend_names (list): The names of the legends for the histograms.
+    bins (numpy.ndarray): The edges of the bins the data was counted in.
     x_axis_range (list): The range of the x-axis.
     colors (list): The list containing colors for each of the three histograms.
     """
     
     legend_names = {"M":"Maturation", "E":"Elongation", "CD":"Cell Division"}
     
-    figure, axis = plt.subplots(3, 1, figsize=(8, 8)) 
+    figure = Figure(figsize=(8, 8))
+    axis = figure.subplots(3, 1)
 
-    for i, (key, values) in enumerate(dictionary.items()):
+    for i, (key, (counts, total)) in enumerate(dictionary.items()):
         
-        # Change the weights based on the y_label
+        # Change the heights based on the y_label
         if(y_label == "Count"):
-            weights = np.ones_like(values)
+            heights = counts
         elif(y_label == "Frequency"):
-            weights = np.ones_like(values) / np.array(values).size
+            heights = counts / max(total, 1)
         
-        axis[i].hist(values, bins=np.arange(x_axis_range[0], x_axis_range[1], bar_width), weights = weights , label=legend_names[key], color=colors[i], edgecolor = "black")
+        axis[i].bar(bins[:-1], heights, width=np.diff(bins), align="edge", label=legend_names[key], color=colors[i], edgecolor = "black")
         
         axis[i].set_xlim(x_axis_range)
         axis[i].legend(loc="upper right")
@@ -140,32 +176,39 @@ def create_histogram_set(dictionary, filename, y_label, directory, x_label, bar_
     figure.tight_layout()
     
     # Adjust y axis
-    plt.setp(axis, ylim=max([a.get_ylim() for a in axis.reshape(-1)]))
+    ylim = max([a.get_ylim() for a in axis.reshape(-1)])
+    for a in axis.reshape(-1):
+        a.set_ylim(ylim)
     
     # Output Text
-    plt.rcParams['svg.fonttype'] = 'none'
-    
-    plt.savefig(f"{directory}\\{filename}.svg")
-    
-    plt.close()
+    with mpl.rc_context({'svg.fonttype': 'none'}):
+        figure.savefig(os.path.join(directory, f"{filename}.svg"))
 
 
-def create_histograms_root(dictionary, directory, x_axis_upper_bound, x_label="Breaking Force (pN)"):
+def create_histograms_root(dictionary, directory, x_axis_upper_bound, x_label="Breaking Force (pN)", bar_width=20, workers=1, skip_unchanged=False):
     """
-    This function creates histograms (one for count and one for frequency) for data categorized in the different root sections: maturation, elongation, and cell division. A final count and frequency histogram is also generated combining all the data.
+    This function creates histograms (one for count and one for frequency) for data categorized in the different root sections: maturation, elongation, and cell division. A final count and frequency histogram is also generated combining all the data. The data is only binned once for both histograms, and the combined data is kept as running bin counts.
     
     Parameters:
     dictionary (dict): The dictionary containing full name as the keys and pandas series as the values. The full names should end with -M, -E, or -CD for the three root sections (ex. 20240713-M).
     directory (str): The directory to save the histograms in.
     x_axis_upper_bound (int): The upper bound of the x-axis.
     x_label (str): The label for the x-axis.
+    bar_width (int): The width of the bars in the histogram.
+    workers (int): The number of worker processes used to draw the histograms.
+    skip_unchanged (bool): Whether to skip histograms whose data has not changed since they were last saved.
     """
     
     if not os.path.exists(directory):
         os.makedirs(directory)
     
+    bins = np.arange(0, x_axis_upper_bound, bar_width)
+    
     # Create dictionary to store combined histogram data
-    final = {"M": [], "E": [], "CD": []}
+    final_counts = {key: np.zeros(max(len(bins) - 1, 0), dtype=np.int64) for key in ["M", "E", "CD"]}
+    final_totals = {key: 0 for key in ["M", "E", "CD"]}
+    
+    figures = []
     
     names = create_sub_dictionaries(dictionary)
     
@@ -175,18 +218,116 @@ def create_histograms_root(dictionary, directory, x_axis_upper_bound, x_label="B
             print(f"Skipping {name} as it does not have all the necessary data.")
             continue
         
-        # Reorder dictionary
-        names[name] = {k: names[name][k] for k in ["M", "E", "CD"]}
+        # Reorder dictionary and bin the data once for both histograms
+        binned = {k: bin_values(names[name][k], bins) for k in ["M", "E", "CD"]}
         
-        create_histogram_set(names[name], f"{name}-Count" , "Count", directory, x_label, x_axis_range=[0,x_axis_upper_bound])
-        create_histogram_set(names[name], f"{name}-Frequency" , "Frequency", directory, x_label, x_axis_range=[0,x_axis_upper_bound])
+        figures.append((create_histogram_set, (binned, f"{name}-Count" , "Count", directory, x_label, bins), {"x_axis_range": [0,x_axis_upper_bound]}))
+        figures.append((create_histogram_set, (binned, f"{name}-Frequency" , "Frequency", directory, x_label, bins), {"x_axis_range": [0,x_axis_upper_bound]}))
         
         # Update combined data
-        for key in names[name]:
-            final[key] += names[name][key]
+        for key, (counts, total) in binned.items():
+            final_counts[key] += counts
+            final_totals[key] += total
+    
+    final = {key: (final_counts[key], final_totals[key]) for key in final_counts}
     
-    create_histogram_set(final, "Final Frequency", "Frequency", directory, x_label, x_axis_range=[0,x_axis_upper_bound])
-    create_histogram_set(final, "Final Count", "Count", directory, x_label, x_axis_range=[0,x_axis_upper_bound])
+    figures.append((create_histogram_set, (final, "Final Frequency", "Frequency", directory, x_label, bins), {"x_axis_range": [0,x_axis_upper_bound]}))
+    figures.append((create_histogram_set, (final, "Final Count", "Count", directory, x_label, bins), {"x_axis_range": [0,x_axis_upper_bound]}))
+    
+    render_figures(figures, directory, workers=workers, skip_unchanged=skip_unchanged)
+
+
+def hash_inputs(value, digest=None):
+    """
+    This function computes a hash of the inputs of a figure. Dictionaries, lists, tuples, pandas series and numpy arrays are hashed by their contents.
+    
+    Parameters:
+    value: The inputs to hash.
+    digest (hashlib.sha1): The hash to update. A new hash is created when this is None.
+    
+    Returns:
+    (str): The hexadecimal hash.
+    """
+    
+    root = digest is None
+    
+    if root:
+        digest = hashlib.sha1()
+    
+    if isinstance(value, dict):
+        digest.update(b"dict")
+        for key, item in value.items():
+            hash_inputs(key, digest)
+            hash_inputs(item, digest)
+    elif isinstance(value, (list, tuple)):
+        digest.update(b"list")
+        for item in value:
+            hash_inputs(item, digest)
+    elif isinstance(value, pd.Series):
+        digest.update(b"series")
+        digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, np.ndarray):
+        digest.update(b"array")
+        digest.update(np.ascontiguousarray(value, dtype=float).tobytes())
+    else:
+        digest.update(repr(value).encode("utf-8"))
+    
+    if root:
+        return digest.hexdigest()
+
+
+def render_figure(figure):
+    function, args, kwargs = figure
+    
+    with profiling.stage(function.__name__, args[1]):
+        function(*args, **kwargs)
+
+
+def render_figures(figures, directory, workers=1, skip_unchanged=False):
+    """
+    This function draws and saves a list of figures, in parallel when more than one worker is requested. The inputs of each figure are recorded so figures whose inputs have not changed can be skipped on the next run.
+    
+    Parameters:
+    figures (list): The list of figures of the format (function, args, kwargs). The second argument must be the name of the saved file.
+    directory (str): The directory the figures are saved in.
+    workers (int): The number of worker processes to use.
+    skip_unchanged (bool): Whether to skip figures whose inputs have not changed since they were last saved.
+    """
+    
+    manifest_path = os.path.join(directory, MANIFEST_NAME)
+    
+    try:
+        with open(manifest_path) as manifest_file:
+            manifest = json.load(manifest_file)
+    except (OSError, ValueError):
+        manifest = {}
+    
+    pending = []
+    keys = {}
+    
+    for function, args, kwargs in figures:
+        filename = args[1]
+        key = hash_inputs([GRAPH_VERSION, function.__name__, list(args), kwargs])
+        
+        if skip_unchanged and manifest.get(filename) == key and os.path.exists(os.path.join(directory, f"{filename}.svg")):
+            continue
+        
+        pending.append((function, args, kwargs))
+        keys[filename] = key
+    
+    if workers is None or workers <= 1 or len(pending) <= 1:
+        for figure in pending:
+            render_figure(figure)
+    else:
+        recorded = profiling.is_enabled()
+        
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as executor:
+            # Stages run in the worker processes are sent back with the results
+            for result in executor.map(profiling.record_in_workers(render_figure) if recorded else render_figure, pending):
+                if recorded:
+                    profiling.add_records(result[1])
     
+    manifest.update(keys)
     
-    
\ No newline at end of file
+    with open(manifest_path, "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=4)
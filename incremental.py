@@ -0,0 +1,308 @@
+from pathlib import Path
+import hashlib
+import json
+import os
+import uuid
+import pandas as pd
+import data_analysis as da
+from cache import CACHE_FORMAT
+
+INDEX_NAME = "index.json"
+
+
+class ResultStore:
+    """
+    A persistent store of per-file analysis results, kept next to the outputs so a directory that keeps receiving new exports can be re-analysed incrementally. Each entry holds the filtered dataframe of a file and, for general files, its interaction count row. The fitting segment counts and breaking forces are compiled from the stored dataframes. An entry is only reused while the file, the settings and the parser version are unchanged.
+
+    Parameters:
+    directory (str): The directory to store the results in.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.index_path = self.directory / INDEX_NAME
+
+        try:
+            with open(self.index_path) as index_file:
+                self.index = json.load(index_file)
+        except (OSError, ValueError):
+            self.index = {}
+
+    @staticmethod
+    def signature(file, settings):
+        """
+        This function creates the signature of a file analysed with the given settings. The stored result of the file is only reused while its signature is unchanged.
+
+        Parameters:
+        file (str): The analysed file.
+        settings (dict): The settings of the analysis (ex. the thresholds).
+
+        Returns:
+        signature (str): The signature.
+        """
+
+        stat = os.stat(file)
+
+        identity = f"{stat.st_mtime_ns}|{stat.st_size}|{da.PARSER_VERSION}|{json.dumps(settings, sort_keys=True)}"
+
+        return hashlib.sha1(identity.encode("utf-8")).hexdigest()
+
+    def entry_name(self, file):
+        return str(Path(file).resolve())
+
+    def path(self, file):
+        return self.directory / f"{hashlib.sha1(self.entry_name(file).encode('utf-8')).hexdigest()}.{CACHE_FORMAT}"
+
+    def is_current(self, file, settings):
+        """
+        This function checks if the stored result of a file is up to date.
+
+        Parameters:
+        file (str): The analysed file.
+        settings (dict): The settings of the analysis.
+
+        Returns:
+        (bool): Whether the stored result can be reused.
+        """
+
+        entry = self.index.get(self.entry_name(file))
+
+        return entry is not None and entry["signature"] == self.signature(file, settings) and self.path(file).exists()
+
+    def get(self, file):
+        """
+        This function returns the stored result of a file.
+
+        Parameters:
+        file (str): The analysed file.
+
+        Returns:
+        (tuple): The filtered dataframe and the extra values stored with it.
+        """
+
+        path = self.path(file)
+
+        if CACHE_FORMAT == "parquet":
+            df = pd.read_parquet(path)
+        else:
+            df = pd.read_pickle(path)
+
+        return df, self.index[self.entry_name(file)].get("extra")
+
+    def put(self, file, settings, df, extra=None):
+        """
+        This function stores the result of a file. The index is only written by save.
+
+        Parameters:
+        file (str): The analysed file.
+        settings (dict): The settings of the analysis.
+        df (pandas.DataFrame): The filtered dataframe.
+        extra (list | dict): Extra values to store with the dataframe. They must be serializable as JSON.
+        """
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        path = self.path(file)
+        temporary_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+
+        if CACHE_FORMAT == "parquet":
+            df.to_parquet(temporary_path)
+        else:
+            df.to_pickle(temporary_path)
+
+        os.replace(temporary_path, path)
+
+        self.index[self.entry_name(file)] = {"signature": self.signature(file, settings), "extra": extra, "outputs": {}}
+
+    def is_saved(self, file, name, path, output_format):
+        """
+        This function checks if an output of a file was saved from its stored result in the given format and is still on disk.
+
+        Parameters:
+        file (str): The analysed file.
+        name (str): The name of the output (ex. filtered).
+        path (pathlib.Path): The path the output is saved to.
+        output_format (str): The format the output is saved in, one of writer.FORMATS.
+
+        Returns:
+        (bool): Whether the output does not need to be saved again.
+        """
+
+        outputs = self.index[self.entry_name(file)].get("outputs", {})
+
+        return outputs.get(name) == {"path": str(Path(path).resolve()), "format": output_format} and Path(path).exists()
+
+    def mark_saved(self, file, name, path, output_format):
+        """
+        This function records that an output of a file was saved from its stored result. The index is only written by save.
+
+        Parameters:
+        file (str): The analysed file.
+        name (str): The name of the output (ex. filtered).
+        path (pathlib.Path): The path the output was saved to.
+        output_format (str): The format the output was saved in, one of writer.FORMATS.
+        """
+
+        self.index[self.entry_name(file)].setdefault("outputs", {})[name] = {"path": str(Path(path).resolve()), "format": output_format}
+
+    def save(self):
+        """
+        This function writes the index of the store.
+        """
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        temporary_path = self.index_path.with_name(f"{INDEX_NAME}.{uuid.uuid4().hex}.tmp")
+
+        with open(temporary_path, "w") as index_file:
+            json.dump(self.index, index_file)
+
+        os.replace(temporary_path, self.index_path)
+
+    def prune(self, files):
+        """
+        This function removes the stored results of the files that are not in the list, for example because they were deleted.
+
+        Parameters:
+        files (list): The list of files to keep.
+        """
+
+        keep = {self.entry_name(file) for file in files}
+
+        for name in [name for name in self.index if name not in keep]:
+            path = self.directory / f"{hashlib.sha1(name.encode('utf-8')).hexdigest()}.{CACHE_FORMAT}"
+
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+            del self.index[name]
+
+
+def save_missing(store, files, results, updated_files, writer):
+    """
+    This function saves the filtered data of the files whose stored result is reused but whose saved filtered data is missing (ex. it was not selected in an earlier run, was deleted or was saved in another format), and records the saved filtered data of every file.
+
+    Parameters:
+    store (ResultStore): The store of per-file results.
+    files (list): The list of files.
+    results (dict): The filtered dataframe of each file.
+    updated_files (list): The files that were analyzed again, whose filtered data was already saved by the writer.
+    writer (writer.OutputWriter): Saves the filtered data. Nothing is saved when this is None.
+    """
+
+    if writer is None:
+        return
+
+    updated_files = set(updated_files)
+
+    for file in files:
+        path = writer.path(file)
+
+        # Changing the output format saves every file again in the new format
+        if file not in updated_files and not store.is_saved(file, "filtered", path, writer.output_format):
+            writer.write(results[file], file)
+
+        store.mark_saved(file, "filtered", path, writer.output_format)
+
+
+def analyse_chain_fit(store, files, max_bending_length, min_bending_length, max_contour_length, min_contour_length, max_residual_rms, apply_filter = True, workers = 1, cache = None, progress = None, writer = None):
+    """
+    This function analyzes the chain fits data like data_analysis.analyse_chain_fit, but only reads the files that are new or changed since they were last stored.
+
+    Parameters:
+    store (ResultStore): The store of per-file results.
+    files (list): The list of files to analyze.
+    max_bending_length (float): The maximum bending length [pm].
+    min_bending_length (float): The minimum bending length [pm].
+    max_contour_length (float): The maximum contour length [nm].
+    min_contour_length (float): The minimum contour length [nm].
+    max_residual_rms (float): The maximum residual RMS [pN].
+    apply_filter (bool): Whether to filter the data.
+    workers (int): The number of worker processes used to read the files.
+    cache (cache.ParsedFileCache): The cache of parsed files. The files are always parsed when this is None.
+    progress (callable): Called with each file once it has been analyzed or loaded from the store.
+    writer (writer.OutputWriter): Saves the filtered data of the files that are analyzed again, and of the other files when it was not saved from their stored result yet. The filtered data is not saved when this is None.
+
+    Returns:
+    (tuple): The filtered data of every file, in the order of the files, and the list of files that were analyzed again.
+    """
+
+    files = list(files)
+    # Thresholds are compared as floats so 25 and 25.0 are the same setting
+    settings = {"mode": "chain_fit", "max_bending_length": float(max_bending_length), "min_bending_length": float(min_bending_length), "max_contour_length": float(max_contour_length), "min_contour_length": float(min_contour_length), "max_residual_rms": float(max_residual_rms), "apply_filter": bool(apply_filter)}
+
+    updated_files = [file for file in files if not store.is_current(file, settings)]
+
+    results = {}
+
+    for (df, file) in da.analyse_chain_fit(updated_files, max_bending_length, min_bending_length, max_contour_length, min_contour_length, max_residual_rms, apply_filter=apply_filter, workers=workers, cache=cache, progress=progress, writer=writer):
+        store.put(file, settings, df)
+        results[file] = df
+
+    for file in files:
+        if file not in results:
+            results[file], _ = store.get(file)
+
+            if progress is not None:
+                progress(file)
+
+    save_missing(store, files, results, updated_files, writer)
+
+    # Results of files that were deleted or are no longer selected are not kept
+    store.prune(files)
+    store.save()
+
+    return [(results[file], file) for file in files], updated_files
+
+
+def analyse_general(store, files, min_position_threshold, workers = 1, cache = None, progress = None, writer = None):
+    """
+    This function analyzes the general data like data_analysis.analyse_general, but only reads the files that are new or changed since they were last stored.
+
+    Parameters:
+    store (ResultStore): The store of per-file results.
+    files (list): The list of files to analyze.
+    min_position_threshold (float): The minimum position threshold [nm].
+    workers (int): The number of worker processes used to read the files.
+    cache (cache.ParsedFileCache): The cache of parsed files. The files are always parsed when this is None.
+    progress (callable): Called with each file once it has been analyzed or loaded from the store.
+    writer (writer.OutputWriter): Saves the filtered data of the files that are analyzed again, and of the other files when it was not saved from their stored result yet. The filtered data is not saved when this is None.
+
+    Returns:
+    (tuple): The filtered data of every file, the interaction count dataframe and the list of files that were analyzed again.
+    """
+
+    files = list(files)
+    settings = {"mode": "general", "min_position_threshold": float(min_position_threshold)}
+
+    updated_files = [file for file in files if not store.is_current(file, settings)]
+
+    results = {}
+
+    filtered_data, interaction_count_df = da.analyse_general(updated_files, min_position_threshold, workers=workers, cache=cache, progress=progress, writer=writer)
+
+    for (df, file), el in zip(filtered_data, interaction_count_df.itertuples(index=False)):
+        # Store the counts as plain Python values so they can be written as JSON
+        el = [value.item() if hasattr(value, "item") else value for value in el]
+        store.put(file, settings, df, el)
+        results[file] = (df, el)
+
+    for file in files:
+        if file not in results:
+            results[file] = store.get(file)
+
+            if progress is not None:
+                progress(file)
+
+    save_missing(store, files, {file: result[0] for file, result in results.items()}, updated_files, writer)
+
+    # Results of files that were deleted or are no longer selected are not kept
+    store.prune(files)
+    store.save()
+
+    filtered_data = [(results[file][0], file) for file in files]
+    interaction_count_df = pd.DataFrame([results[file][1] for file in files], columns=da.INTERACTION_COUNT_COLUMNS)
+
+    return filtered_data, interaction_count_df, updated_files
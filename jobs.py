@@ -0,0 +1,127 @@
+from pathlib import Path
+import threading
+import profiling
+
+
+class JobCancelled(Exception):
+    """
+    Raised inside a job when it has been cancelled.
+    """
+
+
+class Job:
+    """
+    A function run in a background thread that reports its progress and can be cancelled. The function is called with the job as its first argument so it can report progress with advance and update, and stop at the next checkpoint once cancelled.
+
+    Parameters:
+    function (callable): The function to run.
+    args: The positional arguments passed to the function after the job.
+    kwargs: The keyword arguments passed to the function.
+    """
+
+    def __init__(self, function, *args, **kwargs):
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+
+        self.status = "pending"
+        self.total = 0
+        self.completed = 0
+        self.message = ""
+        self.result = None
+        self.error = None
+
+        self._lock = threading.Lock()
+        self._cancel_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.status = "running"
+        self._thread.start()
+        return self
+
+    def _run(self):
+        # The job runs the analysis on behalf of the GUI, so its stages measure memory like those of the main thread
+        profiling.measure_memory_here()
+
+        try:
+            result = self.function(self, *self.args, **self.kwargs)
+        except JobCancelled:
+            self._finish("cancelled", "Cancelled")
+        except Exception as error:
+            self.error = error
+            self._finish("failed", f"Failed: {error}")
+        else:
+            self.result = result
+            self._finish("done", "Done")
+
+    def _finish(self, status, message):
+        with self._lock:
+            self.status = status
+            self.message = message
+
+    def cancel(self):
+        """
+        This function asks the job to stop at its next checkpoint.
+        """
+
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def is_finished(self):
+        return self.status in ("done", "cancelled", "failed")
+
+    def check_cancelled(self):
+        """
+        This function stops the job by raising JobCancelled if it has been cancelled.
+        """
+
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+
+    def set_total(self, total):
+        with self._lock:
+            self.total = total
+            self.completed = 0
+
+    def update(self, message):
+        """
+        This function sets the status message of the job and checks if it has been cancelled.
+
+        Parameters:
+        message (str): The status message.
+        """
+
+        with self._lock:
+            self.message = message
+
+        self.check_cancelled()
+
+    def advance(self, file=None):
+        """
+        This function marks one more step (usually a file) as completed and checks if the job has been cancelled. It can be passed directly as the progress argument of the analysis functions.
+
+        Parameters:
+        file (str): The file that was completed.
+        """
+
+        with self._lock:
+            self.completed += 1
+
+            if file is not None:
+                self.message = f"Processed {Path(file).name} ({self.completed}/{self.total})"
+
+        self.check_cancelled()
+
+    def get_progress(self):
+        """
+        This function returns a consistent snapshot of the progress of the job.
+
+        Returns:
+        (tuple): The number of completed steps, the total number of steps, the status message and the status.
+        """
+
+        with self._lock:
+            return self.completed, self.total, self.message, self.status
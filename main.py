@@ -1,7 +1,12 @@
 import tkinter as tk
-from tkinter import filedialog
-import data_analysis as da
-import graph
+from pathlib import Path
+from tkinter import filedialog, ttk
+import multiprocessing
+import cache
+import jobs
+import profiling
+import session
+import writer
 
 class AFMDataAnalyzer(tk.Tk):
     def __init__(self):
@@ -13,6 +18,12 @@ class AFMDataAnalyzer(tk.Tk):
         self.bar_height = 40
         self.page = None
         
+        # Parsed files and results kept in memory across runs and modes
+        self.session = session.DatasetStore()
+        
+        # Breaking forces and fitting segment counts of the last chain fit run, shown by the plot viewer
+        self.plot_data = None
+        
         self.title("AFM Data Analyser")
         self.geometry(f"{self.width}x{self.height}")
         self.resizable(False, False)
@@ -25,9 +36,29 @@ class AFMDataAnalyzer(tk.Tk):
         menubar.add_cascade(label ='File', menu = file) 
         file.add_command(label ='Analyse General', command = lambda: self.change_mode("General")) 
         file.add_command(label ='Analyse Chainfits', command = lambda: self.change_mode("Chain Fit")) 
+        file.add_command(label ='Chain Fit Threshold Sweep', command = lambda: self.change_mode("Sweep")) 
+        file.add_command(label ='View Plots', command = lambda: self.change_mode("Plots")) 
+        file.add_separator() 
+        file.add_command(label ='Clear Loaded Data', command = self.session.clear)
+        file.add_command(label ='Clear Parsed File Cache', command = lambda: cache.ParsedFileCache().clear())
+        
+        # Memory limit of the loaded data [GB]
+        self.session_limit = tk.IntVar(value = session.DEFAULT_MAX_MEMORY // 1024**3)
+        limit = tk.Menu(file, tearoff = 0)
+        file.add_cascade(label ='Loaded Data Limit', menu = limit)
+        for gigabytes in (1, 2, 4, 8):
+            limit.add_radiobutton(label = f"{gigabytes} GB", value = gigabytes, variable = self.session_limit, command = self.change_session_limit)
+        
         file.add_separator() 
         file.add_command(label ='Exit', command = self.destroy) 
         
+        # Adding Profiling Menu
+        self.record_profile = tk.BooleanVar()
+        profile = tk.Menu(menubar, tearoff = 0)
+        menubar.add_cascade(label ='Profiling', menu = profile)
+        profile.add_checkbutton(label ='Record Timing and Memory', variable = self.record_profile, command = self.toggle_profiling)
+        profile.add_command(label ='Show Report', command = lambda: ProfileReport(self))
+        
         # Adding Help Menu 
         help_ = tk.Menu(menubar, tearoff = 0) 
         menubar.add_cascade(label ='Help', menu = help_) 
@@ -45,6 +76,15 @@ class AFMDataAnalyzer(tk.Tk):
 
         # self.change_mode("Chain Fit")
         
+    def toggle_profiling(self):
+        if self.record_profile.get():
+            profiling.enable()
+        else:
+            profiling.disable()
+    
+    def change_session_limit(self):
+        self.session.set_max_memory(self.session_limit.get() * 1024**3)
+    
     def change_mode(self, mode):
         
         if mode == self.mode:
@@ -59,13 +99,23 @@ class AFMDataAnalyzer(tk.Tk):
                 self.page = GeneralAFM(self.canvas)
             case "Chain Fit":
                 self.page = ChainFit(self.canvas)
+            case "Sweep":
+                self.page = ThresholdSweep(self.canvas)
+            case "Plots":
+                # Imported when first shown so the window opens without loading matplotlib
+                import viewer
+                self.page = viewer.PlotViewer(self.canvas, plot_data=self.plot_data)
             case "Help":
                 self.page = Help(self.canvas)
             case _:
                 raise ValueError("Invalid mode")
         
-        self.canvas.create_window((0, 0), window=self.page, anchor='nw', height=800, width=self.width)
+        # The page keeps its requested height, so the scroll region follows it whenever the page changes size
+        self.canvas.delete('all')
+        self.canvas.create_window((0, 0), window=self.page, anchor='nw', width=self.width)
+        self.page.bind('<Configure>', lambda event: self.canvas.config(scrollregion=self.canvas.bbox('all')))
 
+        self.page.update_idletasks()
         self.canvas.config(scrollregion=self.canvas.bbox('all'))
         
         self.page.bind('<Enter>', self._bound_to_mousewheel)
@@ -92,12 +142,45 @@ class Help(tk.Frame):
         
         text = """
 General Mode: 
-Clicking on the run button will filter out all the data with no interaction, and the units for adhesion and area will be changed to pN and aJ respectively. Only the adhesion and area columns are kept. When the save filtered data checkbox is enabled, it will save the filtered data in a folder called filtered_general_data, and when the save interaction count checkbox is enabled, it will save the interaction counts in a file called interaction_count.csv.
+Clicking on the run button will filter out all the data with no interaction, and the units for adhesion and area will be changed to pN and aJ respectively. Only the filename, adhesion, area, minimum position and fitted segment count columns are read and kept. An Interaction Class column (Specific or Non-specific) is added to the filtered data. When the save filtered data checkbox is enabled, it will save the filtered data in a folder called filtered_general_data, and when the save interaction count checkbox is enabled, it will save the interaction counts in a file called interaction_count.csv.
 
 Chain Fit Mode:
-Clicking on the run button will filter out all the data outside of the expected ranges, and it will adjust the units for bending length, contour length, residual RMS, and breaking force to pm, pm, pN, and pN respectively. The data will be saved in a folder called filtered_chain_fits_data when the save filtered data checkbox is enabled. Likewise breaking_forces.csv and count_num_fitting_segments.csv files will be generated when their respective checkboxes are enabled. 
+Clicking on the run button will filter out all the data outside of the expected ranges, and it will adjust the units for bending length, contour length, residual RMS, and breaking force to pm, pm, pN, and pN respectively. Only the filename, index, bending length, contour length, residual RMS and breaking force columns are read and kept. The data will be saved in a folder called filtered_chain_fits_data when the save filtered data checkbox is enabled. Likewise breaking_forces.csv and count_num_fitting_segments.csv files will be generated when their respective checkboxes are enabled. Only the tables and graphs needed for the enabled checkboxes are computed, and the files are not read at all when none is enabled. 
 
 As of now, the histogram and pie chart feature is only applicable to data collected studying the different root regions: maturation, elongation, and cell division. For successful graph generation, the file names must end with -M, -E, or -CD representing the three root sections (ex. 20240713-M.tsv).
+
+Run and Cancel:
+The analysis runs in the background so the window stays responsive. The progress bar shows how many files have been processed, and the cancel button stops the run after the current file or output.
+
+Only Redraw Graphs With Changed Data:
+Graphs whose data and settings are the same as when they were last saved are not drawn again.
+
+Worker Processes:
+Sets how many files are read, converted and filtered in parallel in both modes, and how many graphs are drawn in parallel. Results are always combined in the order the files were selected.
+
+Cache Parsed Files:
+When enabled, the parsed and unit converted files are stored in a .afm_cache folder in the home directory. Running again with different thresholds then skips reading the text files. A file is parsed again whenever it is modified, and the least recently used files are removed once the cache exceeds 1 GB. Clear Parsed File Cache in the File menu removes every cached file.
+
+View Plots:
+After a chain fit run, View Plots in the File menu shows the breaking force histograms and fitting segment pie charts of each sample (and of all samples combined) in this window, as long as the run saved at least one output. Changing the bin width, the x-axis upper bound or count and frequency redraws the histograms from the kept results without reading or filtering the files again, and nothing is saved to disk.
+
+Loaded Data:
+Files read in any mode are kept in memory for the rest of the session, with the results of the last runs, so switching between General, Chain Fit and the threshold sweep or running again only reads files that are new or were modified. The least recently used files are dropped once they use more memory than the Loaded Data Limit in the File menu (2 GB by default), and Clear Loaded Data frees it all. Files are not kept when streaming or when only analysing new or changed files.
+
+Chain Fit Threshold Sweep Mode:
+Each threshold box accepts a comma separated list of values. The files are read once and every combination of the values is evaluated. The number of remaining rows and the breaking force statistics of each combination are saved in threshold_sweep.csv.
+
+Stream Files in Chunks:
+For exports too large to fit in memory. The files are read one million rows at a time and the filtered data is written as it is read. Worker processes and the cache are not used in this mode, and contour length differences are not available.
+
+Select Folder and Only Analyse New or Changed Files:
+Select Folder lists every .tsv and .txt file in a folder, and the folder is listed again on every run so new exports are included. With Only Analyse New or Changed Files enabled, the results of each file are kept in a .afm_results folder inside the output folder, and only files that are new or modified (or all files, if a threshold changed) are read again. The output tables and graphs are then updated from the kept results.
+
+Profiling:
+When Record Timing and Memory is checked in the Profiling menu, the time, the number of rows going in and out and the approximate peak memory of each step (reading, unit conversion, filtering, saving and drawing each graph) are recorded for every run. Memory is measured for the steps of the running analysis, except the filtered data saved in the background while the next file is read, which shows no memory, and the memory held by Arrow (used for Parquet files) is shown separately. Show Report displays the totals of each step and the slowest files, and can save every recorded step as JSON. Recording slows the analysis down, so it is off by default.
+
+Saved Data Format:
+The filtered data and contour length differences are saved as csv, gzip compressed csv (csv.gz) or Parquet files, one per selected file. The partitioned format saves a single Parquet dataset (ex. filtered.parquet) with one Sample=<file name> folder per file, which can be opened at once with pandas.read_parquet. Contour length differences are saved as <file name>_contour_length_differences files next to the <file name>_filtered files. The files are written in the background while the next file is analysed.
         
         """
 
@@ -105,6 +188,37 @@ As of now, the histogram and pie chart feature is only applicable to data collec
         
         self.text.config(state=tk.DISABLED)
 
+class ProfileReport(tk.Toplevel):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        
+        self.title("Profile Report")
+        
+        self.text = tk.Text(self, height=30, width=100, wrap=tk.NONE, font="TkFixedFont")
+        self.text.grid(row=0, column=0, columnspan=3)
+        
+        tk.Button(self, text="Refresh", command=self.refresh).grid(row=1, column=0)
+        tk.Button(self, text="Save as JSON", command=self.save).grid(row=1, column=1)
+        tk.Button(self, text="Clear", command=self.clear).grid(row=1, column=2)
+        
+        self.refresh()
+    
+    def refresh(self):
+        self.text.config(state=tk.NORMAL)
+        self.text.delete("1.0", tk.END)
+        self.text.insert(tk.END, profiling.format_report())
+        self.text.config(state=tk.DISABLED)
+    
+    def save(self):
+        path = filedialog.asksaveasfilename(parent=self, defaultextension=".json", filetypes=[("JSON", "*.json")])
+        
+        if path:
+            profiling.dump_json(path)
+    
+    def clear(self):
+        profiling.reset()
+        self.refresh()
+
 class GeneralAFM(tk.Frame):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -112,6 +226,10 @@ class GeneralAFM(tk.Frame):
         self.save_filtered_data = tk.BooleanVar()
         self.save_interaction_count = tk.BooleanVar()
         self.save_area_adhesion = tk.BooleanVar()
+        self.use_cache = tk.BooleanVar(value=True)
+        self.stream_files = tk.BooleanVar()
+        self.incremental = tk.BooleanVar()
+        self.parsed_file_cache = cache.ParsedFileCache()
         
         self.columnconfigure(0, weight=1)
 
@@ -123,7 +241,12 @@ class GeneralAFM(tk.Frame):
             tk.Checkbutton(self, text = "Save Filtered Data", variable = self.save_filtered_data),
             tk.Checkbutton(self, text = "Save Interaction Count Data", variable = self.save_interaction_count),
             tk.Checkbutton(self, text = "Save Area and Adhesion Data", variable = self.save_area_adhesion),
-            tk.Button(self, text="Run", command=self.run)
+            InputBox(self, name="Worker Processes: ", default_value="1"),
+            tk.Checkbutton(self, text = "Cache Parsed Files", variable = self.use_cache),
+            tk.Checkbutton(self, text = "Stream Files in Chunks (Large Files)", variable = self.stream_files),
+            tk.Checkbutton(self, text = "Only Analyse New or Changed Files", variable = self.incremental),
+            OptionBox(self, name="Saved Data Format: ", values=writer.FORMATS, default_value=writer.DEFAULT_FORMAT),
+            JobControls(self, command=self.run)
         ]
         
         for i in range(len(self.elements)):
@@ -137,21 +260,33 @@ class GeneralAFM(tk.Frame):
             tk.messagebox.showerror("Error", "No files selected.")
             return
         
-        directory = self.elements[2].get_directory()
-        
-        min_position_threshold = float(self.elements[3].get_input())
-        
-        filtered_data, interaction_count_df = da.analyse_general(files, min_position_threshold)
+        # Widgets can only be read on the main thread, so all inputs are collected before the job starts
+        job = jobs.Job(
+            self.analyse,
+            files,
+            self.elements[2].get_directory(),
+            float(self.elements[3].get_input()),
+            workers=int(self.elements[7].get_input()),
+            parsed_file_cache=self.parsed_file_cache if self.use_cache.get() else None,
+            session=self.winfo_toplevel().session,
+            incremental=self.incremental.get(),
+            stream_files=self.stream_files.get(),
+            save_filtered_data=self.save_filtered_data.get(),
+            output_format=self.elements[-2].get_input(),
+            save_interaction_count=self.save_interaction_count.get(),
+            save_area_adhesion=self.save_area_adhesion.get(),
+        )
+        
+        self.elements[-1].start(job)
+    
+    def analyse(self, job, files, *args, **kwargs):
         
-        if self.save_filtered_data.get():
-            da.save_filtered_dfs(filtered_data, f"{directory}\\filtered_general_data")
+        job.set_total(len(files))
         
-        if self.save_interaction_count.get():
-            interaction_count_df.to_csv(f"{directory}\\interaction_count.csv", index=False)
+        # Imported on the first run so the window opens without loading pandas and matplotlib
+        import pipeline
         
-        if self.save_area_adhesion.get():
-            _, area_adhesion_df = da.compile_parameter(filtered_data, ["Area [aJ]", "Adhesion [pN]"])
-            area_adhesion_df.to_csv(f"{directory}\\area_adhesion.csv", index=False)
+        pipeline.run_general(files, *args, progress=job.advance, status=job.update, **kwargs)
         
 class ChainFit(tk.Frame):
     def __init__(self, *args, **kwargs):
@@ -164,6 +299,11 @@ class ChainFit(tk.Frame):
         self.save_fitting_segment_pie_charts = tk.BooleanVar()
         self.save_contour_length_differences = tk.BooleanVar()
         self.apply_filter = tk.BooleanVar(value=True)
+        self.skip_unchanged_graphs = tk.BooleanVar()
+        self.use_cache = tk.BooleanVar(value=True)
+        self.stream_files = tk.BooleanVar()
+        self.incremental = tk.BooleanVar()
+        self.parsed_file_cache = cache.ParsedFileCache()
         
         self.columnconfigure(0, weight=1)
         
@@ -184,7 +324,13 @@ class ChainFit(tk.Frame):
             tk.Checkbutton(self, text = "Save Number of Fitting Segments Data", variable = self.save_count_num_fitting_segments),
             tk.Checkbutton(self, text = "Save Fitting Segments Pie Charts (Based on Root Regions)", variable = self.save_fitting_segment_pie_charts),
             tk.Checkbutton(self, text = "Save Contour Length Differences", variable = self.save_contour_length_differences),
-            tk.Button(self, text="Run", command=self.run)
+            tk.Checkbutton(self, text = "Only Redraw Graphs With Changed Data", variable = self.skip_unchanged_graphs),
+            InputBox(self, name="Worker Processes: ", default_value="1"),
+            tk.Checkbutton(self, text = "Cache Parsed Files", variable = self.use_cache),
+            tk.Checkbutton(self, text = "Stream Files in Chunks (Large Files)", variable = self.stream_files),
+            tk.Checkbutton(self, text = "Only Analyse New or Changed Files", variable = self.incremental),
+            OptionBox(self, name="Saved Data Format: ", values=writer.FORMATS, default_value=writer.DEFAULT_FORMAT),
+            JobControls(self, command=self.run, on_done=self.keep_plot_data)
         ]
         
         for i in range(len(self.elements)):
@@ -198,40 +344,130 @@ class ChainFit(tk.Frame):
             tk.messagebox.showerror("Error", "No files selected.")
             return
         
-        directory = self.elements[2].get_directory()
-
-        max_bending_length = float(self.elements[4].get_input())
-        min_bending_length = float(self.elements[5].get_input())
-        max_contour_length = float(self.elements[6].get_input())
-        min_contour_length = float(self.elements[7].get_input())
-        max_residual_rms = float(self.elements[8].get_input())
+        if self.save_contour_length_differences.get() and self.stream_files.get():
+            tk.messagebox.showwarning("Warning", "Contour length differences are not available when streaming files in chunks.")
+        
+        # Widgets can only be read on the main thread, so all inputs are collected before the job starts
+        job = jobs.Job(
+            self.analyse,
+            files,
+            self.elements[2].get_directory(),
+            float(self.elements[4].get_input()),
+            float(self.elements[5].get_input()),
+            float(self.elements[6].get_input()),
+            float(self.elements[7].get_input()),
+            float(self.elements[8].get_input()),
+            x_axis_upper_bound=float(self.elements[11].get_input()),
+            workers=int(self.elements[17].get_input()),
+            parsed_file_cache=self.parsed_file_cache if self.use_cache.get() else None,
+            session=self.winfo_toplevel().session,
+            incremental=self.incremental.get(),
+            apply_filter=self.apply_filter.get(),
+            stream_files=self.stream_files.get(),
+            save_filtered_data=self.save_filtered_data.get(),
+            output_format=self.elements[-2].get_input(),
+            save_breaking_forces=self.save_breaking_forces.get(),
+            save_breaking_forces_histograms=self.save_breaking_forces_histograms.get(),
+            save_count_num_fitting_segments=self.save_count_num_fitting_segments.get(),
+            save_fitting_segment_pie_charts=self.save_fitting_segment_pie_charts.get(),
+            save_contour_length_differences=self.save_contour_length_differences.get() and not self.stream_files.get(),
+            skip_unchanged_graphs=self.skip_unchanged_graphs.get(),
+        )
+        
+        self.elements[-1].start(job)
+    
+    def analyse(self, job, files, *args, **kwargs):
         
-        filtered_data = da.analyse_chain_fit(files, max_bending_length, min_bending_length, max_contour_length, min_contour_length, max_residual_rms, apply_filter=self.apply_filter.get())
+        job.set_total(len(files))
         
-        if self.save_filtered_data.get():
-            da.save_filtered_dfs(filtered_data, f"{directory}\\filtered_chain_fits_data")
+        # Imported on the first run so the window opens without loading pandas and matplotlib
+        import pipeline
         
-        breaking_forces_dictionary, breaking_forces_df =da.compile_parameter(filtered_data, "Breaking Force [pN]")
+        return pipeline.run_chain_fit(files, *args, progress=job.advance, status=job.update, **kwargs)
+    
+    def keep_plot_data(self, plot_data):
+        # Kept by the app so the plot viewer can show the results after the page is closed
+        self.winfo_toplevel().plot_data = plot_data
+    
         
-        if self.save_breaking_forces.get():
-            breaking_forces_df.to_csv(f"{directory}\\breaking_forces.csv", index=False)
+class ThresholdSweep(tk.Frame):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
         
-        if self.save_breaking_forces_histograms.get():
-            graph.create_histograms_root(breaking_forces_dictionary, f"{directory}\\graphs", float(self.elements[11].get_input()))
+        self.by_file = tk.BooleanVar()
+        self.use_cache = tk.BooleanVar(value=True)
+        self.parsed_file_cache = cache.ParsedFileCache()
         
-        count_num_fitting_segments_dictionary, count_num_fitting_segments_df = da.count_fitting_segments(filtered_data)
-
-        if(self.save_count_num_fitting_segments.get()):
-            count_num_fitting_segments_df.to_csv(f"{directory}\\count_num_fitting_segments.csv", index=False)
+        self.columnconfigure(0, weight=1)
+        
+        self.elements=[
+            tk.Label(self, text="Chain Fit Threshold Sweep (Comma Separated Values)"),
+            FileSelector(self),
+            DirectorySelector(self),
+            InputBox(self, name="Max Bending Length [pm]: ", default_value="4000"),
+            InputBox(self, name="Min Bending Length [pm]: ", default_value="20"),
+            InputBox(self, name="Max Contour Length [nm]: ", default_value="5000"),
+            InputBox(self, name="Min Contour Length [nm]: ", default_value="300"),
+            InputBox(self, name="Max Residual RMS [pN]: ", default_value="15, 20, 25"),
+            tk.Checkbutton(self, text = "Summarise Each File Separately", variable = self.by_file),
+            InputBox(self, name="Worker Processes: ", default_value="1"),
+            tk.Checkbutton(self, text = "Cache Parsed Files", variable = self.use_cache),
+            JobControls(self, command=self.run)
+        ]
+        
+        for i in range(len(self.elements)):
+            self.elements[i].grid(row=i, column=0)
+            self.grid_rowconfigure(i, minsize=40)
+    
+    def run(self):
+        files = self.elements[1].get_files()
         
-        if(self.save_fitting_segment_pie_charts.get()):
-            graph.create_pie_charts_root(count_num_fitting_segments_dictionary, f"{directory}\\graphs")
+        if len(files) == 0:
+            tk.messagebox.showerror("Error", "No files selected.")
+            return
         
-        if self.save_contour_length_differences.get():
-            contour_length_differences_data = da.get_contour_length_differences(filtered_data)
-            da.save_filtered_dfs(contour_length_differences_data, f"{directory}\\filtered_chain_fits_data")
+        # Widgets can only be read on the main thread, so all inputs are collected before the job starts
+        job = jobs.Job(
+            self.analyse,
+            files,
+            self.elements[2].get_directory(),
+            parse_values(self.elements[3].get_input()),
+            parse_values(self.elements[4].get_input()),
+            parse_values(self.elements[5].get_input()),
+            parse_values(self.elements[6].get_input()),
+            parse_values(self.elements[7].get_input()),
+            by_file=self.by_file.get(),
+            workers=int(self.elements[9].get_input()),
+            parsed_file_cache=self.parsed_file_cache if self.use_cache.get() else None,
+            session=self.winfo_toplevel().session,
+        )
+        
+        self.elements[-1].start(job)
     
+    def analyse(self, job, files, *args, **kwargs):
+        
+        job.set_total(len(files))
+        
+        # Imported on the first run so the window opens without loading pandas and matplotlib
+        import pipeline
         
+        pipeline.run_sweep(files, *args, progress=job.advance, status=job.update, **kwargs)
+
+
+def parse_values(text):
+    """
+    This function converts comma separated numbers to a list of floats.
+    
+    Parameters:
+    text (str): The comma separated numbers (ex. 15, 20, 25).
+    
+    Returns:
+    values (list): The list of numbers.
+    """
+    
+    return [float(value) for value in text.split(",") if value.strip()]
+
+
 class FileSelector(tk.Frame):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -252,18 +488,45 @@ class FileSelector(tk.Frame):
         self.grid_rowconfigure(0, weight=1)
         self.grid_columnconfigure(0, weight=1)
         
-        self.file_button = tk.Button(self, text="Select Files", command=self.select_file)
-        self.file_button.grid(row=2, column=0, columnspan=2)
+        # Files are either selected one by one or taken from a folder that is listed again on every run
+        self.folder = None
+        
+        self.button_frame = tk.Frame(self)
+        self.button_frame.grid(row=2, column=0, columnspan=2)
+        
+        self.file_button = tk.Button(self.button_frame, text="Select Files", command=self.select_file)
+        self.file_button.grid(row=0, column=0)
+        
+        self.folder_button = tk.Button(self.button_frame, text="Select Folder", command=self.select_folder)
+        self.folder_button.grid(row=0, column=1)
         
     def select_file(self):
         files = filedialog.askopenfilenames(filetypes=[("File Types:", "*.tsv *.txt")])
 
+        self.folder = None
+        self.show_files(files)
+    
+    def select_folder(self):
+        folder = filedialog.askdirectory()
+        
+        if folder:
+            self.folder = folder
+            self.show_files(self.list_folder())
+    
+    def list_folder(self):
+        return sorted(str(path) for pattern in ("*.tsv", "*.txt") for path in Path(self.folder).glob(pattern))
+    
+    def show_files(self, files):
         self.list_box.delete(0, tk.END)
 
         for file in files:
             self.list_box.insert(tk.END, file)
     
     def get_files(self):
+        if self.folder is not None:
+            # Pick up the exports added to the folder since it was selected
+            self.show_files(self.list_folder())
+        
         return self.list_box.get(0, tk.END)
 
 class DirectorySelector(tk.Frame):
@@ -303,6 +566,101 @@ class InputBox(tk.Frame):
     def get_input(self):
         return self.entry.get()
 
+class OptionBox(tk.Frame):
+    def __init__(self, *args, name="Option: ", values=(), default_value=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        
+        self.label = tk.Label(self, text=name)
+        self.label.grid(row=0, column=0)
+        
+        values = list(values)
+        
+        self.combobox = ttk.Combobox(self, values=values, state="readonly", width=17)
+        self.combobox.set(default_value if default_value != None else values[0])
+        self.combobox.grid(row=0, column=1)
+        
+    def get_input(self):
+        return self.combobox.get()
+
+class JobControls(tk.Frame):
+    def __init__(self, *args, command=None, on_done=None, poll_interval=100, **kwargs):
+        super().__init__(*args, **kwargs)
+        
+        self.job = None
+        self.on_done = on_done
+        self.after_id = None
+        self.poll_interval = poll_interval
+        
+        self.run_button = tk.Button(self, text="Run", command=command)
+        self.run_button.grid(row=0, column=0)
+        
+        self.cancel_button = tk.Button(self, text="Cancel", command=self.cancel, state=tk.DISABLED)
+        self.cancel_button.grid(row=0, column=1)
+        
+        self.progress_bar = ttk.Progressbar(self, length=300, mode="determinate")
+        self.progress_bar.grid(row=1, column=0, columnspan=2)
+        
+        self.label = tk.Label(self, text="")
+        self.label.grid(row=2, column=0, columnspan=2)
+    
+    def is_running(self):
+        return self.job is not None and not self.job.is_finished()
+    
+    def start(self, job):
+        if self.is_running():
+            return
+        
+        self.job = job
+        
+        self.run_button.config(state=tk.DISABLED)
+        self.cancel_button.config(state=tk.NORMAL)
+        self.label.config(text="Starting")
+        
+        job.start()
+        
+        # Tk widgets can only be updated from the main thread, so the job is polled instead of reporting back directly
+        self.after_id = self.after(self.poll_interval, self.poll)
+    
+    def cancel(self):
+        if self.is_running():
+            self.job.cancel()
+            self.label.config(text="Cancelling")
+    
+    def poll(self):
+        completed, total, message, status = self.job.get_progress()
+        
+        self.progress_bar.config(maximum=max(total, 1), value=completed)
+        self.label.config(text=message)
+        
+        if status in ("done", "cancelled", "failed"):
+            self.finish()
+        else:
+            self.after_id = self.after(self.poll_interval, self.poll)
+    
+    def finish(self):
+        self.after_id = None
+        
+        self.run_button.config(state=tk.NORMAL)
+        self.cancel_button.config(state=tk.DISABLED)
+        
+        if self.job.status == "failed":
+            tk.messagebox.showerror("Error", str(self.job.error))
+        elif self.job.status == "done" and self.on_done is not None:
+            self.on_done(self.job.result)
+    
+    def destroy(self):
+        # Stop the job and polling when the page is closed
+        if self.job is not None:
+            self.job.cancel()
+        
+        if self.after_id is not None:
+            self.after_cancel(self.after_id)
+        
+        super().destroy()
+
 if __name__ == "__main__":
+    # Required for worker processes in the frozen (PyInstaller) build
+    multiprocessing.freeze_support()
+    
     app = AFMDataAnalyzer()
     app.mainloop()
\ No newline at end of file
@@ -1,5 +1,40 @@
 # -*- mode: python ; coding: utf-8 -*-
 
+# Modules that are installed alongside pandas and matplotlib but never used by the app
+excludes = [
+    'IPython',
+    'jupyter_client',
+    'notebook',
+    'PyQt5',
+    'PyQt6',
+    'PySide2',
+    'PySide6',
+    'wx',
+    'gi',
+    'scipy',
+    'sympy',
+    'numba',
+    'polars',
+    'sqlalchemy',
+    'psycopg2',
+    'pytest',
+    'sphinx',
+    'docutils',
+    'setuptools',
+    'pip',
+    'tkinter.test',
+    'numpy.f2py',
+    'numpy.tests',
+    'pandas.tests',
+    'matplotlib.tests',
+    'matplotlib.backends.backend_qtagg',
+    'matplotlib.backends.backend_qtcairo',
+    'matplotlib.backends.backend_webagg',
+    'matplotlib.backends.backend_wx',
+    'matplotlib.backends.backend_wxagg',
+    'matplotlib.backends.backend_gtk3agg',
+    'matplotlib.backends.backend_gtk4agg',
+]
 
 a = Analysis(
     ['main.py'],
@@ -10,25 +45,24 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=excludes,
     noarchive=False,
-    optimize=0,
+    # Strips asserts and docstrings. pandas, numpy and matplotlib support running with -OO.
+    optimize=2,
 )
 pyz = PYZ(a.pure)
 
+# One-dir build: the libraries are kept unpacked next to the executable instead of being extracted to a temporary folder on every launch
 exe = EXE(
     pyz,
     a.scripts,
-    a.binaries,
-    a.datas,
     [],
+    exclude_binaries=True,
     name='main',
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
+    upx=False,
     console=False,
     disable_windowed_traceback=False,
     argv_emulation=False,
@@ -36,3 +70,14 @@ exe = EXE(
     codesign_identity=None,
     entitlements_file=None,
 )
+
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    # Compressed binaries have to be decompressed on every launch
+    upx=False,
+    upx_exclude=[],
+    name='main',
+)
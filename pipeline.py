@@ -0,0 +1,407 @@
+import os
+import data_analysis as da
+import incremental as inc
+import writer
+
+# Directory inside the output directory holding the per-file results of incremental runs
+RESULT_STORE_DIRECTORY = ".afm_results"
+
+
+class Products:
+    """
+    The named products of a run (ex. filtered data, tables and graphs) and the products each is computed from. A product is only computed when it is requested, directly or by a product depending on it, and is then kept for the rest of the run.
+    """
+
+    def __init__(self):
+        self.rules = {}
+        self.values = {}
+
+    def add(self, name, function, *dependencies):
+        """
+        This function declares a product.
+
+        Parameters:
+        name (str): The name of the product.
+        function (callable): Computes the product. Called with the values of the dependencies, in order.
+        dependencies (str): The names of the products it is computed from.
+        """
+
+        self.rules[name] = (function, dependencies)
+
+    def get(self, name):
+        """
+        This function returns a product, computing it and the products it depends on first if necessary.
+
+        Parameters:
+        name (str): The name of the product.
+
+        Returns:
+        The value of the product.
+        """
+
+        if name not in self.values:
+            function, dependencies = self.rules[name]
+            self.values[name] = function(*[self.get(dependency) for dependency in dependencies])
+
+        return self.values[name]
+
+    def is_computed(self, name):
+        return name in self.values
+
+    def is_ready(self, name):
+        """
+        This function checks if a product can be returned without reading the files again: it was computed, or every product it is computed from is ready.
+
+        Parameters:
+        name (str): The name of the product.
+
+        Returns:
+        (bool): Whether the product is ready.
+        """
+
+        if name in self.values:
+            return True
+
+        function, dependencies = self.rules[name]
+
+        # Products computed from nothing read the files
+        return bool(dependencies) and all(self.is_ready(dependency) for dependency in dependencies)
+
+
+def _replay(filtered_data, progress=None, filtered_writer=None):
+    # Reports and saves the files of a result taken from the session store as if they had just been analyzed
+    for df, file in filtered_data:
+        if filtered_writer is not None:
+            filtered_writer.write(df, file)
+
+        if progress is not None:
+            progress(file)
+
+
+def run_general(files, directory, min_position_threshold, workers=1, parsed_file_cache=None, session=None, backend=da.DEFAULT_BACKEND, incremental=False, stream_files=False, save_filtered_data=False, output_format=writer.DEFAULT_FORMAT, save_interaction_count=False, save_area_adhesion=False, tidy_tables=False, progress=None, status=None):
+    """
+    This function runs the general analysis and saves the selected outputs. It is shared by the GUI and the command line.
+
+    Parameters:
+    files (list): The list of files to analyze.
+    directory (str): The directory to save the outputs in.
+    min_position_threshold (float): The minimum position threshold [nm].
+    workers (int): The number of worker processes used to read the files.
+    parsed_file_cache (cache.ParsedFileCache): The cache of parsed files. The files are always parsed when this is None.
+    session (session.DatasetStore): The store keeping the parsed files and results in memory between runs. Not used in incremental or streaming mode.
+    backend (str): The dataframe library the analysis runs on, one of data_analysis.BACKENDS. The polars backend reads the files itself, so the cache and the session are not used with it. Not used in incremental or streaming mode.
+    incremental (bool): Whether to keep the per-file results in the output directory and only analyze the files that are new or changed since the last run. Ignored when streaming.
+    stream_files (bool): Whether to read the files in chunks.
+    save_filtered_data (bool): Whether to save the filtered data.
+    output_format (str): The format of the saved filtered data, one of writer.FORMATS (csv, csv.gz, parquet or partitioned).
+    save_interaction_count (bool): Whether to save the interaction counts.
+    save_area_adhesion (bool): Whether to save the area and adhesion data.
+    tidy_tables (bool): Whether to save the area and adhesion data in long format (Sample, Region, Parameter, Value).
+    progress (callable): Called with each file once it has been analyzed.
+    status (callable): Called with a message before each output is saved.
+    """
+
+    status = status or (lambda message: None)
+
+    filtered_directory = os.path.join(directory, "filtered_general_data")
+
+    # Incremental and streaming runs read the files with pandas
+    if incremental or stream_files:
+        backend = "pandas"
+
+    if stream_files:
+        # The filtered data is written while the files are read
+        filtered_data, interaction_count_df = da.stream_general(files, min_position_threshold, directory=filtered_directory if save_filtered_data else None, progress=progress, output_format=output_format)
+    else:
+        # The filtered data of each file is written in the background while the next file is analyzed
+        filtered_writer = writer.OutputWriter(filtered_directory, output_format) if save_filtered_data else None
+
+        try:
+            if incremental:
+                # The filtered data saved by an earlier run is only written again if it is missing
+                store = inc.ResultStore(os.path.join(directory, RESULT_STORE_DIRECTORY, "general"))
+                filtered_data, interaction_count_df, _ = inc.analyse_general(store, files, min_position_threshold, workers=workers, cache=parsed_file_cache, progress=progress, writer=filtered_writer)
+            elif backend != "pandas":
+                filtered_data, interaction_count_df = da.analyse_general(files, min_position_threshold, progress=progress, writer=filtered_writer, backend=backend)
+            elif session is not None:
+                key = session.result_key("general", files, da.GENERAL_PARSER, {"min_position_threshold": float(min_position_threshold)})
+                result = session.get(key)
+
+                if result is None:
+                    # Only the files not parsed earlier in the session are read
+                    session.preload(files, da.GENERAL_PARSER, da.load_general_file, workers, parsed_file_cache, progress)
+                    result = da.analyse_general(files, min_position_threshold, cache=session, writer=filtered_writer)
+                    session.put(key, result)
+                else:
+                    _replay(result[0], progress, filtered_writer)
+
+                filtered_data, interaction_count_df = result
+            else:
+                filtered_data, interaction_count_df = da.analyse_general(files, min_position_threshold, workers=workers, cache=parsed_file_cache, progress=progress, writer=filtered_writer)
+        finally:
+            if filtered_writer is not None:
+                filtered_writer.close()
+
+    os.makedirs(directory, exist_ok=True)
+
+    if save_interaction_count:
+        status("Saving interaction counts")
+        interaction_count_df.to_csv(os.path.join(directory, "interaction_count.csv"), index=False)
+
+    if save_area_adhesion:
+        status("Saving area and adhesion data")
+        _, area_adhesion_df = da.compile_parameter(filtered_data, ["Area [aJ]", "Adhesion [pN]"], tidy=tidy_tables, backend=backend)
+        area_adhesion_df.to_csv(os.path.join(directory, "area_adhesion.csv"), index=False)
+
+
+def run_chain_fit(files, directory, max_bending_length, min_bending_length, max_contour_length, min_contour_length, max_residual_rms, x_axis_upper_bound=500, workers=1, parsed_file_cache=None, session=None, backend=da.DEFAULT_BACKEND, incremental=False, apply_filter=True, stream_files=False, save_filtered_data=False, output_format=writer.DEFAULT_FORMAT, save_breaking_forces=False, save_breaking_forces_histograms=False, save_count_num_fitting_segments=False, save_fitting_segment_pie_charts=False, save_contour_length_differences=False, skip_unchanged_graphs=False, tidy_tables=False, progress=None, status=None):
+    """
+    This function runs the chain fit analysis and saves the selected outputs. It is shared by the GUI and the command line. Matplotlib is only imported when graphs are requested.
+
+    Parameters:
+    files (list): The list of files to analyze.
+    directory (str): The directory to save the outputs in.
+    max_bending_length (float): The maximum bending length [pm].
+    min_bending_length (float): The minimum bending length [pm].
+    max_contour_length (float): The maximum contour length [nm].
+    min_contour_length (float): The minimum contour length [nm].
+    max_residual_rms (float): The maximum residual RMS [pN].
+    x_axis_upper_bound (float): The upper bound of the x-axis of the breaking forces histograms.
+    workers (int): The number of worker processes used to read the files and draw the graphs.
+    parsed_file_cache (cache.ParsedFileCache): The cache of parsed files. The files are always parsed when this is None.
+    session (session.DatasetStore): The store keeping the parsed files and results in memory between runs. Not used in incremental or streaming mode.
+    backend (str): The dataframe library the analysis runs on, one of data_analysis.BACKENDS. The polars backend reads the files itself, so the cache and the session are not used with it. Not used in incremental or streaming mode.
+    incremental (bool): Whether to keep the per-file results in the output directory and only analyze the files that are new or changed since the last run. Only the graphs whose data changed are redrawn. Ignored when streaming.
+    apply_filter (bool): Whether to filter the data.
+    stream_files (bool): Whether to read the files in chunks. Contour length differences are not available in this mode.
+    save_filtered_data (bool): Whether to save the filtered data.
+    output_format (str): The format of the saved filtered data and contour length differences, one of writer.FORMATS (csv, csv.gz, parquet or partitioned).
+    save_breaking_forces (bool): Whether to save the breaking forces.
+    save_breaking_forces_histograms (bool): Whether to save the breaking forces histograms.
+    save_count_num_fitting_segments (bool): Whether to save the number of fitting segments.
+    save_fitting_segment_pie_charts (bool): Whether to save the fitting segments pie charts.
+    save_contour_length_differences (bool): Whether to save the contour length differences.
+    skip_unchanged_graphs (bool): Whether to skip graphs whose data has not changed since they were last saved.
+    tidy_tables (bool): Whether to save the breaking forces in long format (Sample, Region, Parameter, Value).
+    progress (callable): Called with each file once it has been analyzed.
+    status (callable): Called with a message before each output is saved.
+
+    Returns:
+    products (Products): The products of the run. Only the products needed for the selected outputs were computed, the others (ex. breaking_forces for the plot viewer of the GUI) are computed from the kept filtered data when requested.
+    """
+
+    status = status or (lambda message: None)
+
+    filtered_directory = os.path.join(directory, "filtered_chain_fits_data")
+    graphs_directory = os.path.join(directory, "graphs")
+
+    # Only the files analyzed again are saved in incremental mode, so the graphs of the other files are kept
+    if incremental and not stream_files:
+        skip_unchanged_graphs = True
+
+    # Incremental and streaming runs read the files with pandas
+    if incremental or stream_files:
+        backend = "pandas"
+
+    def analyse():
+        if stream_files:
+            # The filtered data is written and the fitting segments are counted while the files are read
+            return da.stream_chain_fit(files, max_bending_length, min_bending_length, max_contour_length, min_contour_length, max_residual_rms, apply_filter=apply_filter, directory=filtered_directory if save_filtered_data else None, progress=progress, output_format=output_format)
+
+        # The filtered data of each file is written in the background while the next file is analyzed
+        filtered_writer = writer.OutputWriter(filtered_directory, output_format) if save_filtered_data else None
+
+        try:
+            if incremental:
+                # The filtered data saved by an earlier run is only written again if it is missing
+                store = inc.ResultStore(os.path.join(directory, RESULT_STORE_DIRECTORY, "chain_fit"))
+                filtered_data, _ = inc.analyse_chain_fit(store, files, max_bending_length, min_bending_length, max_contour_length, min_contour_length, max_residual_rms, apply_filter=apply_filter, workers=workers, cache=parsed_file_cache, progress=progress, writer=filtered_writer)
+            elif backend != "pandas":
+                filtered_data = da.analyse_chain_fit(files, max_bending_length, min_bending_length, max_contour_length, min_contour_length, max_residual_rms, apply_filter=apply_filter, progress=progress, writer=filtered_writer, backend=backend)
+            elif session is not None:
+                settings = {"max_bending_length": float(max_bending_length), "min_bending_length": float(min_bending_length), "max_contour_length": float(max_contour_length), "min_contour_length": float(min_contour_length), "max_residual_rms": float(max_residual_rms), "apply_filter": bool(apply_filter)}
+                key = session.result_key("chain_fit", files, da.CHAIN_FIT_PARSER, settings)
+                filtered_data = session.get(key)
+
+                if filtered_data is None:
+                    # Only the files not parsed earlier in the session are read
+                    session.preload(files, da.CHAIN_FIT_PARSER, da.load_chain_fit_file, workers, parsed_file_cache, progress)
+                    filtered_data = da.analyse_chain_fit(files, max_bending_length, min_bending_length, max_contour_length, min_contour_length, max_residual_rms, apply_filter=apply_filter, cache=session, writer=filtered_writer)
+                    session.put(key, filtered_data)
+                else:
+                    _replay(filtered_data, progress, filtered_writer)
+            else:
+                filtered_data = da.analyse_chain_fit(files, max_bending_length, min_bending_length, max_contour_length, min_contour_length, max_residual_rms, apply_filter=apply_filter, workers=workers, cache=parsed_file_cache, progress=progress, writer=filtered_writer)
+        finally:
+            if filtered_writer is not None:
+                filtered_writer.close()
+
+        return filtered_data
+
+    def save_breaking_forces_table(breaking_forces):
+        status("Saving breaking forces")
+        breaking_forces[1].to_csv(os.path.join(directory, "breaking_forces.csv"), index=False)
+
+    def save_histograms(breaking_forces):
+        import graph
+
+        status("Saving breaking forces histograms")
+        graph.create_histograms_root(breaking_forces[0], graphs_directory, x_axis_upper_bound, workers=workers, skip_unchanged=skip_unchanged_graphs)
+
+    def save_fitting_segments_table(fitting_segments):
+        status("Saving number of fitting segments")
+        fitting_segments[1].to_csv(os.path.join(directory, "count_num_fitting_segments.csv"), index=False)
+
+    def save_pie_charts(fitting_segments):
+        import graph
+
+        status("Saving fitting segments pie charts")
+        graph.create_pie_charts_root(fitting_segments[0], graphs_directory, workers=workers, skip_unchanged=skip_unchanged_graphs)
+
+    def save_contour_length_differences_files(contour_length_differences):
+        status("Saving contour length differences")
+        # Saved with their own suffix so they do not overwrite the filtered data
+        da.save_filtered_dfs(contour_length_differences, filtered_directory, output_format, suffix="contour_length_differences")
+
+    products = Products()
+
+    if stream_files:
+        products.add("streamed", analyse)
+        products.add("filtered_data", lambda streamed: streamed[0], "streamed")
+        products.add("fitting_segments", lambda streamed: streamed[1:], "streamed")
+    else:
+        products.add("filtered_data", analyse)
+        products.add("fitting_segments", lambda filtered_data: da.count_fitting_segments(filtered_data, backend=backend), "filtered_data")
+
+    products.add("breaking_forces", lambda filtered_data: da.compile_parameter(filtered_data, "Breaking Force [pN]", tidy=tidy_tables, backend=backend), "filtered_data")
+    products.add("contour_length_differences", lambda filtered_data: da.get_contour_length_differences(filtered_data, backend=backend), "filtered_data")
+
+    products.add("breaking_forces_table", save_breaking_forces_table, "breaking_forces")
+    products.add("histograms", save_histograms, "breaking_forces")
+    products.add("fitting_segments_table", save_fitting_segments_table, "fitting_segments")
+    products.add("pie_charts", save_pie_charts, "fitting_segments")
+    products.add("contour_length_differences_files", save_contour_length_differences_files, "contour_length_differences")
+
+    selected = {
+        # The filtered data is saved while it is computed
+        "filtered_data": save_filtered_data,
+        "breaking_forces_table": save_breaking_forces,
+        "histograms": save_breaking_forces_histograms,
+        "fitting_segments_table": save_count_num_fitting_segments,
+        "pie_charts": save_fitting_segment_pie_charts,
+        # Contour length differences need every segment, which is not kept when streaming
+        "contour_length_differences_files": save_contour_length_differences and not stream_files,
+    }
+
+    os.makedirs(directory, exist_ok=True)
+
+    for name, requested in selected.items():
+        if requested:
+            products.get(name)
+
+    return products
+
+
+def run_sweep(files, directory, max_bending_lengths, min_bending_lengths, max_contour_lengths, min_contour_lengths, max_residual_rmses, by_file=False, workers=1, parsed_file_cache=None, session=None, progress=None, status=None):
+    """
+    This function evaluates a grid of chain fit filter thresholds and saves the summary as threshold_sweep.csv. It is shared by the GUI and the command line.
+
+    Parameters:
+    files (list): The list of files to analyze.
+    directory (str): The directory to save the summary in.
+    max_bending_lengths (float | list): The maximum bending lengths [pm] to try.
+    min_bending_lengths (float | list): The minimum bending lengths [pm] to try.
+    max_contour_lengths (float | list): The maximum contour lengths [nm] to try.
+    min_contour_lengths (float | list): The minimum contour lengths [nm] to try.
+    max_residual_rmses (float | list): The maximum residual RMS values [pN] to try.
+    by_file (bool): Whether to summarise each file separately.
+    workers (int): The number of worker processes used to read the files.
+    parsed_file_cache (cache.ParsedFileCache): The cache of parsed files. The files are always parsed when this is None.
+    session (session.DatasetStore): The store keeping the parsed files in memory between runs.
+    progress (callable): Called with each file once it has been read.
+    status (callable): Called with a message before each step.
+    """
+
+    status = status or (lambda message: None)
+
+    if session is not None:
+        session.preload(files, da.CHAIN_FIT_PARSER, da.load_chain_fit_file, workers, parsed_file_cache, progress)
+        sweep_df = da.sweep_chain_fit(files, max_bending_lengths, min_bending_lengths, max_contour_lengths, min_contour_lengths, max_residual_rmses, by_file=by_file, cache=session)
+    else:
+        sweep_df = da.sweep_chain_fit(files, max_bending_lengths, min_bending_lengths, max_contour_lengths, min_contour_lengths, max_residual_rmses, by_file=by_file, workers=workers, cache=parsed_file_cache, progress=progress)
+
+    os.makedirs(directory, exist_ok=True)
+
+    status("Saving threshold sweep")
+    sweep_df.to_csv(os.path.join(directory, "threshold_sweep.csv"), index=False)
+
+
+def run_refit(files, directory, model="wlc", temperature=None, workers=1, progress=None, status=None):
+    """
+    This function fits a chain model to the segments of files of force curve points and saves each as a chain fit export with the same file name, so the results can be analysed in Chain Fit mode. It is shared by the GUI and the command line.
+
+    Parameters:
+    files (list): The list of files of force curve points (see reader.SEGMENT_SCHEMA).
+    directory (str): The directory to save the chain fit exports in. Must not be the directory of the files.
+    model (str): The chain model, one of fitting.MODELS (wlc or fjc).
+    temperature (float): The temperature [K]. Uses fitting.DEFAULT_TEMPERATURE when this is None.
+    workers (int): The number of worker processes used to fit the segments of each file.
+    progress (callable): Called with each file once it has been fitted and saved.
+    status (callable): Called with a message before each file is fitted.
+    """
+
+    import fitting
+
+    status = status or (lambda message: None)
+    temperature = fitting.DEFAULT_TEMPERATURE if temperature is None else temperature
+
+    os.makedirs(directory, exist_ok=True)
+
+    for file in files:
+        path = os.path.join(directory, os.path.basename(file))
+
+        if os.path.exists(path) and os.path.samefile(path, file):
+            raise ValueError(f"Saving the fits of {file} would overwrite it, choose another output directory")
+
+        status(f"Fitting {os.path.basename(file)}")
+        fitting.save_chain_fit_export(fitting.refit_file(file, model, temperature, workers=workers), path)
+
+        if progress is not None:
+            progress(file)
+
+
+def run_uv_vis(files, directory, workers=1, parsed_file_cache=None, sheet=None, baseline_windows=None, peak_ranges=None, ratios=None, progress=None, status=None):
+    """
+    This function summarises the UV-Vis spectra of plate reader workbooks and saves the summary as uv_vis_summary.csv. It is shared by the GUI and the command line.
+
+    Parameters:
+    files (list): The list of workbooks.
+    directory (str): The directory to save the summary in.
+    workers (int): The number of worker processes used to read the workbooks.
+    parsed_file_cache (cache.ParsedFileCache): The cache of parsed files. The workbooks are always read when this is None.
+    sheet (str): The name of the sheet holding the spectra. Uses the first sheet when this is None.
+    baseline_windows (tuple): The wavelength windows [nm] used to fit the baseline. Uses uv_vis.DEFAULT_BASELINE_WINDOWS when this is None.
+    peak_ranges (dict): The wavelength ranges [nm] searched for peaks. Uses uv_vis.DEFAULT_PEAK_RANGES when this is None.
+    ratios (tuple): The absorbance ratios [nm]. Uses uv_vis.DEFAULT_RATIOS when this is None.
+    progress (callable): Called with each workbook once it has been read.
+    status (callable): Called with a message before each step.
+    """
+
+    import uv_vis
+
+    status = status or (lambda message: None)
+
+    spectra_data = uv_vis.load_spectra(files, workers=workers, cache=parsed_file_cache, sheet=sheet, progress=progress)
+
+    status("Summarising spectra")
+    summary_df = uv_vis.summarise_spectra(
+        spectra_data,
+        uv_vis.DEFAULT_BASELINE_WINDOWS if baseline_windows is None else baseline_windows,
+        uv_vis.DEFAULT_PEAK_RANGES if peak_ranges is None else peak_ranges,
+        uv_vis.DEFAULT_RATIOS if ratios is None else ratios,
+    )
+
+    os.makedirs(directory, exist_ok=True)
+
+    status("Saving UV-Vis summary")
+    summary_df.to_csv(os.path.join(directory, "uv_vis_summary.csv"), index=False)
@@ -0,0 +1,353 @@
+"""
+Polars implementation of the chain fit and general analyses, used by the functions of data_analysis when they are called with backend="polars".
+
+Every file is read by a single lazy query: the units are adjusted and the chain fit filter is applied while the files are scanned, and the group-bys run on all cores. The collected frame is split into one zero-copy slice per file, so the filtered data keeps the (dataframe, file) format of the pandas backend with polars dataframes. Results are converted to pandas or numpy only at the output boundary (the saved filtered data and the returned tables), with the same values as the pandas backend.
+"""
+import numpy as np
+import pandas as pd
+import polars as pl
+import data_analysis as da
+import profiling
+import reader
+import units
+
+# Column holding the position of the file of each row in the list of files
+FILE_COLUMN = "__file"
+
+# Column holding the int8 interaction class of each curve, as returned by data_analysis.classify_interactions
+CLASS_COLUMN = "__class"
+
+POLARS_TYPES = {
+    "category": pl.Categorical,
+    "int32": pl.Int32,
+    "Int32": pl.Int32,
+    "float64": pl.Float64,
+}
+
+
+def scan_exports(files, schema, new_prefixes, predicate=None, optional_columns=()):
+    """
+    This function creates a lazy query reading the schema columns of every file with adjusted units. Each row is labelled with the position of its file in the list.
+
+    Parameters:
+    files (list): The list of files to read.
+    schema (dict): The columns to read and their types, as in reader.
+    new_prefixes (dict): The new unit prefixes of the columns, as in data_analysis.
+    predicate (callable): Called with a dictionary of the expressions of the columns with adjusted units, returns the expression of the rows to keep. It is applied while the files are read. Every row is kept when this is None.
+    optional_columns (set): The schema columns that may be missing from a file, as in reader.
+
+    Returns:
+    lf (polars.LazyFrame): The query.
+    columns (list): The columns of each file with adjusted units, without the optional columns missing from the file.
+    """
+
+    frames = []
+    columns = []
+
+    for i, file in enumerate(files):
+        # Reading every column as text only parses the header, the schema columns are typed below
+        header = pl.scan_csv(file, separator="\t", infer_schema=False).collect_schema().names()
+
+        missing = [column for column in schema if column not in header and column not in optional_columns]
+
+        if missing:
+            raise ValueError(f"{file} is missing the columns: {', '.join(missing)}")
+
+        present = [column for column in schema if column in header]
+
+        expressions = {}
+
+        for column in present:
+            if column in new_prefixes:
+                factor, new_column = units.compile_prefix_change(column, new_prefixes[column])
+                expressions[new_column] = pl.col(column) * factor if factor != 1 else pl.col(column)
+            else:
+                expressions[column] = pl.col(column)
+
+        lf = pl.scan_csv(file, separator="\t", infer_schema=False, schema_overrides={column: POLARS_TYPES[schema[column]] for column in present})
+
+        if predicate is not None:
+            # Filtering before the columns are selected lets polars apply it inside the scan
+            lf = lf.filter(predicate(expressions))
+
+        frames.append(lf.select(*[expression.alias(name) for name, expression in expressions.items()], pl.lit(i, dtype=pl.UInt32).alias(FILE_COLUMN)))
+        columns.append(list(expressions))
+
+    # Files missing an optional column get nulls in the combined query
+    return pl.concat(frames, how="diagonal"), columns
+
+
+def split_files(df, files, columns):
+    """
+    This function splits a collected frame into the frames of each file, without copying the data.
+
+    Parameters:
+    df (polars.DataFrame): The collected frame, with the rows of each file together and in file order.
+    files (list): The list of files.
+    columns (list): The columns of each file.
+
+    Returns:
+    data (list): The list of data of the format (dataframe, file). Files without rows get an empty frame.
+    """
+
+    counts = np.bincount(df[FILE_COLUMN].to_numpy(), minlength=len(files))
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    return [(df.slice(int(offsets[i]), int(counts[i])).select(columns[i]), file) for i, file in enumerate(files)]
+
+
+def concat_files(data, columns):
+    """
+    This function combines the frames of several files into one lazy query, labelling each row with the position of its file.
+
+    Parameters:
+    data (list): The list of data of the format (dataframe, file).
+    columns (list): The columns to keep.
+
+    Returns:
+    lf (polars.LazyFrame): The query.
+    """
+
+    return pl.concat([df.lazy().select(columns).with_columns(pl.lit(i, dtype=pl.UInt32).alias(FILE_COLUMN)) for i, (df, _) in enumerate(data)], how="vertical_relaxed")
+
+
+def to_pandas(df):
+    """
+    This function converts a frame to pandas at the output boundary, with categorical columns like those of the pandas backend.
+
+    Parameters:
+    df (polars.DataFrame): The frame.
+
+    Returns:
+    df (pandas.DataFrame): The converted frame.
+    """
+
+    pandas_df = df.to_pandas()
+
+    for column, dtype in df.schema.items():
+        if dtype == pl.Categorical:
+            # Polars shares the categories of every file, pandas only has the sorted names of the file
+            categories = pandas_df[column].cat.remove_unused_categories()
+            pandas_df[column] = categories.cat.reorder_categories(sorted(categories.cat.categories))
+        elif isinstance(dtype, pl.Enum):
+            pandas_df[column] = pandas_df[column].cat.as_unordered()
+        elif dtype == pl.Int32:
+            # The integer columns of the exports can have missing values, which pandas reads as nullable integers
+            pandas_df[column] = pandas_df[column].astype("Int32")
+
+    return pandas_df
+
+
+def _finish(data, progress=None, writer=None):
+    # The files are all read by one query, so they are saved and reported once it has been collected
+    for df, file in data:
+        if writer is not None:
+            writer.write(to_pandas(df), file)
+
+        if progress is not None:
+            progress(file)
+
+
+def analyse_chain_fit(files, max_bending_length, min_bending_length, max_contour_length, min_contour_length, max_residual_rms, apply_filter=True, progress=None, writer=None):
+    """
+    This function analyzes the chain fits data of every file in one query, adjusting units and filtering out data that is not within the expected range while the files are read.
+
+    Parameters:
+    files (list): The list of files to analyze.
+    max_bending_length (float): The maximum bending length [pm].
+    min_bending_length (float): The minimum bending length [pm].
+    max_contour_length (float): The maximum contour length [nm].
+    min_contour_length (float): The minimum contour length [nm].
+    max_residual_rms (float): The maximum residual RMS [pN].
+    apply_filter (bool): Whether to filter the data.
+    progress (callable): Called with each file once every file has been analyzed.
+    writer (writer.OutputWriter): Saves the filtered data of each file. The filtered data is not saved when this is None.
+
+    Returns:
+    filtered_data (list): The list of filtered data of the format (polars.DataFrame, file).
+    """
+
+    files = list(files)
+
+    if not files:
+        return []
+
+    def predicate(columns):
+        # Same comparisons as data_analysis.filter_chain_fit, so rows with missing values are dropped too
+        return (columns["Bending Length [pm]"] < max_bending_length) & (columns["Bending Length [pm]"] > min_bending_length) & (columns["Contour Length [nm]"] < max_contour_length) & (columns["Contour Length [nm]"] > min_contour_length) & (columns["Residual RMS [pN]"] < max_residual_rms)
+
+    lf, columns = scan_exports(files, reader.CHAIN_FIT_SCHEMA, da.CHAIN_FIT_PREFIXES, predicate if apply_filter else None)
+
+    with profiling.stage("polars_chain_fit") as stage:
+        df = lf.collect()
+        stage.rows_out = len(df)
+
+    filtered_data = split_files(df, files, columns)
+
+    _finish(filtered_data, progress, writer)
+
+    return filtered_data
+
+
+def classify_interactions(min_position_threshold):
+    """
+    This function returns the expression of the interaction class of each curve, with the same classes as data_analysis.classify_interactions.
+
+    Parameters:
+    min_position_threshold (float): The minimum position threshold [nm].
+
+    Returns:
+    (polars.Expr): The int8 interaction class, an index into INTERACTION_CLASSES or -1 if the curve does not fall into any class.
+    """
+
+    segments = pl.col("Fitted Segment Count")
+    position = pl.col("Minimum Position [nm]")
+
+    single = segments == 1
+
+    # NaN compares as larger than any number in polars, unlike in numpy
+    return (
+        pl.when(segments == 0).then(da.NO_INTERACTION)
+        .when(segments > 1).then(da.SPECIFIC)
+        .when(single & position.is_not_nan() & (position >= min_position_threshold)).then(da.SPECIFIC)
+        .when(single & (position < min_position_threshold)).then(da.NON_SPECIFIC)
+        .otherwise(-1)
+        .cast(pl.Int8)
+    )
+
+
+def analyse_general(files, min_position_threshold, progress=None, writer=None):
+    """
+    This function analyzes the general data of every file in one query. It counts the interactions of each file and filters out the data considered as having no interaction.
+
+    Parameters:
+    files (list): The list of files to analyze.
+    min_position_threshold (float): The minimum position threshold [nm].
+    progress (callable): Called with each file once every file has been analyzed.
+    writer (writer.OutputWriter): Saves the filtered data of each file. The filtered data is not saved when this is None.
+
+    Returns:
+    (tuple): The filtered data of the format (polars.DataFrame, file) and the interaction count dataframe.
+    """
+
+    files = list(files)
+
+    if not files:
+        return [], pd.DataFrame([], columns=da.INTERACTION_COUNT_COLUMNS)
+
+    lf, columns = scan_exports(files, reader.GENERAL_SCHEMA, da.GENERAL_PREFIXES, optional_columns=reader.GENERAL_OPTIONAL_COLUMNS)
+
+    classified = lf.with_columns(classify_interactions(min_position_threshold).alias(CLASS_COLUMN))
+
+    counts = classified.group_by(FILE_COLUMN).agg([(pl.col(CLASS_COLUMN) == i).sum().alias(name) for i, name in enumerate(da.INTERACTION_CLASSES)])
+
+    filtered = (
+        classified
+        .filter(pl.col(CLASS_COLUMN) != da.NO_INTERACTION)
+        .with_columns(pl.col(CLASS_COLUMN).replace_strict(dict(enumerate(da.INTERACTION_CLASSES)), default=None, return_dtype=pl.Enum(da.INTERACTION_CLASSES)).alias("Interaction Class"))
+    )
+
+    # Both queries share the scan of the files, which is only run once
+    with profiling.stage("polars_general") as stage:
+        df, counts_df = pl.collect_all([filtered, counts])
+        stage.rows_out = len(df)
+
+    table = np.zeros((len(files), len(da.INTERACTION_CLASSES)), dtype=np.int64)
+    table[counts_df[FILE_COLUMN].to_numpy()] = counts_df.select(da.INTERACTION_CLASSES).to_numpy()
+
+    interaction_count_df = pd.DataFrame([da.create_interaction_count_row(file, *table[i]) for i, file in enumerate(files)], columns=da.INTERACTION_COUNT_COLUMNS)
+
+    filtered_data = split_files(df, files, [file_columns + ["Interaction Class"] for file_columns in columns])
+
+    _finish(filtered_data, progress, writer)
+
+    return filtered_data, interaction_count_df
+
+
+@profiling.profiled("polars_count_fitting_segments")
+def count_fitting_segments(filtered_data, num_categories=5):
+    """
+    This function counts the number of fitting segments for each file with a single group-by over every file.
+
+    Parameters:
+    filtered_data (list): The list of filtered data of the format (polars.DataFrame, file).
+    num_categories (int): The number of categories. The last category contains all curves with at least this many segments.
+
+    Returns:
+    dictionary (dict): The dictionary containing the count data.
+    count_num_fitting_segments_df (pandas.DataFrame): The dataframe containing the count data.
+    """
+
+    if not filtered_data:
+        return da.compile_fitting_segment_counts([], num_categories)
+
+    curves = (
+        concat_files(filtered_data, ["Filename"])
+        .filter(pl.col("Filename").is_not_null())
+        .group_by(FILE_COLUMN, "Filename")
+        .len()
+        .sort(FILE_COLUMN)
+        .collect()
+    )
+
+    files = [file for _, file in filtered_data]
+    num_fitting_segments = split_files(curves, files, [["len"] for _ in files])
+
+    return da.compile_fitting_segment_counts([(df["len"].to_numpy(), file) for df, file in num_fitting_segments], num_categories)
+
+
+@profiling.profiled("polars_get_contour_length_differences")
+def get_contour_length_differences(filtered_data):
+    """
+    This function calculates the differences in contour length between consecutive fitted segments of each force curve of every file in one query.
+
+    Parameters:
+    filtered_data (list): The list of filtered data of the format (polars.DataFrame, file).
+
+    Returns:
+    contour_length_differences_data (list): The list of contour length differences of the format (pandas.DataFrame, file).
+    """
+
+    if not filtered_data:
+        return []
+
+    filename = pl.col("Filename")
+    contour_length = pl.col("Contour Length [nm]")
+
+    # Sorted by name like the categories of the pandas backend, with the segments of each curve in index order
+    differences = (
+        concat_files(filtered_data, ["Filename", "Index", "Contour Length [nm]"])
+        .with_columns(filename.cast(pl.String))
+        .sort(FILE_COLUMN, "Filename", "Index", maintain_order=True, nulls_last=True)
+        .with_columns((contour_length - contour_length.shift(1)).alias("Contour Length Difference [nm]"))
+        # Only keep differences between consecutive segments belonging to the same curve
+        .filter((filename == filename.shift(1)) & (pl.col(FILE_COLUMN) == pl.col(FILE_COLUMN).shift(1)))
+        .select(FILE_COLUMN, "Filename", "Contour Length Difference [nm]")
+        .collect()
+    )
+
+    files = [file for _, file in filtered_data]
+
+    return [(to_pandas(df), file) for df, file in split_files(differences, files, [["Filename", "Contour Length Difference [nm]"] for _ in files])]
+
+
+def compile_parameter(filtered_data, parameter_names, tidy=False):
+    """
+    This function compiles parameters from the filtered data like data_analysis.compile_parameter, converting only the compiled columns to pandas.
+
+    Parameters:
+    filtered_data (list): The list of filtered data of the format (polars.DataFrame, file).
+    parameter_names (str | list): The name of the parameter(s) to compile.
+    tidy (bool): Whether to return the dataframe in long format with the columns Sample, Region, Parameter and Value.
+
+    Returns:
+    parameters_dict (dict): The dictionary containing the parameter values as numpy arrays.
+    parameters_df (pandas.DataFrame): The dataframe containing all the parameter values.
+    """
+
+    if isinstance(parameter_names, str):
+        parameter_names = [parameter_names]
+
+    columns = [(pd.DataFrame({name: df[name].cast(pl.Float64).to_numpy() for name in parameter_names}), file) for df, file in filtered_data]
+
+    return da.compile_parameter(columns, parameter_names, tidy)
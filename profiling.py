@@ -0,0 +1,382 @@
+"""
+Optional timing and memory instrumentation of the analysis stages.
+
+Stages are wrapped with the stage context manager or the profiled decorator. Profiling is disabled by default, in which case stage returns a shared do-nothing context and nothing is measured. Once enabled, every stage records its wall time, the rows going in and out and the peak memory allocated by Python while it ran (measured with tracemalloc, which slows the run down).
+
+Memory is only measured for the stages running on the thread that owns the run (the main thread, or a thread that called measure_memory_here, ex. a jobs.Job of the GUI), because tracemalloc traces the whole process: stages of other threads (ex. the writes of writer.OutputWriter) would reset the peak of the run. The peaks are approximate, since they still include what other threads allocate at the same time. Arrow allocates its buffers outside of Python, so the memory held by the Arrow memory pool is recorded separately when pyarrow is in use.
+
+Example:
+    profiling.enable()
+    pipeline.run_chain_fit(...)
+    print(profiling.format_report())
+    profiling.dump_json("profile.json")
+"""
+from functools import partial, wraps
+import json
+import sys
+import threading
+import time
+import tracemalloc
+
+_enabled = False
+# Whether enable started tracemalloc, so disable does not stop tracing started by the caller
+_started_tracing = False
+_records = []
+_lock = threading.Lock()
+_local = threading.local()
+
+REPORT_COLUMNS = ["Stage", "Calls", "Seconds", "Rows In", "Rows Out", "Peak Memory [MB]", "Arrow Memory [MB]"]
+
+
+class _NullStage:
+    """
+    The context returned by stage while profiling is disabled. Setting rows_in or rows_out on it has no effect.
+    """
+
+    rows_in = None
+    rows_out = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class Stage:
+    """
+    A measured stage. rows_out (and rows_in if it was not known on entry) can be set inside the with block.
+
+    Parameters:
+    name (str): The name of the stage (ex. read_csv).
+    file (str): The file the stage is working on, if any.
+    rows_in (int): The number of rows going into the stage.
+    """
+
+    def __init__(self, name, file=None, rows_in=None):
+        self.name = name
+        self.file = None if file is None else str(file)
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.peak = 0
+        self.measure_memory = getattr(_local, "measure_memory", threading.current_thread() is threading.main_thread())
+
+    def __enter__(self):
+        stack = _stack()
+
+        if self.measure_memory:
+            # Stages can be nested, so the peak of the enclosing stage is saved before the peak is reset
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, tracemalloc.get_traced_memory()[1])
+
+            tracemalloc.reset_peak()
+
+            self.start_memory = tracemalloc.get_traced_memory()[0]
+            self.start_arrow_memory = _arrow_memory()
+
+        self.start_time = time.perf_counter()
+
+        stack.append(self)
+
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start_time
+
+        stack = _stack()
+        stack.pop()
+
+        peak_memory = arrow_memory = None
+
+        if self.measure_memory:
+            self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, self.peak)
+
+            peak_memory = max(self.peak - self.start_memory, 0)
+            arrow_memory = max(_arrow_memory() - self.start_arrow_memory, 0)
+
+        record = {
+            "stage": self.name,
+            "file": self.file,
+            "seconds": elapsed,
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "peak_memory": peak_memory,
+            "arrow_memory": arrow_memory,
+        }
+
+        with _lock:
+            _records.append(record)
+
+        return False
+
+
+def _stack():
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+
+    return _local.stack
+
+
+def measure_memory_here():
+    """
+    This function makes the stages of the current thread measure memory, for threads running an analysis on behalf of the main thread (ex. a jobs.Job). Stages of other threads than the main thread do not measure memory otherwise.
+    """
+
+    _local.measure_memory = True
+
+
+def _arrow_memory():
+    # pyarrow is not imported just to measure it, since nothing was allocated by Arrow before it was imported
+    pyarrow = sys.modules.get("pyarrow")
+
+    return 0 if pyarrow is None else pyarrow.total_allocated_bytes()
+
+
+def stage(name, file=None, rows_in=None):
+    """
+    This function returns the context manager measuring a stage, or a do-nothing context when profiling is disabled.
+
+    Parameters:
+    name (str): The name of the stage.
+    file (str): The file the stage is working on, if any.
+    rows_in (int): The number of rows going into the stage.
+
+    Returns:
+    (Stage): The context manager. Set its rows_out attribute inside the with block.
+    """
+
+    if not _enabled:
+        return _NULL_STAGE
+
+    return Stage(name, file, rows_in)
+
+
+def profiled(name):
+    """
+    This function returns a decorator measuring every call of a function as a stage. While profiling is disabled the function is called directly.
+
+    Parameters:
+    name (str): The name of the stage.
+
+    Returns:
+    (callable): The decorator.
+    """
+
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+
+            with Stage(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def is_enabled():
+    return _enabled
+
+
+def enable():
+    """
+    This function starts recording the stages. Memory tracing is started if it is not running already.
+    """
+
+    global _enabled, _started_tracing
+
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _started_tracing = True
+
+    _enabled = True
+
+
+def disable():
+    """
+    This function stops recording the stages, and memory tracing if it was started by enable. The recorded stages are kept.
+    """
+
+    global _enabled, _started_tracing
+
+    _enabled = False
+
+    if _started_tracing:
+        tracemalloc.stop()
+        _started_tracing = False
+
+
+def reset():
+    """
+    This function removes the recorded stages.
+    """
+
+    with _lock:
+        _records.clear()
+
+
+def get_records():
+    """
+    This function returns a copy of the recorded stages.
+
+    Returns:
+    records (list): The list of records, one dictionary per stage with the keys stage, file, seconds, rows_in, rows_out, peak_memory [bytes] and arrow_memory [bytes]. The memory is None for the stages that did not run on the main thread or a thread measuring memory (see measure_memory_here).
+    """
+
+    with _lock:
+        return list(_records)
+
+
+def add_records(records):
+    """
+    This function adds stages recorded elsewhere, for example in a worker process.
+
+    Parameters:
+    records (list): The list of records.
+    """
+
+    with _lock:
+        _records.extend(records)
+
+
+def run_recorded(function, file):
+    """
+    This function runs a function in a worker process with profiling enabled and returns the stages it recorded with its result, so they can be added to the records of the main process.
+
+    Parameters:
+    function (callable): The function to run.
+    file (str): The argument of the function.
+
+    Returns:
+    (tuple): The result of the function and its records.
+    """
+
+    reset()
+    enable()
+
+    try:
+        result = function(file)
+    finally:
+        records = get_records()
+        reset()
+
+    return result, records
+
+
+def record_in_workers(function):
+    """
+    This function wraps a function sent to worker processes so the stages it records are returned with its result. See run_recorded.
+
+    Parameters:
+    function (callable): The function to wrap. Must be picklable.
+
+    Returns:
+    (callable): The wrapped function.
+    """
+
+    return partial(run_recorded, function)
+
+
+def summarise(records=None):
+    """
+    This function adds up the records of each stage.
+
+    Parameters:
+    records (list): The list of records. Uses the recorded stages when this is None.
+
+    Returns:
+    rows (list): One row per stage, in the order the stages first ran, with the columns of REPORT_COLUMNS. The rows in and out are None for stages that do not report them, and the memory is None for stages that never measured it.
+    """
+
+    if records is None:
+        records = get_records()
+
+    summary = {}
+
+    for record in records:
+        row = summary.setdefault(record["stage"], [record["stage"], 0, 0.0, None, None, None, None])
+        row[1] += 1
+        row[2] += record["seconds"]
+
+        # Rows are only reported by the stages that know them
+        for i, key in ((3, "rows_in"), (4, "rows_out")):
+            if record[key] is not None:
+                row[i] = (row[i] or 0) + record[key]
+
+        # Memory is only measured on the thread owning the run
+        for i, key in ((5, "peak_memory"), (6, "arrow_memory")):
+            if record.get(key) is not None:
+                row[i] = max(row[i] or 0.0, record[key] / 1024**2)
+
+    return list(summary.values())
+
+
+def format_report(records=None):
+    """
+    This function formats the summary of the stages as a text table, followed by the slowest files.
+
+    Parameters:
+    records (list): The list of records. Uses the recorded stages when this is None.
+
+    Returns:
+    report (str): The report.
+    """
+
+    if records is None:
+        records = get_records()
+
+    if not records:
+        return "No stages were recorded. Enable profiling before running the analysis."
+
+    lines = [f"{REPORT_COLUMNS[0]:<32}{REPORT_COLUMNS[1]:>7}{REPORT_COLUMNS[2]:>10}{REPORT_COLUMNS[3]:>12}{REPORT_COLUMNS[4]:>12}{REPORT_COLUMNS[5]:>18}{REPORT_COLUMNS[6]:>19}"]
+
+    for name, calls, seconds, rows_in, rows_out, peak, arrow in summarise(records):
+        rows_in, rows_out = ("-" if rows is None else rows for rows in (rows_in, rows_out))
+        peak, arrow = ("-" if memory is None else f"{memory:.1f}" for memory in (peak, arrow))
+        lines.append(f"{name:<32}{calls:>7}{seconds:>10.3f}{rows_in:>12}{rows_out:>12}{peak:>18}{arrow:>19}")
+
+    lines += ["", "Memory is approximate and only measured on the thread running the analysis."]
+
+    # Total time spent on each file across its stages
+    file_seconds = {}
+
+    for record in records:
+        if record["file"] is not None:
+            file_seconds[record["file"]] = file_seconds.get(record["file"], 0.0) + record["seconds"]
+
+    if file_seconds:
+        lines += ["", "Slowest files and figures:"]
+
+        for file, seconds in sorted(file_seconds.items(), key=lambda item: -item[1])[:10]:
+            lines.append(f"{seconds:>10.3f} s  {file}")
+
+    return "\n".join(lines)
+
+
+def dump_json(path, records=None):
+    """
+    This function saves the records and their summary as JSON.
+
+    Parameters:
+    path (str): The file to save the report to.
+    records (list): The list of records. Uses the recorded stages when this is None.
+    """
+
+    if records is None:
+        records = get_records()
+
+    summary = [dict(zip(REPORT_COLUMNS, row)) for row in summarise(records)]
+
+    with open(path, "w") as json_file:
+        json.dump({"summary": summary, "records": records}, json_file, indent=2)
@@ -0,0 +1,86 @@
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    ENGINE = "pyarrow"
+except ImportError:
+    ENGINE = "c"
+
+# Columns read from chain fit exports and their types
+CHAIN_FIT_SCHEMA = {
+    "Filename": "category",
+    "Index": "Int32",
+    "Bending Length [m]": "float64",
+    "Contour Length [m]": "float64",
+    "Residual RMS [N]": "float64",
+    "Breaking Force [N]": "float64",
+}
+
+# Columns read from general exports and their types. Filename is optional and only kept to identify curves in the saved data.
+GENERAL_SCHEMA = {
+    "Filename": "category",
+    "Adhesion [N]": "float64",
+    "Area [J]": "float64",
+    "Minimum Position [m]": "float64",
+    "Fitted Segment Count": "Int32",
+}
+
+# Columns of force curve points exported for refitting, one row per point. Index numbers the segments of each curve.
+SEGMENT_SCHEMA = {
+    "Filename": "category",
+    "Index": "int32",
+    "Extension [m]": "float64",
+    "Force [N]": "float64",
+}
+
+# Columns of the general schema that may be missing from an export. Every column of the other schemas is required.
+GENERAL_OPTIONAL_COLUMNS = {"Filename"}
+
+
+def read_export(file, schema, optional_columns=(), engine=ENGINE, chunksize=None):
+    """
+    This function reads a JPK export file, only parsing the columns declared in the schema with their declared types.
+
+    Parameters:
+    file (str): The file to read.
+    schema (dict): The dictionary containing the column names as keys and their types as values.
+    optional_columns (set): The schema columns that may be missing from the file. They are left out of the dataframe when missing.
+    engine (str): The pandas parser engine. Uses pyarrow when it is installed.
+    chunksize (int): The number of rows per chunk. When given, an iterator of dataframes is returned instead of a single dataframe.
+
+    Returns:
+    df (pandas.DataFrame | iterator): The dataframe containing the schema columns, or an iterator of chunks of it.
+    """
+
+    # Only read the header to find out which of the schema columns are present
+    header = pd.read_csv(file, sep="\t", nrows=0).columns
+
+    missing = [column for column in schema if column not in header and column not in optional_columns]
+
+    if missing:
+        raise ValueError(f"{file} is missing the columns: {', '.join(missing)}")
+
+    dtype = {column: schema[column] for column in schema if column in header}
+
+    if chunksize is not None:
+        # The pyarrow engine cannot read in chunks
+        chunks = pd.read_csv(file, sep="\t", usecols=list(dtype), dtype=dtype, engine="c", chunksize=chunksize)
+
+        return (chunk[list(dtype)] for chunk in chunks)
+
+    df = pd.read_csv(file, sep="\t", usecols=list(dtype), dtype=dtype, engine=engine)
+
+    # Keep the schema order regardless of the order of the columns in the file
+    return df[list(dtype)]
+
+
+def read_chain_fit_export(file, chunksize=None):
+    return read_export(file, CHAIN_FIT_SCHEMA, chunksize=chunksize)
+
+
+def read_general_export(file, chunksize=None):
+    return read_export(file, GENERAL_SCHEMA, GENERAL_OPTIONAL_COLUMNS, chunksize=chunksize)
+
+
+def read_segment_export(file, chunksize=None):
+    return read_export(file, SEGMENT_SCHEMA, chunksize=chunksize)
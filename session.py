@@ -0,0 +1,246 @@
+from collections import OrderedDict
+from pathlib import Path
+import os
+import sys
+from functools import partial
+import threading
+
+DEFAULT_MAX_MEMORY = 2 * 1024**3
+
+
+def estimate_size(value):
+    """
+    This function estimates the memory used by a stored value [bytes].
+
+    Parameters:
+    value: A dataframe, an array or a list or tuple of them.
+
+    Returns:
+    size (int): The estimated size.
+    """
+
+    if hasattr(value, "memory_usage"):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum()) if hasattr(usage, "sum") else int(usage)
+
+    if hasattr(value, "nbytes"):
+        return int(value.nbytes)
+
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_size(item) for item in value)
+
+    if isinstance(value, dict):
+        return sum(estimate_size(item) for item in value.values())
+
+    return sys.getsizeof(value)
+
+
+def _load_pair(load_function, file, cache=None):
+    return (file, load_function(file, cache))
+
+
+class DatasetStore:
+    """
+    An in-memory store of parsed files and derived results owned by the app, so the files of a session are parsed once across runs and mode switches. Entries are keyed by the file path, modification time, size and parser, so a modified file is parsed again. The least recently used entries are evicted once the stored values use more than the memory limit.
+
+    It can be passed as the cache of the analysis functions. The stored values stay in the process that owns the store: a store sent to a worker process arrives empty, so files should be parsed in parallel with preload before the analysis runs.
+
+    Parameters:
+    max_memory (int): The maximum memory used by the stored values [bytes].
+    """
+
+    def __init__(self, max_memory=DEFAULT_MAX_MEMORY):
+        self.max_memory = max_memory
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._memory = 0
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        return {"max_memory": self.max_memory}
+
+    def __setstate__(self, state):
+        self.__init__(state["max_memory"])
+
+    @property
+    def memory(self):
+        return self._memory
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def file_key(file, parser):
+        """
+        This function creates the key of a parsed file. The key changes whenever the file is modified.
+
+        Parameters:
+        file (str): The parsed file.
+        parser (str): The name and version of the parser used to read the file (ex. chain_fit-2).
+
+        Returns:
+        key (tuple): The key.
+        """
+
+        stat = os.stat(file)
+
+        return ("file", str(Path(file).resolve()), stat.st_mtime_ns, stat.st_size, parser)
+
+    @classmethod
+    def result_key(cls, name, files, parser, settings):
+        """
+        This function creates the key of a result derived from a list of files. The key changes whenever one of the files is modified or the settings change.
+
+        Parameters:
+        name (str): The name of the result (ex. chain_fit).
+        files (list): The files the result is derived from.
+        parser (str): The name and version of the parser used to read the files.
+        settings (dict): The settings the result depends on (ex. the filter thresholds).
+
+        Returns:
+        key (tuple): The key.
+        """
+
+        return ("result", name, tuple(cls.file_key(file, parser) for file in files), tuple(sorted(settings.items())))
+
+    def get(self, key):
+        """
+        This function returns a stored value and marks it as recently used.
+
+        Parameters:
+        key (tuple): The key of the value.
+
+        Returns:
+        value: The stored value, or None if it is not stored.
+        """
+
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._entries.move_to_end(key)
+
+            return self._entries[key]
+
+    def put(self, key, value, size=None):
+        """
+        This function stores a value and evicts the least recently used values if the memory limit is exceeded. Values larger than the limit are not stored.
+
+        Parameters:
+        key (tuple): The key of the value.
+        value: The value to store. It must not be modified afterwards.
+        size (int): The memory used by the value [bytes]. Estimated when this is None.
+        """
+
+        if size is None:
+            size = estimate_size(value)
+
+        if size > self.max_memory:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._memory -= self._sizes[key]
+
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            self._sizes[key] = size
+            self._memory += size
+
+            self._evict()
+
+    def _evict(self):
+        while self._memory > self.max_memory and self._entries:
+            key, _ = self._entries.popitem(last=False)
+            self._memory -= self._sizes.pop(key)
+
+    def set_max_memory(self, max_memory):
+        """
+        This function changes the memory limit, evicting values if needed.
+
+        Parameters:
+        max_memory (int): The maximum memory used by the stored values [bytes].
+        """
+
+        with self._lock:
+            self.max_memory = max_memory
+            self._evict()
+
+    def clear(self):
+        """
+        This function removes every stored value.
+        """
+
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._memory = 0
+
+    def load(self, file, parser, read_function):
+        """
+        This function returns the parsed dataframe of a file from the store, parsing and storing it first if necessary. It has the same signature as cache.ParsedFileCache.load.
+
+        Parameters:
+        file (str): The file to load.
+        parser (str): The name and version of the parser used to read the file.
+        read_function (callable): The function used to read the file when it is not stored.
+
+        Returns:
+        df (pandas.DataFrame): The parsed dataframe. It is shared, so it must not be modified.
+        """
+
+        key = self.file_key(file, parser)
+        df = self.get(key)
+
+        if df is None:
+            df = read_function(file)
+            self.put(key, df)
+
+        return df
+
+    def preload(self, files, parser, load_function, workers=1, cache=None, progress=None):
+        """
+        This function parses the files that are not stored yet, in parallel when more than one worker is requested, and stores them.
+
+        Parameters:
+        files (list): The list of files.
+        parser (str): The name and version of the parser used to read the files.
+        load_function (callable): The function loading a file, called with the file and the cache (ex. data_analysis.load_chain_fit_file). Must be picklable.
+        workers (int): The number of worker processes to use.
+        cache (cache.ParsedFileCache): The on-disk cache the files are loaded through. The files are always parsed when this is None.
+        progress (callable): Called with each file once it is stored, starting with the files that were already stored. Any exception it raises stops the remaining files from being parsed.
+        """
+
+        import data_analysis as da
+
+        files = list(files)
+        missing = [file for file in files if self.get(self.file_key(file, parser)) is None]
+
+        def store(result):
+            file, df = result
+            self.put(self.file_key(file, parser), df)
+
+        if progress is not None:
+            for file in files:
+                if file not in missing:
+                    progress(file)
+
+        da.map_files(partial(_load_pair, load_function, cache=cache), missing, workers, progress, store)
+
+    def summary(self):
+        """
+        This function describes the contents of the store.
+
+        Returns:
+        (str): The number of stored values, the memory they use and the hit rate.
+        """
+
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups * 100 if lookups else 0
+
+        return f"{len(self)} items, {self.memory / 1024**2:.1f} of {self.max_memory / 1024**2:.0f} MB, {hit_rate:.0f}% hits"
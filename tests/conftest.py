@@ -0,0 +1,58 @@
+import sys
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pytest
+
+# The modules of the app are flat files in the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def write_export(path, df):
+    df.to_csv(path, sep="\t", index=False)
+    return str(path)
+
+
+@pytest.fixture
+def chain_fit_files(tmp_path):
+    """
+    Three small chain fit exports of one sample, in SI units. Some segments fall outside the default thresholds.
+    """
+
+    rng = np.random.default_rng(0)
+    files = []
+
+    for region in ["M", "E", "CD"]:
+        rows = 60
+        files.append(write_export(tmp_path / f"20240101-VFB-{region}.tsv", pd.DataFrame({
+            "Filename": [f"force-save-{i}.jpk-force" for i in rng.integers(0, 15, rows)],
+            "Index": rng.integers(0, 6, rows),
+            "Bending Length [m]": rng.uniform(0, 5e-9, rows),
+            "Contour Length [m]": rng.uniform(0, 6e-6, rows),
+            "Residual RMS [N]": rng.uniform(0, 40e-12, rows),
+            "Breaking Force [N]": rng.uniform(0, 600e-12, rows),
+        })))
+
+    return files
+
+
+@pytest.fixture
+def general_files(tmp_path):
+    """
+    Three small general exports of one sample, in SI units.
+    """
+
+    rng = np.random.default_rng(1)
+    files = []
+
+    for region in ["M", "E", "CD"]:
+        rows = 40
+        files.append(write_export(tmp_path / f"20240101-G-{region}.txt", pd.DataFrame({
+            "Filename": [f"force-save-{i}.jpk-force" for i in range(rows)],
+            "Adhesion [N]": rng.uniform(0, 1e-10, rows),
+            "Area [J]": rng.uniform(0, 1e-17, rows),
+            "Minimum Position [m]": rng.uniform(0, 1e-6, rows),
+            "Fitted Segment Count": rng.integers(0, 4, rows),
+        })))
+
+    return files
@@ -0,0 +1,22 @@
+import afm
+import cache
+
+
+def test_clear_cache_removes_cached_files(chain_fit_files, tmp_path):
+    cache_directory = tmp_path / "cache"
+    arguments = ["chainfit", "--files", *chain_fit_files, "--output", str(tmp_path / "output"), "--breaking-forces", "--cache-dir", str(cache_directory), "--quiet"]
+
+    assert afm.main(arguments) == 0
+    assert len(list(cache_directory.iterdir())) == len(chain_fit_files)
+
+    # An entry of a file that is no longer analysed is only removed by clearing the cache
+    stale = next(cache_directory.iterdir()).with_name(f"stale.{cache.CACHE_FORMAT}")
+    stale.write_bytes(b"")
+
+    assert afm.main(arguments) == 0
+    assert stale.exists()
+
+    assert afm.main(arguments + ["--clear-cache"]) == 0
+    assert not stale.exists()
+    assert len(list(cache_directory.iterdir())) == len(chain_fit_files)
+
@@ -0,0 +1,142 @@
+import pandas as pd
+import pytest
+import data_analysis as da
+import reader
+
+pl = pytest.importorskip("polars")
+polars_analysis = pytest.importorskip("polars_analysis")
+
+THRESHOLDS = (4000, 20, 5000, 300, 25)
+
+
+def assert_frames_equal(expected, actual):
+    # Pandas keeps the names of filtered out curves as unused categories, so categoricals are compared by value
+    pd.testing.assert_frame_equal(expected.reset_index(drop=True), actual.reset_index(drop=True), check_categorical=False, check_dtype=len(expected) > 0)
+    assert [getattr(dtype, "ordered", None) for dtype in expected.dtypes] == [getattr(dtype, "ordered", None) for dtype in actual.dtypes]
+
+
+def assert_data_equal(expected, actual):
+    assert [file for _, file in expected] == [file for _, file in actual]
+
+    for (expected_df, _), (actual_df, _) in zip(expected, actual):
+        assert_frames_equal(expected_df, actual_df if isinstance(actual_df, pd.DataFrame) else polars_analysis.to_pandas(actual_df))
+
+
+def write_text(path, text):
+    path.write_text(text)
+    return str(path)
+
+
+@pytest.fixture
+def edge_chain_fit_files(tmp_path):
+    header = "Filename\tIndex\tBending Length [m]\tContour Length [m]\tResidual RMS [N]\tBreaking Force [N]\n"
+
+    # NaN and empty values (also of the Index), unsorted indices and a file with no rows left after filtering
+    return [
+        write_text(tmp_path / "20240101-VFB-M.tsv", header + "b\t1\t1e-9\t1e-6\t1e-11\t1e-10\nb\t0\t1e-9\t2e-6\t1e-11\t2e-10\na\t0\tNaN\t1e-6\t1e-11\t1e-10\na\t1\t1e-9\t\t1e-11\t1e-10\na\t2\t1e-9\t3e-6\t1e-11\t1e-10\na\t3\t1e-9\t4e-6\tnan\t3e-10\na\t\t1e-9\t5e-6\t1e-11\t1e-10\n"),
+        write_text(tmp_path / "20240101-VFB-E.tsv", "Index\tFilename\tBending Length [m]\tContour Length [m]\tResidual RMS [N]\tBreaking Force [N]\n0\tz\t1e-3\t1e-6\t1e-11\t1e-10\n"),
+    ]
+
+
+@pytest.fixture
+def edge_general_files(tmp_path):
+    # The first file has no Filename column, NaN and empty minimum positions and an empty fitted segment count
+    return [
+        write_text(tmp_path / "20240101-G-M.txt", "Adhesion [N]\tArea [J]\tMinimum Position [m]\tFitted Segment Count\n1e-11\t1e-18\t1e-6\t1\n1e-11\t1e-18\tNaN\t1\n1e-11\t1e-18\t1e-8\t1\n1e-11\t1e-18\t\t1\n1e-11\t1e-18\t1e-6\t0\n1e-11\t1e-18\t1e-6\t3\n1e-11\t1e-18\t1e-6\t\n"),
+        write_text(tmp_path / "20240101-G-E.txt", "Filename\tAdhesion [N]\tArea [J]\tMinimum Position [m]\tFitted Segment Count\nx\t1e-11\t1e-18\t1e-6\t2\n"),
+    ]
+
+
+@pytest.fixture(params=["synthetic", "edge"])
+def chain_fit_inputs(request, chain_fit_files, edge_chain_fit_files):
+    return chain_fit_files if request.param == "synthetic" else edge_chain_fit_files
+
+
+@pytest.fixture(params=["synthetic", "edge"])
+def general_inputs(request, general_files, edge_general_files):
+    return general_files if request.param == "synthetic" else edge_general_files
+
+
+@pytest.mark.parametrize("apply_filter", [True, False])
+def test_analyse_chain_fit(chain_fit_inputs, apply_filter):
+    expected = da.analyse_chain_fit(chain_fit_inputs, *THRESHOLDS, apply_filter=apply_filter)
+    actual = da.analyse_chain_fit(chain_fit_inputs, *THRESHOLDS, apply_filter=apply_filter, backend="polars")
+
+    assert_data_equal(expected, actual)
+
+
+def test_file_without_rows_after_filtering(edge_chain_fit_files):
+    filtered_data = da.analyse_chain_fit(edge_chain_fit_files, *THRESHOLDS, backend="polars")
+
+    assert len(filtered_data[1][0]) == 0
+    assert filtered_data[1][0].columns == ["Filename", "Index", "Bending Length [pm]", "Contour Length [nm]", "Residual RMS [pN]", "Breaking Force [pN]"]
+
+
+def test_count_fitting_segments(chain_fit_inputs):
+    expected = da.count_fitting_segments(da.analyse_chain_fit(chain_fit_inputs, *THRESHOLDS))
+    actual = da.count_fitting_segments(da.analyse_chain_fit(chain_fit_inputs, *THRESHOLDS, backend="polars"), backend="polars")
+
+    assert_frames_equal(expected[1], actual[1])
+    assert expected[0].keys() == actual[0].keys()
+
+
+@pytest.mark.parametrize("apply_filter", [True, False])
+def test_get_contour_length_differences(chain_fit_inputs, apply_filter):
+    expected = da.get_contour_length_differences(da.analyse_chain_fit(chain_fit_inputs, *THRESHOLDS, apply_filter=apply_filter))
+    actual = da.get_contour_length_differences(da.analyse_chain_fit(chain_fit_inputs, *THRESHOLDS, apply_filter=apply_filter, backend="polars"), backend="polars")
+
+    assert_data_equal(expected, actual)
+
+
+@pytest.mark.parametrize("tidy", [False, True])
+def test_compile_parameter(chain_fit_inputs, tidy):
+    expected = da.compile_parameter(da.analyse_chain_fit(chain_fit_inputs, *THRESHOLDS), "Breaking Force [pN]", tidy=tidy)
+    actual = da.compile_parameter(da.analyse_chain_fit(chain_fit_inputs, *THRESHOLDS, backend="polars"), "Breaking Force [pN]", tidy=tidy, backend="polars")
+
+    assert_frames_equal(expected[1], actual[1])
+
+
+def test_analyse_general(general_inputs):
+    expected_data, expected_counts = da.analyse_general(general_inputs, 300)
+    actual_data, actual_counts = da.analyse_general(general_inputs, 300, backend="polars")
+
+    assert_data_equal(expected_data, actual_data)
+    assert_frames_equal(expected_counts, actual_counts)
+
+    expected = da.compile_parameter(expected_data, ["Area [aJ]", "Adhesion [pN]"])
+    actual = da.compile_parameter(actual_data, ["Area [aJ]", "Adhesion [pN]"], backend="polars")
+
+    assert_frames_equal(expected[1], actual[1])
+
+
+def test_missing_optional_filename_column(edge_general_files):
+    filtered_data, _ = da.analyse_general(edge_general_files, 300, backend="polars")
+
+    assert "Filename" not in filtered_data[0][0].columns
+    assert "Filename" in filtered_data[1][0].columns
+
+
+def test_no_files():
+    assert da.analyse_chain_fit([], *THRESHOLDS, backend="polars") == []
+    assert_frames_equal(da.count_fitting_segments([])[1], da.count_fitting_segments([], backend="polars")[1])
+
+
+def test_missing_column_raises_value_error(tmp_path):
+    file = write_text(tmp_path / "20240101-VFB-M.tsv", "Filename\tIndex\n")
+
+    with pytest.raises(ValueError, match="missing the columns"):
+        da.analyse_chain_fit([file], *THRESHOLDS, backend="polars")
+
+
+@pytest.mark.parametrize("backend", ["pandas", "polars"])
+def test_chain_fit_export_without_filename_raises_value_error(tmp_path, backend):
+    header = "\t".join(column for column in reader.CHAIN_FIT_SCHEMA if column != "Filename")
+    file = write_text(tmp_path / "20240101-VFB-M.tsv", f"{header}\n0\t1e-10\t2e-8\t1e-12\t1e-10\n")
+
+    with pytest.raises(ValueError, match="missing the columns: Filename"):
+        da.analyse_chain_fit([file], *THRESHOLDS, backend=backend)
+
+
+def test_unknown_backend(chain_fit_files):
+    with pytest.raises(ValueError, match="Unknown backend"):
+        da.analyse_chain_fit(chain_fit_files, *THRESHOLDS, backend="duckdb")
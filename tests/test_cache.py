@@ -0,0 +1,100 @@
+import os
+import pandas as pd
+import cache
+
+
+def create_files(tmp_path, count):
+    files = []
+
+    for i in range(count):
+        file = tmp_path / f"file{i}.txt"
+        file.write_text(f"{i}\n")
+        files.append(str(file))
+
+    return files
+
+
+def read_file(file):
+    return pd.DataFrame({"Value": [float(line) for line in open(file).read().split()]})
+
+
+def test_cache_reparses_changed_files(tmp_path):
+    parsed = []
+
+    def read_function(file):
+        parsed.append(file)
+        return read_file(file)
+
+    parsed_cache = cache.ParsedFileCache(tmp_path / "cache")
+    file, = create_files(tmp_path, 1)
+
+    assert parsed_cache.load(file, "test-1", read_function)["Value"].tolist() == [0.0]
+    assert parsed_cache.load(file, "test-1", read_function)["Value"].tolist() == [0.0]
+    assert len(parsed) == 1
+
+    # A different size
+    with open(file, "a") as f:
+        f.write("1\n")
+
+    assert parsed_cache.load(file, "test-1", read_function)["Value"].tolist() == [0.0, 1.0]
+    assert len(parsed) == 2
+
+    # The same size with a different modification time
+    with open(file, "w") as f:
+        f.write("2\n3\n")
+
+    stat = os.stat(file)
+    os.utime(file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    assert parsed_cache.load(file, "test-1", read_function)["Value"].tolist() == [2.0, 3.0]
+    assert len(parsed) == 3
+
+    # A new parser version
+    parsed_cache.load(file, "test-2", read_function)
+    assert len(parsed) == 4
+
+    parsed_cache.load(file, "test-2", read_function)
+    assert len(parsed) == 4
+
+
+def test_cache_evicts_least_recently_used_entries(tmp_path):
+    parsed_cache = cache.ParsedFileCache(tmp_path / "cache")
+    files = create_files(tmp_path, 3)
+
+    for file in files:
+        parsed_cache.load(file, "test-1", read_file)
+
+    paths = [parsed_cache.path(parsed_cache.key(file, "test-1")) for file in files]
+
+    # The first entry is the oldest, then it is used again so the second entry is the least recently used
+    for i, path in enumerate(paths):
+        os.utime(path, ns=(10**18 + i, 10**18 + i))
+
+    assert parsed_cache.get(files[0], "test-1") is not None
+
+    sizes = [path.stat().st_size for path in paths]
+    parsed_cache.max_size = sum(sizes) - 1
+    parsed_cache.evict()
+
+    assert [path.exists() for path in paths] == [True, False, True]
+
+    # Storing a new entry evicts the least recently used entries until the cache fits again
+    (tmp_path / "new").mkdir()
+    file, = create_files(tmp_path / "new", 1)
+
+    # The new entry has the same size as the evicted one, so only one more entry fits
+    parsed_cache.max_size = sizes[0] + sizes[1] + sizes[2] - 1
+    parsed_cache.load(file, "test-1", read_file)
+
+    assert not paths[2].exists()
+    assert paths[0].exists()
+    assert parsed_cache.get(file, "test-1") is not None
+
+
+def test_cache_does_not_evict_within_max_size(tmp_path):
+    parsed_cache = cache.ParsedFileCache(tmp_path / "cache")
+
+    for file in create_files(tmp_path, 3):
+        parsed_cache.load(file, "test-1", read_file)
+
+    assert len(list((tmp_path / "cache").glob(f"*.{cache.CACHE_FORMAT}"))) == 3
@@ -0,0 +1,224 @@
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pytest
+import data_analysis as da
+
+
+def per_curve_contour_length_differences(df):
+    # The original implementation, looping over the curves, with the curves in name order so the rows can be compared
+    rows = []
+
+    for filename in sorted(set(df["Filename"])):
+        df_filename = df[df["Filename"] == filename].sort_values(by=["Index"])
+
+        for i in range(1, len(df_filename)):
+            rows.append([filename, df_filename["Contour Length [nm]"].iloc[i] - df_filename["Contour Length [nm]"].iloc[i - 1]])
+
+    return pd.DataFrame(rows, columns=["Filename", "Contour Length Difference [nm]"])
+
+
+def create_segments(num_curves=200, seed=0):
+    rng = np.random.default_rng(seed)
+
+    # Between one and six segments per curve, so some curves have a single segment and no differences
+    segments_per_curve = rng.integers(1, 7, num_curves)
+    filenames = np.repeat([f"force-save-{i}.jpk-force" for i in range(num_curves)], segments_per_curve)
+    indices = np.concatenate([rng.permutation(count) for count in segments_per_curve])
+
+    # Shuffled so the segments of the curves are interleaved and their indices unsorted
+    order = rng.permutation(len(filenames))
+
+    return pd.DataFrame({
+        "Filename": pd.Categorical(filenames[order]),
+        "Index": indices[order].astype(np.int32),
+        "Contour Length [nm]": rng.uniform(300, 5000, len(filenames)),
+    })
+
+
+def test_contour_length_differences_match_per_curve_loop():
+    df = create_segments()
+
+    [(actual, file)] = da.get_contour_length_differences([(df, "20240101-VFB-M.tsv")])
+    expected = per_curve_contour_length_differences(df)
+
+    assert file == "20240101-VFB-M.tsv"
+    assert len(actual) == len(df) - df["Filename"].nunique()
+    pd.testing.assert_frame_equal(actual.astype({"Filename": object}), expected.astype({"Filename": object}), check_exact=True)
+
+
+def test_contour_length_differences_of_single_segment_curves_are_empty():
+    df = pd.DataFrame({"Filename": pd.Categorical(["a", "b", "c"]), "Index": [0, 0, 0], "Contour Length [nm]": [1.0, 2.0, 3.0]})
+
+    [(actual, _)] = da.get_contour_length_differences([(df, "20240101-VFB-M.tsv")])
+
+    assert len(actual) == 0
+    assert list(actual.columns) == ["Filename", "Contour Length Difference [nm]"]
+
+
+def test_sweep_by_file_matches_sweep_of_each_file(chain_fit_files):
+    thresholds = ([4000, 2000], [20], [5000, 1000], [300], [25, 50])
+
+    sweep_df = da.sweep_chain_fit(chain_fit_files, *thresholds, by_file=True)
+
+    for file in chain_fit_files:
+        file_df = da.sweep_chain_fit([file], *thresholds)
+        rows = sweep_df[sweep_df["File"] == Path(file).stem].drop(columns="File").reset_index(drop=True)
+
+        pd.testing.assert_frame_equal(rows, file_df)
+
+
+def mask_interaction_counts(df, min_position_threshold):
+    # The original counts, one mask per interaction class
+    segments = df["Fitted Segment Count"]
+    position = df["Minimum Position [nm]"]
+
+    no_interaction = (segments == 0).sum()
+    non_specific = ((segments == 1) & (position < min_position_threshold)).sum()
+    specific = ((segments > 1) | ((segments == 1) & (position >= min_position_threshold))).sum()
+
+    return [no_interaction, specific, non_specific]
+
+
+def create_general_data(rows=500, seed=0):
+    rng = np.random.default_rng(seed)
+
+    df = pd.DataFrame({
+        "Fitted Segment Count": pd.array(rng.integers(0, 4, rows), dtype="Int32"),
+        "Minimum Position [nm]": rng.uniform(0, 600, rows),
+    })
+
+    # Missing counts and positions, and positions on the threshold
+    df.loc[::11, "Fitted Segment Count"] = pd.NA
+    df.loc[::7, "Minimum Position [nm]"] = np.nan
+    df.loc[::13, "Minimum Position [nm]"] = 300.0
+
+    return df
+
+
+def test_interaction_counts_match_masks():
+    df = create_general_data()
+
+    classes = da.classify_interactions(df, 300)
+    segments = df["Fitted Segment Count"].astype(float)
+    position = df["Minimum Position [nm]"]
+
+    assert da.count_interactions(classes).tolist() == mask_interaction_counts(df.assign(**{"Fitted Segment Count": segments}), 300)
+
+    # Curves with a missing count, or a single segment without a position, have no class
+    unclassified = segments.isna() | ((segments == 1) & position.isna())
+    assert ((classes == -1) == unclassified.to_numpy()).all()
+    assert (classes[((segments == 1) & (position == 300.0)).to_numpy()] == da.SPECIFIC).all()
+
+
+def test_curves_without_class_are_kept_but_not_counted(tmp_path):
+    file = tmp_path / "20240101-G-M.txt"
+    file.write_text(
+        "Adhesion [N]\tArea [J]\tMinimum Position [m]\tFitted Segment Count\n"
+        "1e-11\t1e-18\t1e-6\t0\n"
+        "1e-11\t1e-18\t1e-6\t\n"
+        "1e-11\t1e-18\tNaN\t1\n"
+        "1e-11\t1e-18\t1e-6\t2\n"
+        "1e-11\t1e-18\t1e-8\t1\n"
+    )
+
+    filtered_data, interaction_count_df = da.analyse_general([str(file)], 300)
+    (filtered_df, _), = filtered_data
+
+    assert len(filtered_df) == 4
+    assert filtered_df["Interaction Class"].isna().sum() == 2
+    assert interaction_count_df.iloc[0, 1:4].tolist() == [1, 1, 1]
+
+
+def per_category_fitting_segment_counts(filtered_data, num_categories):
+    # The original implementation, with one comparison per category
+    index = [str(i) for i in range(1, num_categories)] + [f"≥{num_categories}"]
+    columns = [pd.Series(index, index=index)]
+
+    for df, file in filtered_data:
+        num_fitting_segments = df["Filename"].value_counts()
+        counts = [(num_fitting_segments == i).sum() for i in range(1, num_categories)] + [(num_fitting_segments >= num_categories).sum()]
+        columns.append(pd.Series(counts, index=index, name=Path(file).stem))
+
+    return pd.concat(columns, axis=1)
+
+
+def create_fitting_segments_data(seed=0):
+    rng = np.random.default_rng(seed)
+    filtered_data = []
+
+    for region in ["M", "E", "CD"]:
+        # Up to 12 segments per curve, above the largest category
+        segments = rng.integers(1, 13, 40)
+        filenames = np.repeat([f"force-save-{i}.jpk-force" for i in range(len(segments))], segments)
+        filtered_data.append((pd.DataFrame({"Filename": pd.Categorical(rng.permutation(filenames))}), f"20240101-VFB-{region}.tsv"))
+
+    filtered_data.append((pd.DataFrame({"Filename": pd.Categorical([])}), "20240102-VFB-M.tsv"))
+
+    return filtered_data
+
+
+@pytest.mark.parametrize("num_categories", [1, 2, 5, 8, 12, 20])
+def test_fitting_segment_counts_match_per_category_loop(num_categories):
+    filtered_data = create_fitting_segments_data()
+
+    dictionary, count_df = da.count_fitting_segments(filtered_data, num_categories)
+    expected_df = per_category_fitting_segment_counts(filtered_data, num_categories)
+
+    pd.testing.assert_frame_equal(count_df, expected_df)
+    assert list(dictionary) == ["20240101-VFB-M", "20240101-VFB-E", "20240101-VFB-CD", "20240102-VFB-M"]
+    assert count_df.iloc[:, 1:].sum().tolist() == [40, 40, 40, 0]
+
+
+def create_parameter_data():
+    # Files of different lengths, one of them empty, with a missing value
+    return [
+        (pd.DataFrame({"Area [aJ]": [1.0, 2.0, 3.0], "Adhesion [pN]": [10.0, np.nan, 30.0]}), "exports/20240101-G-M.txt"),
+        (pd.DataFrame({"Area [aJ]": [4.0], "Adhesion [pN]": [40.0]}), "exports/20240101-G-E.txt"),
+        (pd.DataFrame({"Area [aJ]": pd.Series(dtype=float), "Adhesion [pN]": pd.Series(dtype=float)}), "exports/20240102-G-CD.txt"),
+    ]
+
+
+def test_compile_parameter_pads_columns_with_nan():
+    parameters_dict, parameters_df = da.compile_parameter(create_parameter_data(), ["Area [aJ]", "Adhesion [pN]"])
+
+    expected_df = pd.DataFrame({
+        "20240101-Area [aJ]-M": [1.0, 2.0, 3.0],
+        "20240101-Adhesion [pN]-M": [10.0, np.nan, 30.0],
+        "20240101-Area [aJ]-E": [4.0, np.nan, np.nan],
+        "20240101-Adhesion [pN]-E": [40.0, np.nan, np.nan],
+        "20240102-Area [aJ]-CD": [np.nan] * 3,
+        "20240102-Adhesion [pN]-CD": [np.nan] * 3,
+    })
+
+    pd.testing.assert_frame_equal(parameters_df, expected_df)
+    assert list(parameters_dict) == list(expected_df.columns)
+    np.testing.assert_array_equal(parameters_dict["20240101-Area [aJ]-E"], [4.0])
+
+
+def test_compile_parameter_tidy():
+    _, wide_df = da.compile_parameter(create_parameter_data(), ["Area [aJ]", "Adhesion [pN]"])
+    parameters_dict, tidy_df = da.compile_parameter(create_parameter_data(), ["Area [aJ]", "Adhesion [pN]"], tidy=True)
+
+    expected_df = pd.DataFrame({
+        "Sample": ["20240101"] * 8,
+        "Region": ["M"] * 6 + ["E"] * 2,
+        "Parameter": ["Area [aJ]"] * 3 + ["Adhesion [pN]"] * 3 + ["Area [aJ]", "Adhesion [pN]"],
+        "Value": [1.0, 2.0, 3.0, 10.0, np.nan, 30.0, 4.0, 40.0],
+    })
+
+    pd.testing.assert_frame_equal(tidy_df, expected_df)
+
+    # Only the padding is left out, missing values stay
+    assert len(tidy_df) == sum(len(values) for values in parameters_dict.values())
+    assert tidy_df["Value"].isna().sum() == wide_df.iloc[:, :2].isna().sum().sum()
+
+
+def test_compile_parameter_without_files():
+    parameters_dict, parameters_df = da.compile_parameter([], "Breaking Force [pN]")
+    _, tidy_df = da.compile_parameter([], "Breaking Force [pN]", tidy=True)
+
+    assert parameters_dict == {}
+    assert parameters_df.empty
+    assert list(tidy_df.columns) == ["Sample", "Region", "Parameter", "Value"]
+    assert tidy_df.empty
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+import fitting
+import reader
+
+BENDING_LENGTHS = [50e-12, 400e-12, 2000e-12]
+CONTOUR_LENGTHS = [500e-9, 1500e-9, 4000e-9]
+
+
+@pytest.mark.parametrize("model", ["wlc", "fjc"])
+def test_fit_recovers_simulated_parameters(model):
+    segments_df = fitting.simulate_segments(BENDING_LENGTHS, CONTOUR_LENGTHS, model=model)
+
+    chain_fit_df = fitting.fit_segment_frame(segments_df, model=model)
+
+    assert list(chain_fit_df.columns) == fitting.CHAIN_FIT_COLUMNS
+    assert chain_fit_df["Filename"].tolist() == ["curve-0", "curve-1", "curve-2"]
+    np.testing.assert_allclose(chain_fit_df["Bending Length [m]"], BENDING_LENGTHS, rtol=1e-3)
+    np.testing.assert_allclose(chain_fit_df["Contour Length [m]"], CONTOUR_LENGTHS, rtol=1e-3)
+    assert (chain_fit_df["Residual RMS [N]"] < 1e-15).all()
+
+    # The segments break at their largest extension
+    np.testing.assert_allclose(chain_fit_df["Breaking Force [N]"], segments_df.groupby("Filename", observed=True)["Force [N]"].last().to_numpy())
+
+
+@pytest.mark.parametrize("model", ["wlc", "fjc"])
+def test_fit_with_noise_is_close(model):
+    segments_df = fitting.simulate_segments(BENDING_LENGTHS, CONTOUR_LENGTHS, model=model, noise=1e-12, seed=1)
+
+    chain_fit_df = fitting.fit_segment_frame(segments_df, model=model)
+
+    np.testing.assert_allclose(chain_fit_df["Contour Length [m]"], CONTOUR_LENGTHS, rtol=0.05)
+    np.testing.assert_allclose(chain_fit_df["Residual RMS [N]"], 1e-12, rtol=0.5)
+
+
+def test_segments_with_fewer_than_three_points_are_nan():
+    segments_df = fitting.simulate_segments(BENDING_LENGTHS[:1], CONTOUR_LENGTHS[:1])
+    short_df = pd.DataFrame({
+        "Filename": ["short-curve"] * 2,
+        "Index": [0, 0],
+        "Extension [m]": [1e-7, 2e-7],
+        "Force [N]": [1e-12, 2e-12],
+    })
+    segments_df = pd.concat([short_df, segments_df.astype({"Filename": object})], ignore_index=True)
+
+    chain_fit_df = fitting.fit_segment_frame(segments_df)
+
+    assert chain_fit_df["Filename"].tolist() == ["short-curve", "curve-0"]
+    assert chain_fit_df.iloc[0, 2:].isna().all()
+    assert chain_fit_df.iloc[1, 2:].notna().all()
+
+
+def test_segments_are_identified_by_filename_and_index():
+    segments_df = fitting.simulate_segments(BENDING_LENGTHS + BENDING_LENGTHS[:1], CONTOUR_LENGTHS + CONTOUR_LENGTHS[:1])
+
+    # Two curves with two segments each, whose points are interleaved
+    segments_df["Filename"] = pd.Categorical(np.repeat(["curve-a", "curve-a", "curve-b", "curve-b"], 100))
+    segments_df["Index"] = np.repeat([0, 1, 1, 0], 100).astype(np.int32)
+    segments_df = segments_df.iloc[np.argsort(np.tile(np.arange(100), 4), kind="stable")].reset_index(drop=True)
+
+    chain_fit_df = fitting.fit_segment_frame(segments_df, batch_size=3)
+
+    assert list(zip(chain_fit_df["Filename"], chain_fit_df["Index"])) == [("curve-a", 0), ("curve-a", 1), ("curve-b", 1), ("curve-b", 0)]
+    np.testing.assert_allclose(chain_fit_df["Contour Length [m]"], CONTOUR_LENGTHS + CONTOUR_LENGTHS[:1], rtol=1e-3)
+
+
+def test_empty_frame():
+    segments_df = pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in reader.SEGMENT_SCHEMA.items()})
+
+    chain_fit_df = fitting.fit_segment_frame(segments_df)
+
+    assert list(chain_fit_df.columns) == fitting.CHAIN_FIT_COLUMNS
+    assert len(chain_fit_df) == 0
+
+
+def test_points_without_filename_are_left_out():
+    segments_df = fitting.simulate_segments(BENDING_LENGTHS[:2], CONTOUR_LENGTHS[:2])
+    segments_df["Filename"] = segments_df["Filename"].astype(object)
+    segments_df.loc[segments_df.index[::7], "Filename"] = None
+
+    chain_fit_df = fitting.fit_segment_frame(segments_df)
+
+    assert chain_fit_df["Filename"].tolist() == ["curve-0", "curve-1"]
+    np.testing.assert_allclose(chain_fit_df["Contour Length [m]"], CONTOUR_LENGTHS[:2], rtol=1e-3)
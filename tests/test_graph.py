@@ -0,0 +1,146 @@
+import numpy as np
+import pytest
+import graph
+
+REGIONS = ["M", "E", "CD"]
+
+
+def create_breaking_forces(samples=("20240101", "20240102"), seed=0):
+    rng = np.random.default_rng(seed)
+
+    # Values below 0 and above the upper bound are outside of the bins
+    return {f"{sample}-Breaking Force [pN]-{region}": rng.uniform(-100, 800, 50 + 10 * i) for i, sample in enumerate(samples) for region in REGIONS}
+
+
+@pytest.mark.parametrize("bins", [np.arange(0, 500, 20), np.arange(0, 500, 7), np.array([0.0, 1.0]), np.array([0.0])])
+def test_bin_values_matches_numpy_histogram(bins):
+    values = np.concatenate([np.random.default_rng(0).uniform(-100, 800, 200), bins, [np.nan]])
+
+    counts, total = graph.bin_values(list(values), bins)
+
+    np.testing.assert_array_equal(counts, np.histogram(values, bins=bins)[0])
+    assert total == len(values)
+
+
+@pytest.fixture
+def rendered(monkeypatch):
+    # The figures are collected instead of drawn
+    figures = []
+    monkeypatch.setattr(graph, "render_figures", lambda new_figures, *args, **kwargs: figures.extend(new_figures))
+    return figures
+
+
+def test_histograms_root_final_adds_up_samples(rendered, tmp_path):
+    dictionary = create_breaking_forces()
+
+    graph.create_histograms_root(dictionary, tmp_path, 500)
+
+    binned = {args[1]: args[0] for _, args, _ in rendered}
+    bins = np.arange(0, 500, 20)
+
+    assert set(binned) == {"20240101-Count", "20240101-Frequency", "20240102-Count", "20240102-Frequency", "Final Count", "Final Frequency"}
+
+    for region in REGIONS:
+        values = [dictionary[f"{sample}-Breaking Force [pN]-{region}"] for sample in ("20240101", "20240102")]
+
+        for sample, sample_values in zip(("20240101", "20240102"), values):
+            counts, total = binned[f"{sample}-Count"][region]
+            np.testing.assert_array_equal(counts, np.histogram(sample_values, bins=bins)[0])
+            assert total == len(sample_values)
+
+        counts, total = binned["Final Count"][region]
+        np.testing.assert_array_equal(counts, np.histogram(np.concatenate(values), bins=bins)[0])
+        assert total == sum(len(sample_values) for sample_values in values)
+
+
+def test_histograms_root_skips_incomplete_samples(rendered, tmp_path):
+    dictionary = create_breaking_forces()
+    del dictionary["20240102-Breaking Force [pN]-E"]
+
+    graph.create_histograms_root(dictionary, tmp_path, 500)
+
+    binned = {args[1]: args[0] for _, args, _ in rendered}
+
+    assert "20240102-Count" not in binned
+    np.testing.assert_array_equal(binned["Final Count"]["M"][0], binned["20240101-Count"]["M"][0])
+
+
+def test_frequency_is_divided_by_every_value(monkeypatch, tmp_path):
+    figures = []
+
+    class RecordedFigure(graph.Figure):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            figures.append(self)
+
+    monkeypatch.setattr(graph, "Figure", RecordedFigure)
+
+    bins = np.array([0.0, 10.0, 20.0])
+    # Half of the values are outside of the bins, so the bars add up to 0.5
+    values = [5.0, 15.0, 15.0, 16.0, -5.0, 25.0, 30.0, 40.0]
+    binned = {region: graph.bin_values(values, bins) for region in REGIONS}
+
+    graph.create_histogram_set(binned, "Frequency", "Frequency", str(tmp_path), "Breaking Force (pN)", bins)
+
+    figure, = figures
+
+    for axis in figure.axes:
+        heights = [patch.get_height() for patch in axis.patches]
+        np.testing.assert_allclose(heights, [1 / 8, 3 / 8])
+
+    assert (tmp_path / "Frequency.svg").exists()
+
+
+# The names of the figures drawn by draw_figure
+drawn = []
+
+
+def draw_figure(data, filename, directory):
+    # Stands in for a figure function, recording which figures were drawn
+    drawn.append(filename)
+    (directory / f"{filename}.svg").write_text(str(data))
+
+
+def create_figures(tmp_path, first=(1, 2), second=(3, 4)):
+    drawn.clear()
+
+    return [
+        (draw_figure, (np.array(first), "first", tmp_path), {}),
+        (draw_figure, (np.array(second), "second", tmp_path), {}),
+    ]
+
+
+def test_render_figures_skips_unchanged(tmp_path):
+    graph.render_figures(create_figures(tmp_path), tmp_path, skip_unchanged=True)
+    assert drawn == ["first", "second"]
+    assert (tmp_path / graph.MANIFEST_NAME).exists()
+
+    graph.render_figures(create_figures(tmp_path, second=(3, 5)), tmp_path, skip_unchanged=True)
+    assert drawn == ["second"]
+
+    graph.render_figures(create_figures(tmp_path, second=(3, 5)), tmp_path, skip_unchanged=True)
+    assert drawn == []
+
+
+def test_render_figures_redraws_deleted_figure(tmp_path):
+    graph.render_figures(create_figures(tmp_path), tmp_path, skip_unchanged=True)
+    (tmp_path / "first.svg").unlink()
+
+    graph.render_figures(create_figures(tmp_path), tmp_path, skip_unchanged=True)
+    assert drawn == ["first"]
+
+
+def test_render_figures_redraws_after_version_change(tmp_path, monkeypatch):
+    graph.render_figures(create_figures(tmp_path), tmp_path, skip_unchanged=True)
+
+    monkeypatch.setattr(graph, "GRAPH_VERSION", graph.GRAPH_VERSION + 1)
+
+    graph.render_figures(create_figures(tmp_path), tmp_path, skip_unchanged=True)
+    assert drawn == ["first", "second"]
+
+
+def test_render_figures_draws_everything_without_skip(tmp_path):
+    graph.render_figures(create_figures(tmp_path), tmp_path)
+
+    graph.render_figures(create_figures(tmp_path), tmp_path)
+    assert drawn == ["first", "second"]
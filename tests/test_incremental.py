@@ -0,0 +1,64 @@
+import json
+import incremental as inc
+import pipeline
+
+THRESHOLDS = (4000, 20, 5000, 300, 25)
+
+
+def filtered_files(directory, name="filtered_chain_fits_data", pattern="*_filtered.csv"):
+    return sorted(path.name for path in (directory / name).glob(pattern))
+
+
+def test_filtered_data_saved_when_selected_after_an_earlier_run(tmp_path, chain_fit_files):
+    output = tmp_path / "results"
+
+    pipeline.run_chain_fit(chain_fit_files, str(output), *THRESHOLDS, incremental=True, save_breaking_forces=True)
+    assert filtered_files(output) == []
+
+    pipeline.run_chain_fit(chain_fit_files, str(output), *THRESHOLDS, incremental=True, save_breaking_forces=True, save_filtered_data=True)
+    assert len(filtered_files(output)) == len(chain_fit_files)
+
+
+def test_deleted_filtered_file_is_written_again(tmp_path, chain_fit_files):
+    output = tmp_path / "results"
+
+    pipeline.run_chain_fit(chain_fit_files, str(output), *THRESHOLDS, incremental=True, save_filtered_data=True)
+
+    deleted = output / "filtered_chain_fits_data" / filtered_files(output)[0]
+    deleted.unlink()
+
+    pipeline.run_chain_fit(chain_fit_files, str(output), *THRESHOLDS, incremental=True, save_filtered_data=True)
+    assert deleted.exists()
+
+
+def test_general_filtered_data_saved_when_selected_after_an_earlier_run(tmp_path, general_files):
+    output = tmp_path / "results"
+
+    pipeline.run_general(general_files, str(output), 300, incremental=True, save_interaction_count=True)
+    pipeline.run_general(general_files, str(output), 300, incremental=True, save_filtered_data=True)
+
+    assert len(filtered_files(output, "filtered_general_data")) == len(general_files)
+
+
+def test_results_of_deselected_files_are_pruned(tmp_path, chain_fit_files):
+    output = tmp_path / "results"
+    store_directory = output / pipeline.RESULT_STORE_DIRECTORY / "chain_fit"
+
+    pipeline.run_chain_fit(chain_fit_files, str(output), *THRESHOLDS, incremental=True, save_breaking_forces=True)
+    pipeline.run_chain_fit(chain_fit_files[:1], str(output), *THRESHOLDS, incremental=True, save_breaking_forces=True)
+
+    store = inc.ResultStore(store_directory)
+
+    assert list(json.loads((store_directory / inc.INDEX_NAME).read_text())) == [store.entry_name(chain_fit_files[0])]
+    assert not store.path(chain_fit_files[1]).exists()
+
+
+def test_changing_the_output_format_saves_every_file_again(tmp_path, chain_fit_files):
+    output = tmp_path / "results"
+
+    pipeline.run_chain_fit(chain_fit_files, str(output), *THRESHOLDS, incremental=True, save_filtered_data=True)
+    pipeline.run_chain_fit(chain_fit_files, str(output), *THRESHOLDS, incremental=True, save_filtered_data=True, output_format="parquet")
+    assert len(filtered_files(output, pattern="*_filtered.parquet")) == len(chain_fit_files)
+
+    pipeline.run_chain_fit(chain_fit_files, str(output), *THRESHOLDS, incremental=True, save_filtered_data=True, output_format="partitioned")
+    assert len(list((output / "filtered_chain_fits_data" / "filtered.parquet").glob("Sample=*/part-*.parquet"))) == len(chain_fit_files)
@@ -0,0 +1,21 @@
+import pytest
+import pipeline
+
+THRESHOLDS = (4000, 20, 5000, 300, 25)
+
+
+@pytest.mark.parametrize("stream_files", [False, True])
+def test_products_of_run_saving_segment_counts_are_ready(chain_fit_files, tmp_path, stream_files):
+    products = pipeline.run_chain_fit(chain_fit_files, str(tmp_path / "output"), *THRESHOLDS, stream_files=stream_files, save_count_num_fitting_segments=True)
+
+    assert products.is_ready("breaking_forces")
+    assert products.is_ready("fitting_segments")
+    assert not products.is_computed("breaking_forces")
+    assert len(products.get("breaking_forces")[0]) == len(chain_fit_files)
+
+
+def test_products_of_run_saving_nothing_are_not_ready(chain_fit_files, tmp_path):
+    products = pipeline.run_chain_fit(chain_fit_files, str(tmp_path / "output"), *THRESHOLDS)
+
+    assert not products.is_ready("filtered_data")
+    assert not products.is_ready("breaking_forces")
@@ -0,0 +1,98 @@
+import threading
+import tracemalloc
+import jobs
+import profiling
+
+
+def setup_function():
+    profiling.reset()
+
+
+def teardown_function():
+    profiling.disable()
+    profiling.reset()
+
+
+def test_stage_records_memory_on_main_thread():
+    profiling.enable()
+
+    with profiling.stage("allocate", rows_in=3) as stage:
+        data = [bytearray(1024) for _ in range(1000)]
+        stage.rows_out = len(data)
+
+    record, = profiling.get_records()
+
+    assert record["rows_in"] == 3
+    assert record["rows_out"] == 1000
+    assert record["peak_memory"] >= 1000 * 1024
+    assert record["arrow_memory"] is not None
+
+
+def test_stage_in_other_thread_does_not_reset_main_thread_peak():
+    profiling.enable()
+
+    def write():
+        with profiling.stage("write"):
+            pass
+
+    with profiling.stage("allocate"):
+        data = [bytearray(1024) for _ in range(1000)]
+        del data
+
+        # The peak of the main thread stage is kept although another thread runs a stage after it was reached
+        thread = threading.Thread(target=write)
+        thread.start()
+        thread.join()
+
+    records = {record["stage"]: record for record in profiling.get_records()}
+
+    assert records["write"]["peak_memory"] is None
+    assert records["write"]["arrow_memory"] is None
+    assert records["allocate"]["peak_memory"] >= 1000 * 1024
+
+    rows = {row[0]: row for row in profiling.summarise()}
+
+    assert rows["write"][5] is None
+    assert rows["allocate"][5] >= 1000 * 1024 / 1024**2
+    assert "write" in profiling.format_report()
+
+
+def test_disable_keeps_tracing_started_by_caller():
+    tracemalloc.start()
+
+    try:
+        profiling.enable()
+        profiling.disable()
+
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+
+def test_disable_stops_tracing_started_by_enable():
+    assert not tracemalloc.is_tracing()
+
+    profiling.enable()
+    profiling.disable()
+
+    assert not tracemalloc.is_tracing()
+
+
+def test_stage_in_job_records_memory():
+    profiling.enable()
+
+    def allocate(job):
+        with profiling.stage("allocate"):
+            data = [bytearray(1024) for _ in range(1000)]
+
+        return len(data)
+
+    job = jobs.Job(allocate).start()
+    job._thread.join()
+
+    assert job.status == "done"
+
+    record, = profiling.get_records()
+
+    assert record["peak_memory"] >= 1000 * 1024
+    assert record["arrow_memory"] is not None
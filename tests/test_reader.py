@@ -0,0 +1,61 @@
+import pytest
+import reader
+
+CHAIN_FIT_HEADER = "\t".join(reader.CHAIN_FIT_SCHEMA)
+GENERAL_HEADER = "\t".join(column for column in reader.GENERAL_SCHEMA if column != "Filename")
+
+
+def write_text(path, text):
+    path.write_text(text)
+    return str(path)
+
+
+def test_chain_fit_export_reads_schema_types(tmp_path):
+    file = write_text(tmp_path / "20240101-VFB-M.tsv", f"Extra\t{CHAIN_FIT_HEADER}\nx\tcurve-1\t0\t1e-10\t2e-8\t1e-12\t1e-10\n")
+
+    df = reader.read_chain_fit_export(file)
+
+    assert list(df.columns) == list(reader.CHAIN_FIT_SCHEMA)
+    assert df["Filename"].dtype == "category"
+    assert df["Index"].dtype == "Int32"
+    assert df["Breaking Force [N]"].dtype == "float64"
+
+
+def test_chain_fit_export_without_filename_raises_value_error(tmp_path):
+    header = "\t".join(column for column in reader.CHAIN_FIT_SCHEMA if column != "Filename")
+    file = write_text(tmp_path / "20240101-VFB-M.tsv", f"{header}\n0\t1e-10\t2e-8\t1e-12\t1e-10\n")
+
+    with pytest.raises(ValueError, match="missing the columns: Filename"):
+        reader.read_chain_fit_export(file)
+
+
+def test_general_export_without_filename(tmp_path):
+    file = write_text(tmp_path / "20240101-G-M.txt", f"{GENERAL_HEADER}\n1e-10\t1e-18\t1e-8\t2\n")
+
+    df = reader.read_general_export(file)
+
+    assert list(df.columns) == [column for column in reader.GENERAL_SCHEMA if column != "Filename"]
+    assert len(df) == 1
+
+
+def test_general_export_chunks_without_filename(tmp_path):
+    file = write_text(tmp_path / "20240101-G-M.txt", f"{GENERAL_HEADER}\n" + "1e-10\t1e-18\t1e-8\t2\n" * 5)
+
+    chunks = list(reader.read_general_export(file, chunksize=2))
+
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert "Filename" not in chunks[0].columns
+
+
+def test_missing_integer_values_are_read_as_nullable_integers(tmp_path):
+    chain_fit_file = write_text(tmp_path / "20240101-VFB-M.tsv", f"{CHAIN_FIT_HEADER}\ncurve-1\t\t1e-10\t2e-8\t1e-12\t1e-10\ncurve-1\t1\t1e-10\t2e-8\t1e-12\t1e-10\n")
+    general_file = write_text(tmp_path / "20240101-G-M.txt", f"{GENERAL_HEADER}\n1e-10\t1e-18\t1e-8\t\n1e-10\t1e-18\t1e-8\t2\n")
+
+    for df, column in ((reader.read_chain_fit_export(chain_fit_file), "Index"), (reader.read_general_export(general_file), "Fitted Segment Count")):
+        assert df[column].dtype == "Int32"
+        assert df[column].isna().tolist() == [True, False]
+
+    chunks = list(reader.read_chain_fit_export(chain_fit_file, chunksize=1))
+
+    assert [chunk["Index"].dtype for chunk in chunks] == ["Int32", "Int32"]
+    assert chunks[0]["Index"].isna().all()
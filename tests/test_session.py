@@ -0,0 +1,109 @@
+import os
+import pickle
+import numpy as np
+import data_analysis as da
+import session
+
+
+def test_least_recently_used_values_are_evicted():
+    store = session.DatasetStore(max_memory=300)
+
+    for key in "abc":
+        store.put(key, np.zeros(10), size=100)
+
+    # Reading a makes b the least recently used value
+    assert store.get("a") is not None
+
+    store.put("d", np.zeros(10), size=100)
+
+    assert store.get("b") is None
+    assert all(store.get(key) is not None for key in "acd")
+    assert store.memory == 300
+
+    # A value replacing another one only counts once
+    store.put("a", np.zeros(10), size=50)
+    assert store.memory == 250
+
+    store.set_max_memory(150)
+    assert len(store) == 2
+    assert store.get("c") is None
+
+
+def test_values_larger_than_the_limit_are_not_stored():
+    store = session.DatasetStore(max_memory=100)
+    store.put("a", np.zeros(10), size=50)
+    store.put("b", np.zeros(1000))
+
+    assert store.get("b") is None
+    assert store.get("a") is not None
+    assert store.memory == 50
+
+
+def test_sizes_are_estimated():
+    assert session.estimate_size(np.zeros(10)) == 80
+    assert session.estimate_size([np.zeros(10), (np.zeros(5), {"a": np.zeros(1)})]) == 128
+
+
+def test_file_key_changes_with_the_file(tmp_path):
+    file = tmp_path / "20240101-VFB-M.tsv"
+    file.write_text("a")
+
+    key = session.DatasetStore.file_key(file, "chain_fit-1")
+
+    assert session.DatasetStore.file_key(str(file), "chain_fit-1") == key
+    assert session.DatasetStore.file_key(file, "chain_fit-2") != key
+
+    stat = os.stat(file)
+    os.utime(file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    assert session.DatasetStore.file_key(file, "chain_fit-1") != key
+
+
+def test_result_key_depends_on_files_and_settings(chain_fit_files):
+    key = session.DatasetStore.result_key("chain_fit", chain_fit_files, "chain_fit-1", {"a": 1.0, "b": 2.0})
+
+    assert session.DatasetStore.result_key("chain_fit", chain_fit_files, "chain_fit-1", {"b": 2.0, "a": 1.0}) == key
+    assert session.DatasetStore.result_key("chain_fit", chain_fit_files, "chain_fit-1", {"a": 1.0, "b": 3.0}) != key
+    assert session.DatasetStore.result_key("chain_fit", chain_fit_files[:2], "chain_fit-1", {"a": 1.0, "b": 2.0}) != key
+    assert session.DatasetStore.result_key("general", chain_fit_files, "chain_fit-1", {"a": 1.0, "b": 2.0}) != key
+
+    stat = os.stat(chain_fit_files[0])
+    os.utime(chain_fit_files[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    assert session.DatasetStore.result_key("chain_fit", chain_fit_files, "chain_fit-1", {"a": 1.0, "b": 2.0}) != key
+
+
+def test_preload_skips_stored_files(chain_fit_files):
+    store = session.DatasetStore()
+    loaded = []
+    progress = []
+
+    def load(file, cache):
+        loaded.append(file)
+        return da.load_chain_fit_file(file, cache)
+
+    store.preload(chain_fit_files[:2], da.CHAIN_FIT_PARSER, load)
+    assert loaded == chain_fit_files[:2]
+
+    loaded.clear()
+    store.preload(chain_fit_files, da.CHAIN_FIT_PARSER, load, progress=progress.append)
+
+    assert loaded == chain_fit_files[2:]
+    assert sorted(progress) == sorted(chain_fit_files)
+    assert len(store) == 3
+
+    # The stored dataframes are returned without parsing the files again
+    loaded.clear()
+    df = store.load(chain_fit_files[0], da.CHAIN_FIT_PARSER, lambda file: loaded.append(file))
+    assert loaded == []
+    assert "Breaking Force [pN]" in df.columns
+
+
+def test_store_sent_to_another_process_is_empty():
+    store = session.DatasetStore(max_memory=1000)
+    store.put("a", np.zeros(10))
+
+    copy = pickle.loads(pickle.dumps(store))
+
+    assert copy.max_memory == 1000
+    assert len(copy) == 0
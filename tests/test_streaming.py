@@ -0,0 +1,75 @@
+import pandas as pd
+import pytest
+import data_analysis as da
+import writer
+
+THRESHOLDS = (4000, 20, 5000, 300, 25)
+
+# Smaller than the files, so curves and the saved data are split across chunks
+CHUNKSIZE = 7
+
+
+def read_saved(path, output_format):
+    df = pd.read_parquet(path) if output_format in ("parquet", "partitioned") else pd.read_csv(path)
+
+    # The categories of the chunks differ from those of the whole file
+    return df.astype({column: object for column in df.columns if isinstance(df[column].dtype, pd.CategoricalDtype)})
+
+
+@pytest.mark.parametrize("apply_filter", [True, False])
+def test_stream_chain_fit_matches_in_memory(chain_fit_files, apply_filter):
+    keep_columns = ["Filename", "Index", "Breaking Force [pN]"]
+
+    filtered_data = da.analyse_chain_fit(chain_fit_files, *THRESHOLDS, apply_filter=apply_filter)
+    kept_data, dictionary, count_df = da.stream_chain_fit(chain_fit_files, *THRESHOLDS, apply_filter=apply_filter, keep_columns=keep_columns, chunksize=CHUNKSIZE)
+
+    assert [file for _, file in kept_data] == chain_fit_files
+
+    for (kept_df, _), (filtered_df, _) in zip(kept_data, filtered_data):
+        pd.testing.assert_frame_equal(kept_df.astype({"Filename": object}), filtered_df[keep_columns].reset_index(drop=True).astype({"Filename": object}))
+
+    expected_dictionary, expected_count_df = da.count_fitting_segments(filtered_data)
+
+    pd.testing.assert_frame_equal(count_df, expected_count_df)
+    assert dictionary.keys() == expected_dictionary.keys()
+
+
+def test_stream_general_matches_in_memory(general_files):
+    keep_columns = ["Filename", "Area [aJ]", "Adhesion [pN]", "Interaction Class"]
+
+    filtered_data, interaction_count_df = da.analyse_general(general_files, 300)
+    kept_data, streamed_count_df = da.stream_general(general_files, 300, keep_columns=keep_columns, chunksize=CHUNKSIZE)
+
+    for (kept_df, _), (filtered_df, _) in zip(kept_data, filtered_data):
+        pd.testing.assert_frame_equal(kept_df.astype({"Filename": object}), filtered_df[keep_columns].reset_index(drop=True).astype({"Filename": object}))
+
+    pd.testing.assert_frame_equal(streamed_count_df, interaction_count_df)
+
+
+@pytest.mark.parametrize("output_format", list(writer.FORMATS))
+def test_streamed_chain_fit_output_matches_in_memory(chain_fit_files, tmp_path, output_format):
+    filtered_data = da.analyse_chain_fit(chain_fit_files, *THRESHOLDS)
+    da.save_filtered_dfs(filtered_data, tmp_path / "in_memory", output_format)
+
+    da.stream_chain_fit(chain_fit_files, *THRESHOLDS, directory=tmp_path / "streamed", chunksize=CHUNKSIZE, output_format=output_format)
+
+    for file in chain_fit_files:
+        expected = read_saved(writer.output_path(tmp_path / "in_memory", file, output_format=output_format), output_format)
+        actual = read_saved(writer.output_path(tmp_path / "streamed", file, output_format=output_format), output_format)
+
+        assert len(actual) > CHUNKSIZE
+        pd.testing.assert_frame_equal(actual, expected)
+
+
+@pytest.mark.parametrize("output_format", list(writer.FORMATS))
+def test_streamed_general_output_matches_in_memory(general_files, tmp_path, output_format):
+    filtered_data, _ = da.analyse_general(general_files, 300)
+    da.save_filtered_dfs(filtered_data, tmp_path / "in_memory", output_format)
+
+    da.stream_general(general_files, 300, directory=tmp_path / "streamed", chunksize=CHUNKSIZE, output_format=output_format)
+
+    for file in general_files:
+        expected = read_saved(writer.output_path(tmp_path / "in_memory", file, output_format=output_format), output_format)
+        actual = read_saved(writer.output_path(tmp_path / "streamed", file, output_format=output_format), output_format)
+
+        pd.testing.assert_frame_equal(actual, expected)
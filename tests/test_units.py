@@ -0,0 +1,24 @@
+import pandas as pd
+import pytest
+import units
+
+
+def test_change_column_prefix_returns_renamed_copy():
+    data = pd.DataFrame({"Breaking Force [N]": [1e-12, 2e-12], "Index": [0, 1]})
+
+    converted = units.change_column_prefix(data, "Breaking Force [N]", "p")
+
+    assert list(converted.columns) == ["Breaking Force [pN]", "Index"]
+    assert list(data.columns) == ["Breaking Force [N]", "Index"]
+    assert converted["Breaking Force [pN]"].tolist() == [1.0, 2.0]
+
+
+def test_change_column_prefixes_renames_in_place():
+    data = pd.DataFrame({"Contour Length [m]": [1e-9], "Area [J]": [2e-18], "Index": [0]})
+
+    converted = units.change_column_prefixes(data, {"Contour Length [m]": "n", "Area [J]": "a"})
+
+    assert converted is data
+    assert list(data.columns) == ["Contour Length [nm]", "Area [aJ]", "Index"]
+    assert data.iloc[0].tolist() == pytest.approx([1.0, 2.0, 0.0])
+
@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+import pytest
+import uv_vis
+
+WAVELENGTHS = np.arange(300.0, 801.0, 2.0)
+
+
+def gaussian(wavelengths, center, height, width):
+    return height * np.exp(-0.5 * ((wavelengths - center) / width) ** 2)
+
+
+def create_spectra(wavelengths=WAVELENGTHS):
+    # Two wells with known silver and methylene blue peaks, on a constant and on a sloped baseline
+    peaks = [
+        gaussian(wavelengths, 421.3, 1.0, 20) + gaussian(wavelengths, 664.6, 0.5, 12),
+        gaussian(wavelengths, 410.0, 0.8, 15) + gaussian(wavelengths, 660.0, 0.3, 12),
+    ]
+    baselines = [np.full(len(wavelengths), 0.1), 0.05 + 1e-4 * (wavelengths - 300)]
+
+    return np.vstack(peaks), np.vstack(baselines)
+
+
+def test_constant_baseline_is_the_window_mean():
+    peaks, baselines = create_spectra()
+    absorbance = peaks + baselines[0]
+    absorbance[0, -1] = np.nan
+
+    corrected, baseline = uv_vis.correct_baseline(WAVELENGTHS, absorbance)
+
+    np.testing.assert_allclose(baseline, 0.1, atol=1e-9)
+    np.testing.assert_allclose(corrected[:, :-1], peaks[:, :-1], atol=1e-9)
+
+
+def test_linear_baseline_through_several_windows():
+    peaks, baselines = create_spectra()
+
+    corrected, baseline = uv_vis.correct_baseline(WAVELENGTHS, peaks + baselines, windows=((300, 320), (750, 800)))
+
+    np.testing.assert_allclose(baseline, baselines, atol=1e-5)
+    np.testing.assert_allclose(corrected, peaks, atol=1e-5)
+
+
+def test_find_peaks_refines_positions():
+    peaks, _ = create_spectra()
+
+    positions, heights = uv_vis.find_peaks(WAVELENGTHS, peaks, 380, 480)
+    np.testing.assert_allclose(positions, [421.3, 410.0], atol=0.05)
+    np.testing.assert_allclose(heights, [1.0, 0.8], atol=1e-3)
+
+    positions, heights = uv_vis.find_peaks(WAVELENGTHS, peaks, 630, 700)
+    np.testing.assert_allclose(positions, [664.6, 660.0], atol=0.05)
+    np.testing.assert_allclose(heights, [0.5, 0.3], atol=1e-3)
+
+
+def test_find_peaks_without_a_peak_in_range():
+    peaks, _ = create_spectra()
+    peaks[1] = np.nan
+
+    # The highest point of the first spectrum is at the edge of the range, the second has no values
+    positions, heights = uv_vis.find_peaks(WAVELENGTHS, peaks, 430, 480)
+    assert np.isnan(positions).all() and np.isnan(heights).all()
+
+    positions, _ = uv_vis.find_peaks(WAVELENGTHS, peaks, 380, 480)
+    assert np.isfinite(positions[0]) and np.isnan(positions[1])
+
+    positions, heights = uv_vis.find_peaks(WAVELENGTHS, peaks, 900, 1000)
+    assert np.isnan(positions).all() and np.isnan(heights).all()
+
+
+def test_absorbance_at_interpolates_linearly():
+    absorbance = np.vstack([WAVELENGTHS / 100, np.ones(len(WAVELENGTHS))])
+
+    values = uv_vis.absorbance_at(WAVELENGTHS, absorbance, [301.0, 664.0, 800.0, 250.0, 900.0])
+
+    np.testing.assert_allclose(values[:, :3], [[3.01, 6.64, 8.0], [1.0, 1.0, 1.0]])
+    assert np.isnan(values[:, 3:]).all()
+
+
+def test_summarise_spectra():
+    peaks, baselines = create_spectra()
+    spectra_df = pd.DataFrame({uv_vis.WAVELENGTH_COLUMN: WAVELENGTHS, "A1": peaks[0] + baselines[0][0], "A2": peaks[1] + 0.2})
+
+    # The second plate is measured on a finer grid, which is interpolated onto the grid of the first
+    fine_wavelengths = np.arange(300.0, 801.0, 1.0)
+    fine_peaks, _ = create_spectra(fine_wavelengths)
+    fine_df = pd.DataFrame({uv_vis.WAVELENGTH_COLUMN: fine_wavelengths[::-1], "B1": fine_peaks[0][::-1] + 0.1})
+
+    summary_df = uv_vis.summarise_spectra([(spectra_df, "plates/pH5.xlsm"), (fine_df, "plates/pH7.xlsm")])
+
+    assert summary_df["File"].tolist() == ["pH5", "pH5", "pH7"]
+    assert summary_df["Well"].tolist() == ["A1", "A2", "B1"]
+    assert list(summary_df.columns[2:]) == ["Baseline", "Ag Peak [nm]", "Ag Peak Absorbance", "MB Peak [nm]", "MB Peak Absorbance", "A664/A610"]
+
+    np.testing.assert_allclose(summary_df["Baseline"], [0.1, 0.2, 0.1], atol=1e-6)
+    np.testing.assert_allclose(summary_df["Ag Peak [nm]"], [421.3, 410.0, 421.3], atol=0.05)
+    np.testing.assert_allclose(summary_df["MB Peak Absorbance"], [0.5, 0.3, 0.5], atol=1e-3)
+
+    expected_ratio = [
+        (gaussian(664, 664.6, 0.5, 12) + gaussian(664, 421.3, 1.0, 20)) / (gaussian(610, 664.6, 0.5, 12) + gaussian(610, 421.3, 1.0, 20)),
+        (gaussian(664, 660.0, 0.3, 12) + gaussian(664, 410.0, 0.8, 15)) / (gaussian(610, 660.0, 0.3, 12) + gaussian(610, 410.0, 0.8, 15)),
+    ]
+    np.testing.assert_allclose(summary_df["A664/A610"][:2], expected_ratio, rtol=1e-6)
+
+
+def test_summarise_spectra_without_files():
+    summary_df = uv_vis.summarise_spectra([])
+
+    assert summary_df.empty
+    assert "A664/A610" in summary_df.columns
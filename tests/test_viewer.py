@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+import graph
+import viewer
+
+SAMPLES = ["20240101", "20240102"]
+
+
+def create_breaking_forces(seed=0):
+    rng = np.random.default_rng(seed)
+    dictionary = {}
+
+    for sample in SAMPLES:
+        for region in viewer.REGIONS:
+            values = rng.uniform(-50, 700, 200)
+            # Values on the bin edges, on the upper bound and missing values
+            values[:4] = [0, 20, 480, np.nan]
+            dictionary[f"{sample}-Breaking Force [pN]-{region}"] = values
+
+    return dictionary
+
+
+@pytest.mark.parametrize("bin_width, upper_bound", [(20, 500), (7, 500), (50, 1000), (1, 3), (600, 500)])
+def test_histogram_matches_bin_values(bin_width, upper_bound):
+    dictionary = create_breaking_forces()
+    binned_data = viewer.BinnedData(dictionary)
+
+    edges, binned = binned_data.histogram(SAMPLES[0], float(bin_width), float(upper_bound))
+    bins = np.arange(0, upper_bound, bin_width)
+
+    np.testing.assert_array_equal(edges, bins)
+
+    for region in viewer.REGIONS:
+        values = dictionary[f"{SAMPLES[0]}-Breaking Force [pN]-{region}"]
+        counts, total = binned[region]
+
+        if len(bins) < 2:
+            assert len(counts) == 0
+        else:
+            expected_counts, expected_total = graph.bin_values(values, bins)
+
+            np.testing.assert_array_equal(counts, expected_counts)
+            np.testing.assert_array_equal(counts, np.histogram(values, bins=bins)[0])
+            assert total == expected_total
+
+
+def test_final_histogram_combines_samples():
+    dictionary = create_breaking_forces()
+    binned_data = viewer.BinnedData(dictionary)
+
+    _, final = binned_data.histogram(viewer.FINAL, 20.0, 500.0)
+    samples = [binned_data.histogram(sample, 20.0, 500.0)[1] for sample in SAMPLES]
+
+    for region in viewer.REGIONS:
+        np.testing.assert_array_equal(final[region][0], sum(binned[region][0] for binned in samples))
+        assert final[region][1] == sum(binned[region][1] for binned in samples)
+
+
+def test_final_pie_charts_add_up_samples():
+    index = ["1", "2", "3", "4", "≥5"]
+    fitting_segments = {f"{sample}-{region}": pd.Series([i + 1, 2, 0, 1, i], index=index) for i, sample in enumerate(SAMPLES) for region in viewer.REGIONS}
+
+    view = viewer.PlotView(FigureCanvasAgg(Figure()), viewer.BinnedData(create_breaking_forces()), fitting_segments)
+    view.show_pie_charts(viewer.FINAL)
+
+    assert not view.figure.texts
+    assert len(view.axes) == len(viewer.REGIONS)
+    assert view.fitting_segments[viewer.FINAL]["M"].tolist() == [3, 4, 0, 2, 1]
@@ -0,0 +1,83 @@
+import pandas as pd
+import pytest
+import writer
+
+
+def create_chunk(filenames, start):
+    return pd.DataFrame({
+        "Filename": pd.Categorical(filenames),
+        "Index": pd.array(range(start, start + len(filenames)), dtype="Int32"),
+        "Breaking Force [pN]": [float(i) for i in range(start, start + len(filenames))],
+    })
+
+
+CHUNKS = [create_chunk(["a", "b"], 0), create_chunk(["c", "d", "e"], 2), create_chunk(["a"], 5)]
+
+
+def write_chunks(directory, output_format, background=True):
+    with writer.OutputWriter(directory, output_format, background=background) as output_writer:
+        for i, chunk in enumerate(CHUNKS):
+            output_writer.write(chunk, "exports/20240101-VFB-M.tsv", append=i > 0)
+
+    return writer.output_path(directory, "exports/20240101-VFB-M.tsv", output_format=output_format)
+
+
+def expected_data():
+    return pd.concat(CHUNKS, ignore_index=True).astype({"Filename": object})
+
+
+@pytest.mark.parametrize("background", [True, False])
+def test_appended_csv_gz_is_read_back(tmp_path, background):
+    path = write_chunks(tmp_path, "csv.gz", background)
+
+    assert path.name == "20240101-VFB-M_filtered.csv.gz"
+
+    df = pd.read_csv(path, dtype={"Index": "Int32"})
+
+    pd.testing.assert_frame_equal(df.astype({"Filename": object}), expected_data())
+
+
+def test_parquet_chunks_with_different_categories(tmp_path):
+    pytest.importorskip("pyarrow")
+
+    path = write_chunks(tmp_path, "parquet")
+
+    df = pd.read_parquet(path)
+
+    assert isinstance(df["Filename"].dtype, pd.CategoricalDtype)
+    pd.testing.assert_frame_equal(df.astype({"Filename": object}), expected_data())
+
+
+def test_partitioned_parts_are_numbered(tmp_path):
+    pytest.importorskip("pyarrow")
+
+    path = write_chunks(tmp_path, "partitioned")
+
+    assert path == tmp_path / "filtered.parquet" / "Sample=20240101-VFB-M"
+    assert sorted(part.name for part in path.iterdir()) == ["part-00000.parquet", "part-00001.parquet", "part-00002.parquet"]
+
+    df = pd.read_parquet(path)
+    pd.testing.assert_frame_equal(df.astype({"Filename": object}), expected_data())
+
+    # Writing the file again without appending replaces its parts
+    with writer.OutputWriter(tmp_path, "partitioned") as output_writer:
+        output_writer.write(CHUNKS[0], "exports/20240101-VFB-M.tsv")
+
+    assert [part.name for part in path.iterdir()] == ["part-00000.parquet"]
+
+
+def test_background_error_is_raised_by_close(tmp_path):
+    pyarrow = pytest.importorskip("pyarrow")
+
+    output_writer = writer.OutputWriter(tmp_path, "parquet")
+
+    # Mixed values cannot be converted to an Arrow column, which fails in the writing thread and not in write
+    output_writer.write(pd.DataFrame({"Filename": [1, "a"]}), "exports/20240101-VFB-M.tsv")
+
+    with pytest.raises(pyarrow.ArrowException):
+        output_writer.close()
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError, match="Unknown output format"):
+        writer.OutputWriter(".", "xlsx")
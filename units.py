@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 PREFIXES = {
     "y": 1e-24,
     "z": 1e-21,
@@ -36,20 +38,74 @@ def get_current_units(column_name):
     return ("", "")
 
 
-def change_column_prefix(data, column_name, new_prefix):
+@lru_cache(maxsize=None)
+def compile_prefix_change(column_name, new_prefix):
+    """
+    This function works out the scaling factor and the new column name for changing the prefix of a column. The result is cached so each column name is only parsed once.
+    
+    Parameters:
+    column_name (str): The name of the column including its units in square brackets (ex. Breaking Force [N]).
+    new_prefix (str): The new prefix (ex. p).
+    
+    Returns:
+    (tuple): The scaling factor and the new column name.
+    """
 
     prefix, units = get_current_units(column_name)
 
     factor = PREFIXES[prefix] / PREFIXES[new_prefix]
 
-    data[column_name] *= factor
-
-    # Rename the column
     before = column_name.split("[", 1)[0]
     after = column_name.split("]", 1)[1]
     
     new_column_name = f"{before}[{new_prefix}{units}]{after}"
 
-    data = data.rename(columns={column_name: new_column_name})
+    return factor, new_column_name
+
+
+def change_column_prefixes(data, new_prefixes):
+    """
+    This function changes the prefix of several columns at once. The columns are scaled in place and renamed in a single step without copying the dataframe, so the dataframe passed in is modified: its columns are scaled and its column labels are replaced.
+    
+    Parameters:
+    data (pandas.DataFrame): The dataframe containing the columns. It is modified.
+    new_prefixes (dict): The dictionary containing the column names as keys and the new prefixes as values.
+    
+    Returns:
+    data (pandas.DataFrame): The same dataframe with scaled and renamed columns.
+    """
+
+    new_column_names = {}
+
+    for column_name, new_prefix in new_prefixes.items():
+        factor, new_column_name = compile_prefix_change(column_name, new_prefix)
+
+        if factor != 1:
+            data[column_name] *= factor
+
+        new_column_names[column_name] = new_column_name
+
+    # Replacing the column labels does not touch the underlying data
+    data.columns = [new_column_names.get(column, column) for column in data.columns]
 
     return data
+
+
+def change_column_prefix(data, column_name, new_prefix):
+    """
+    This function changes the prefix of one column. The column is scaled in place, but the column labels of the dataframe passed in are kept: the renamed column is only in the returned dataframe. Use change_column_prefixes to convert several columns without copying.
+    
+    Parameters:
+    data (pandas.DataFrame): The dataframe containing the column.
+    column_name (str): The name of the column including its units in square brackets (ex. Breaking Force [N]).
+    new_prefix (str): The new prefix (ex. p).
+    
+    Returns:
+    data (pandas.DataFrame): A copy of the dataframe with the renamed column.
+    """
+
+    factor, new_column_name = compile_prefix_change(column_name, new_prefix)
+
+    data[column_name] *= factor
+
+    return data.rename(columns={column_name: new_column_name})
@@ -1,17 +1,344 @@
-import pandas as pd
+"""
+Loading and analysis of UV-Vis absorbance spectra exported by the plate reader (Gen5 workbooks).
+
+Only the spectrum block of the first sheet is read, with openpyxl in read-only mode: reading stops at the first empty row after the Wavelength header, so the header, the Results table, the other sheets and the charts are never parsed. Parsed spectra can be cached with cache.ParsedFileCache (as Parquet when pyarrow is installed).
+
+The analysis works on every well of every file at once: the spectra are stacked into one array, baseline corrected, and the peaks and absorbance ratios of all spectra are found with array operations. summarise_spectra returns one row per well.
+
+Example:
+    spectra_data = load_spectra(files, workers=4, cache=cache.ParsedFileCache())
+    summary_df = summarise_spectra(spectra_data)
+"""
+from functools import partial
+from pathlib import Path
 import numpy as np
-import matplotlib.pyplot as plt
+import pandas as pd
 
 FILE_PATH = "MB_pH5,7,9_Ag50ul.xlsm"
 
+# Increase when the way workbooks are read changes so cached spectra are parsed again
+UV_VIS_PARSER_VERSION = 1
+
+WAVELENGTH_COLUMN = "Wavelength [nm]"
+
+# The first cell of the header row of the spectrum block
+HEADER = "Wavelength"
+
+# Wavelength windows [nm] where the samples do not absorb, used to fit the baseline
+DEFAULT_BASELINE_WINDOWS = ((750, 800),)
+
+# Wavelength ranges [nm] searched for peaks: the silver plasmon band and the methylene blue monomer band
+DEFAULT_PEAK_RANGES = {
+    "Ag": (380, 480),
+    "MB": (630, 700),
+}
+
+# Absorbance ratios of the format (numerator wavelength, denominator wavelength) [nm]: methylene blue monomer over dimer
+DEFAULT_RATIOS = ((664, 610),)
+
+
+def read_spectra_file(file, sheet=None):
+    """
+    This function reads the spectrum block of a plate reader workbook.
+
+    Parameters:
+    file (str): The workbook to read (.xlsx or .xlsm).
+    sheet (str): The name of the sheet holding the spectra. Uses the first sheet when this is None.
+
+    Returns:
+    df (pandas.DataFrame): The Wavelength [nm] column followed by one absorbance column per well. Values that are not numbers (ex. OVRFLW) are NaN.
+    """
+
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True, keep_links=False)
+
+    try:
+        worksheet = workbook.worksheets[0] if sheet is None else workbook[sheet]
+
+        header = None
+        rows = []
+
+        for row in worksheet.iter_rows(values_only=True):
+            if header is None:
+                if row and row[0] == HEADER:
+                    header = row
+                continue
+
+            # The spectrum block ends at the first empty row
+            if not row or row[0] is None:
+                break
+
+            rows.append(row)
+    finally:
+        workbook.close()
+
+    if header is None:
+        raise ValueError(f"{file} has no spectrum block starting with a {HEADER} header")
+
+    # Trailing empty header cells are columns outside the block
+    width = max(i for i, name in enumerate(header) if name is not None) + 1
+    columns = [WAVELENGTH_COLUMN] + [str(name) for name in header[1:width]]
+
+    df = pd.DataFrame([row[:width] for row in rows], columns=columns)
+
+    return df.apply(pd.to_numeric, errors="coerce").astype("float64")
+
+
+def load_spectra_file(file, cache=None, sheet=None):
+    """
+    This function returns the spectra of a workbook, from the cache when possible.
+
+    Parameters:
+    file (str): The workbook to load.
+    cache (cache.ParsedFileCache): The cache of parsed files. The workbook is always read when this is None.
+    sheet (str): The name of the sheet holding the spectra. Uses the first sheet when this is None.
+
+    Returns:
+    df (pandas.DataFrame): The spectra, as returned by read_spectra_file.
+    """
+
+    read_function = partial(read_spectra_file, sheet=sheet)
+
+    if cache is None:
+        return read_function(file)
+
+    parser = f"uv_vis-{UV_VIS_PARSER_VERSION}" if sheet is None else f"uv_vis-{UV_VIS_PARSER_VERSION}-{sheet}"
+
+    return cache.load(file, parser, read_function)
+
+
+def load_spectra(files, workers=1, cache=None, sheet=None, progress=None):
+    """
+    This function loads the spectra of several workbooks, in parallel when more than one worker is requested.
+
+    Parameters:
+    files (list): The list of workbooks.
+    workers (int): The number of worker processes used to read the workbooks.
+    cache (cache.ParsedFileCache): The cache of parsed files. The workbooks are always read when this is None.
+    sheet (str): The name of the sheet holding the spectra. Uses the first sheet when this is None.
+    progress (callable): Called with each workbook once it has been loaded.
+
+    Returns:
+    spectra_data (list): The list of spectra of the format (dataframe, file).
+    """
+
+    import data_analysis as da
+
+    files = list(files)
+
+    dfs = da.map_files(partial(load_spectra_file, cache=cache, sheet=sheet), files, workers, progress)
+
+    return list(zip(dfs, files))
+
+
+def stack_spectra(spectra_data):
+    """
+    This function stacks the wells of every file into one array. Spectra measured on a different wavelength grid than the first file are interpolated onto it.
+
+    Parameters:
+    spectra_data (list): The list of spectra of the format (dataframe, file).
+
+    Returns:
+    wavelengths (numpy.ndarray): The common wavelengths [nm].
+    absorbance (numpy.ndarray): The absorbance of shape (spectra, wavelengths).
+    labels_df (pandas.DataFrame): The File and Well of each spectrum.
+    """
+
+    if not spectra_data:
+        return np.array([]), np.empty((0, 0)), pd.DataFrame({"File": [], "Well": []})
+
+    wavelengths = spectra_data[0][0][WAVELENGTH_COLUMN].to_numpy()
+
+    blocks = []
+    files = []
+    wells = []
+
+    for df, file in spectra_data:
+        well_columns = [column for column in df.columns if column != WAVELENGTH_COLUMN]
+        block = df[well_columns].to_numpy(dtype=float).T
+
+        file_wavelengths = df[WAVELENGTH_COLUMN].to_numpy()
+
+        if len(file_wavelengths) != len(wavelengths) or not np.allclose(file_wavelengths, wavelengths):
+            order = np.argsort(file_wavelengths)
+            block = np.vstack([np.interp(wavelengths, file_wavelengths[order], spectrum[order], left=np.nan, right=np.nan) for spectrum in block])
+
+        blocks.append(block)
+        files += [Path(file).stem] * len(well_columns)
+        wells += well_columns
+
+    labels_df = pd.DataFrame({"File": files, "Well": wells})
+
+    return wavelengths, np.vstack(blocks), labels_df
+
+
+def correct_baseline(wavelengths, absorbance, windows=DEFAULT_BASELINE_WINDOWS):
+    """
+    This function subtracts a baseline from every spectrum. The baseline is the mean absorbance in the windows when there is one window, and the least squares line through the points of the windows when there are several.
+
+    Parameters:
+    wavelengths (numpy.ndarray): The wavelengths [nm].
+    absorbance (numpy.ndarray): The absorbance of shape (spectra, wavelengths).
+    windows (tuple): The wavelength windows [nm] of the format ((start, stop), ...).
+
+    Returns:
+    corrected (numpy.ndarray): The baseline corrected absorbance.
+    baseline (numpy.ndarray): The baseline at each wavelength, of the same shape.
+    """
+
+    in_window = np.zeros(len(wavelengths), dtype=bool)
+
+    for start, stop in windows:
+        in_window |= (wavelengths >= start) & (wavelengths <= stop)
+
+    points = np.where(in_window & np.isfinite(absorbance), 1.0, 0.0)
+    values = np.where(points > 0, absorbance, 0.0)
+    count = points.sum(axis=1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_absorbance = values.sum(axis=1) / count
+
+        if len(windows) < 2:
+            baseline = np.broadcast_to(mean_absorbance[:, None], absorbance.shape)
+        else:
+            # Closed form least squares line of every spectrum at once
+            mean_wavelength = (points * wavelengths).sum(axis=1) / count
+            dx = np.where(points > 0, wavelengths - mean_wavelength[:, None], 0.0)
+            slope = (dx * (values - mean_absorbance[:, None])).sum(axis=1) / (dx**2).sum(axis=1)
+
+            baseline = mean_absorbance[:, None] + slope[:, None] * (wavelengths - mean_wavelength[:, None])
+
+    return absorbance - baseline, baseline
+
+
+def find_peaks(wavelengths, absorbance, start, stop):
+    """
+    This function finds the highest point of every spectrum within a wavelength range. The position is refined by fitting a parabola through the highest point and its neighbours.
+
+    Parameters:
+    wavelengths (numpy.ndarray): The wavelengths [nm], in increasing order.
+    absorbance (numpy.ndarray): The absorbance of shape (spectra, wavelengths).
+    start (float): The start of the range [nm].
+    stop (float): The end of the range [nm].
+
+    Returns:
+    positions (numpy.ndarray): The wavelength of each peak [nm]. NaN when the highest point is at either end of the range (the spectrum has no peak there) or the spectrum has no values in the range.
+    heights (numpy.ndarray): The absorbance at each peak.
+    """
+
+    in_range = np.flatnonzero((wavelengths >= start) & (wavelengths <= stop))
+
+    if len(in_range) == 0:
+        nan = np.full(len(absorbance), np.nan)
+        return nan, nan.copy()
+
+    window = absorbance[:, in_range]
+    finite = np.isfinite(window).any(axis=1)
+
+    highest = np.argmax(np.where(np.isfinite(window), window, -np.inf), axis=1)
+    rows = np.arange(len(window))
+
+    positions = wavelengths[in_range][highest].astype(float)
+    heights = window[rows, highest]
+
+    # Parabolic interpolation, only where the highest point has a neighbour on both sides
+    inner = (highest > 0) & (highest < len(in_range) - 1)
+    left = window[rows, np.maximum(highest - 1, 0)]
+    right = window[rows, np.minimum(highest + 1, len(in_range) - 1)]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        curvature = left - 2 * heights + right
+        offset = np.where(inner & (curvature < 0), 0.5 * (left - right) / curvature, 0.0)
+
+    offset = np.where(np.isfinite(offset), offset, 0.0)
+    spacing = np.gradient(wavelengths[in_range])[highest] if len(in_range) > 1 else 0.0
+
+    positions = positions + offset * spacing
+    heights = heights - 0.25 * (left - right) * offset
+
+    found = finite & inner
+
+    return np.where(found, positions, np.nan), np.where(found, heights, np.nan)
+
+
+def absorbance_at(wavelengths, absorbance, targets):
+    """
+    This function interpolates the absorbance of every spectrum at the target wavelengths.
+
+    Parameters:
+    wavelengths (numpy.ndarray): The wavelengths [nm], in increasing order.
+    absorbance (numpy.ndarray): The absorbance of shape (spectra, wavelengths).
+    targets (list): The target wavelengths [nm].
+
+    Returns:
+    values (numpy.ndarray): The absorbance of shape (spectra, targets). NaN outside the measured range.
+    """
+
+    targets = np.asarray(targets, dtype=float)
+
+    if len(wavelengths) == 0:
+        return np.full((absorbance.shape[0], len(targets)), np.nan)
+
+    # Fractional position of each target on the wavelength grid, shared by every spectrum
+    position = np.interp(targets, wavelengths, np.arange(len(wavelengths)), left=np.nan, right=np.nan)
+    inside = np.isfinite(position)
+
+    lower = np.clip(np.floor(np.where(inside, position, 0)).astype(np.int64), 0, max(len(wavelengths) - 2, 0))
+    upper = np.minimum(lower + 1, len(wavelengths) - 1)
+    weight = np.where(inside, position, 0) - lower
+
+    values = absorbance[:, lower] * (1 - weight) + absorbance[:, upper] * weight
+
+    return np.where(inside, values, np.nan)
+
+
+def summarise_spectra(spectra_data, baseline_windows=DEFAULT_BASELINE_WINDOWS, peak_ranges=DEFAULT_PEAK_RANGES, ratios=DEFAULT_RATIOS):
+    """
+    This function baseline corrects every well of every file and finds their peaks and absorbance ratios.
+
+    Parameters:
+    spectra_data (list): The list of spectra of the format (dataframe, file).
+    baseline_windows (tuple): The wavelength windows [nm] used to fit the baseline, see correct_baseline. No baseline is subtracted when this is empty.
+    peak_ranges (dict): The wavelength ranges [nm] searched for peaks, of the format {name: (start, stop)}.
+    ratios (tuple): The absorbance ratios of the format ((numerator wavelength, denominator wavelength), ...) [nm].
+
+    Returns:
+    summary_df (pandas.DataFrame): One row per well with the File, the Well, the Baseline (the mean of the subtracted baseline), the <name> Peak [nm] and <name> Peak Absorbance of each peak range and the A<numerator>/A<denominator> ratios, computed on the corrected spectra.
+    """
+
+    wavelengths, absorbance, summary_df = stack_spectra(spectra_data)
+
+    if baseline_windows:
+        absorbance, baseline = correct_baseline(wavelengths, absorbance, baseline_windows)
+        summary_df["Baseline"] = baseline.mean(axis=1) if baseline.size else np.array([])
+    else:
+        summary_df["Baseline"] = 0.0
+
+    for name, (start, stop) in peak_ranges.items():
+        positions, heights = find_peaks(wavelengths, absorbance, start, stop)
+        summary_df[f"{name} Peak [nm]"] = positions
+        summary_df[f"{name} Peak Absorbance"] = heights
+
+    if ratios:
+        targets = [wavelength for ratio in ratios for wavelength in ratio]
+        values = absorbance_at(wavelengths, absorbance, targets)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for i, (numerator, denominator) in enumerate(ratios):
+                summary_df[f"A{numerator:g}/A{denominator:g}"] = values[:, 2 * i] / values[:, 2 * i + 1]
+
+    return summary_df
+
+
 if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+
     # Load the data
-    df = pd.read_excel(FILE_PATH, header=30, skipfooter=5)
+    df = read_spectra_file(FILE_PATH)
+
+    df.plot(x=WAVELENGTH_COLUMN, y=['A1', 'A2'], kind='line', xlabel='Wavelength (nm)', ylabel='Absorbance', title='UV-Vis Spectrum', xlim=(300,800))
 
-    df.plot(x='Wavelength', y=['A1', 'A2'], kind='line', xlabel='Wavelength (nm)', ylabel='Absorbance', title='UV-Vis Spectrum', xlim=(300,800))
-    
     plt.legend(labels = ['Label 1', 'Label 2'])
-    
+
     plt.show()
-    
-    
@@ -0,0 +1,323 @@
+"""
+Interactive view of the chain fit histograms and pie charts inside the app window.
+
+The breaking forces of each sample and root region are sorted once, after which the histogram of any bin width and x-axis bound is counted with a binary search, without reading or filtering the data again. Each histogram is a single StepPatch whose data is replaced when the bins change. When the axis limits stay the same, only the patches are redrawn onto a saved background (blitting). Otherwise the figure is drawn again with the same artists.
+"""
+from functools import lru_cache
+import tkinter as tk
+from tkinter import ttk
+import numpy as np
+from matplotlib.figure import Figure
+import graph
+
+REGIONS = ["M", "E", "CD"]
+LEGEND_NAMES = {"M": "Maturation", "E": "Elongation", "CD": "Cell Division"}
+COLORS = ["red", "cyan", "yellow"]
+
+# Name of the sample combining every sample
+FINAL = "Final"
+
+HISTOGRAMS = "Breaking Force Histograms"
+PIE_CHARTS = "Fitting Segment Pie Charts"
+
+
+def nice_upper_limit(value):
+    """
+    This function rounds an axis limit up to 1, 2 or 5 times a power of ten, so small changes of the data keep the same limit.
+
+    Parameters:
+    value (float): The largest value shown on the axis.
+
+    Returns:
+    limit (float): The rounded limit.
+    """
+
+    if not np.isfinite(value) or value <= 0:
+        return 1.0
+
+    magnitude = 10 ** np.floor(np.log10(value))
+
+    for step in (1, 2, 5, 10):
+        if value <= step * magnitude:
+            return step * magnitude
+
+
+class BinnedData:
+    """
+    The breaking forces of each sample and root region, sorted once so histograms of any bins can be counted from them. The counts of the bins used are kept.
+
+    Parameters:
+    dictionary (dict): The breaking forces of each file, as returned by data_analysis.compile_parameter. The names must end with -M, -E or -CD.
+    """
+
+    def __init__(self, dictionary):
+        names = graph.create_sub_dictionaries(dictionary)
+
+        self.samples = {}
+
+        for name, regions in names.items():
+            # Like the saved histograms, only samples with all three regions are shown
+            if all(region in regions for region in REGIONS):
+                self.samples[name] = {region: np.sort(np.asarray(regions[region], dtype=float)) for region in REGIONS}
+
+        if self.samples:
+            self.samples[FINAL] = {region: np.sort(np.concatenate([sample[region] for sample in self.samples.values()])) for region in REGIONS}
+
+        self.histogram = lru_cache(maxsize=64)(self._histogram)
+
+    def _histogram(self, sample, bin_width, upper_bound):
+        """
+        This function counts the values of a sample in the bins of the saved histograms (edges from 0 to the upper bound in steps of the bin width).
+
+        Parameters:
+        sample (str): The name of the sample, or FINAL for every sample.
+        bin_width (float): The width of the bins.
+        upper_bound (float): The upper bound of the x-axis.
+
+        Returns:
+        edges (numpy.ndarray): The edges of the bins.
+        binned (dict): The counts and total number of values of each region, of the format {region: (counts, total)} as returned by graph.bin_values.
+        """
+
+        edges = np.arange(0, upper_bound, bin_width)
+
+        binned = {}
+
+        for region, values in self.samples[sample].items():
+            if len(edges) < 2:
+                binned[region] = (np.zeros(0, dtype=np.int64), values.size)
+                continue
+
+            # Bins include their left edge, and the last bin its right edge too, like numpy.histogram
+            positions = np.searchsorted(values, edges, side="left")
+            positions[-1] = np.searchsorted(values, edges[-1], side="right")
+
+            binned[region] = (np.diff(positions), values.size)
+
+        return edges, binned
+
+
+class PlotView:
+    """
+    Draws the histograms or pie charts of a sample on a figure canvas, updating the existing artists when only the bins or the x-axis bound change.
+
+    Parameters:
+    canvas (matplotlib.backend_bases.FigureCanvasBase): The canvas of the figure to draw on.
+    binned_data (BinnedData): The breaking forces of each sample.
+    fitting_segments (dict): The fitting segment counts of each file, as returned by data_analysis.count_fitting_segments.
+    """
+
+    def __init__(self, canvas, binned_data, fitting_segments=None):
+        self.canvas = canvas
+        self.figure = canvas.figure
+        self.binned_data = binned_data
+        self.fitting_segments = graph.create_sub_dictionaries(fitting_segments or {})
+
+        # Like the histograms, the Final pie charts add up the samples with all three regions
+        complete = [regions for regions in self.fitting_segments.values() if all(region in regions for region in REGIONS)]
+
+        if complete:
+            self.fitting_segments[FINAL] = {region: sum(regions[region] for regions in complete) for region in REGIONS}
+
+        self.chart = None
+        self.pie_sample = None
+        self.axes = []
+        self.patches = []
+        self.background = None
+        self.full_draws = 0
+        self.blits = 0
+
+        self.canvas.mpl_connect("draw_event", self._on_draw)
+
+    def _on_draw(self, event):
+        # The background is saved without the animated patches, which are then drawn on top of it
+        if self.patches and self.canvas.supports_blit:
+            self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+            self._draw_patches()
+
+    def _draw_patches(self):
+        for axis, patch in zip(self.axes, self.patches):
+            axis.draw_artist(patch)
+
+    def _create_histogram_axes(self):
+        self.figure.clear()
+        self.axes = list(self.figure.subplots(3, 1))
+        self.patches = []
+
+        for axis, region, color in zip(self.axes, REGIONS, COLORS):
+            patch = axis.stairs([0], [0, 1], fill=True, color=color, edgecolor="black", label=LEGEND_NAMES[region], animated=self.canvas.supports_blit)
+            self.patches.append(patch)
+            axis.legend(loc="upper right")
+            axis.set_xlabel("Breaking Force (pN)")
+
+        self.figure.tight_layout()
+
+    def show_histograms(self, sample, bin_width=20, upper_bound=500, y_label="Count"):
+        """
+        This function shows the breaking force histograms of a sample. When the histograms are already shown, only the changed artists and limits are updated.
+
+        Parameters:
+        sample (str): The name of the sample, or FINAL for every sample.
+        bin_width (float): The width of the bars.
+        upper_bound (float): The upper bound of the x-axis.
+        y_label (str): Either Count or Frequency.
+        """
+
+        if self.chart != HISTOGRAMS:
+            self._create_histogram_axes()
+            self.chart = HISTOGRAMS
+            self.background = None
+
+        edges, binned = self.binned_data.histogram(sample, float(bin_width), float(upper_bound))
+
+        heights = {}
+
+        for region, (counts, total) in binned.items():
+            heights[region] = counts if y_label == "Count" else counts / max(total, 1)
+
+        top = nice_upper_limit(max((values.max(initial=0) for values in heights.values()), default=0) * 1.05)
+
+        limits_changed = False
+
+        for axis, patch, region in zip(self.axes, self.patches, REGIONS):
+            if len(edges) >= 2:
+                patch.set_data(heights[region], edges)
+            else:
+                patch.set_data([0], [0, bin_width])
+
+            if axis.get_xlim() != (0, upper_bound) or axis.get_ylim() != (0, top) or axis.get_ylabel() != y_label:
+                axis.set_xlim(0, upper_bound)
+                axis.set_ylim(0, top)
+                axis.set_ylabel(y_label)
+                limits_changed = True
+
+        if limits_changed or self.background is None:
+            # Ticks and labels change, so the figure is drawn again with the same artists
+            self.full_draws += 1
+            self.canvas.draw()
+        else:
+            self.blits += 1
+            self.canvas.restore_region(self.background)
+            self._draw_patches()
+            self.canvas.blit(self.figure.bbox)
+
+    def show_pie_charts(self, sample):
+        """
+        This function shows the fitting segment pie charts of a sample.
+
+        Parameters:
+        sample (str): The name of the sample.
+        """
+
+        # The pie charts do not depend on the bins
+        if self.chart == PIE_CHARTS and self.pie_sample == sample:
+            return
+
+        self.chart = PIE_CHARTS
+        self.pie_sample = sample
+        self.patches = []
+        self.background = None
+
+        self.figure.clear()
+
+        regions = self.fitting_segments.get(sample, {})
+
+        if not all(region in regions for region in REGIONS):
+            self.figure.text(0.5, 0.5, f"No fitting segment counts for {sample}", ha="center")
+        else:
+            self.axes = list(self.figure.subplots(3, 1))
+
+            for axis, region in zip(self.axes, REGIONS):
+                axis.pie(regions[region], autopct='%1.1f', startangle=90)
+                axis.set_title(LEGEND_NAMES[region])
+                graph.create_custom_pie_chart_legend(axis, regions[region])
+
+            self.figure.tight_layout()
+
+        self.full_draws += 1
+        self.canvas.draw()
+
+
+class PlotViewer(tk.Frame):
+    """
+    A page of the app showing the histograms and pie charts of the last chain fit run. The bin width and the x-axis bound can be changed without running the analysis again.
+
+    Parameters:
+    plot_data (pipeline.Products): The products returned by pipeline.run_chain_fit, or None before the first run. The breaking forces and fitting segment counts are computed from the data the run kept if it did not need them.
+    """
+
+    def __init__(self, *args, plot_data=None, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # The files are only read by runs saving at least one output. Streamed runs keep the filtered data they read, whichever output was saved.
+        if plot_data is None or not plot_data.is_ready("breaking_forces") or not plot_data.is_ready("fitting_segments") or not plot_data.get("breaking_forces")[0]:
+            tk.Label(self, text="Run the chain fit analysis to view its histograms and pie charts here.", wraplength=400).pack(pady=20)
+            self.view = None
+            return
+
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+        binned_data = BinnedData(plot_data.get("breaking_forces")[0])
+        samples = list(binned_data.samples)
+
+        if not samples:
+            tk.Label(self, text="The histograms need files ending with -M, -E and -CD for each sample.", wraplength=400).pack(pady=20)
+            self.view = None
+            return
+
+        controls = tk.Frame(self)
+        controls.pack(fill=tk.X)
+
+        self.chart = ttk.Combobox(controls, values=[HISTOGRAMS, PIE_CHARTS], state="readonly", width=28)
+        self.chart.set(HISTOGRAMS)
+        self.chart.grid(row=0, column=0, columnspan=2)
+
+        self.sample = ttk.Combobox(controls, values=samples, state="readonly", width=14)
+        self.sample.set(samples[-1])
+        self.sample.grid(row=0, column=2, columnspan=2)
+
+        self.y_label = ttk.Combobox(controls, values=["Count", "Frequency"], state="readonly", width=10)
+        self.y_label.set("Count")
+        self.y_label.grid(row=1, column=0)
+
+        tk.Label(controls, text="Bin Width:").grid(row=1, column=1)
+        self.bin_width = tk.Spinbox(controls, from_=1, to=1000, increment=5, width=6, command=self.update_view)
+        self.bin_width.delete(0, tk.END)
+        self.bin_width.insert(0, "20")
+        self.bin_width.grid(row=1, column=2)
+
+        tk.Label(controls, text="X-Axis Upper Bound:").grid(row=2, column=0, columnspan=2)
+        self.upper_bound = tk.Spinbox(controls, from_=10, to=100000, increment=50, width=8, command=self.update_view)
+        self.upper_bound.delete(0, tk.END)
+        self.upper_bound.insert(0, "500")
+        self.upper_bound.grid(row=2, column=2)
+
+        for combobox in (self.chart, self.sample, self.y_label):
+            combobox.bind("<<ComboboxSelected>>", lambda event: self.update_view())
+
+        for spinbox in (self.bin_width, self.upper_bound):
+            spinbox.bind("<Return>", lambda event: self.update_view())
+            spinbox.bind("<FocusOut>", lambda event: self.update_view())
+
+        figure = Figure(figsize=(4.8, 6.6), dpi=100)
+        canvas = FigureCanvasTkAgg(figure, master=self)
+        canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+
+        self.view = PlotView(canvas, binned_data, plot_data.get("fitting_segments")[0])
+
+        self.update_view()
+
+    def update_view(self):
+        try:
+            bin_width = float(self.bin_width.get())
+            upper_bound = float(self.upper_bound.get())
+        except ValueError:
+            return
+
+        if bin_width <= 0 or upper_bound <= 0:
+            return
+
+        if self.chart.get() == PIE_CHARTS:
+            self.view.show_pie_charts(self.sample.get())
+        else:
+            self.view.show_histograms(self.sample.get(), bin_width, upper_bound, self.y_label.get())
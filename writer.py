@@ -0,0 +1,187 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import profiling
+
+# Output formats and the extensions of the files they write
+FORMATS = {
+    "csv": ".csv",
+    "csv.gz": ".csv.gz",
+    "parquet": ".parquet",
+    "partitioned": ".parquet",
+}
+
+DEFAULT_FORMAT = "csv"
+
+# Number of dataframes waiting to be written before write blocks, so a slow disk cannot hold every result in memory
+DEFAULT_MAX_PENDING = 4
+
+
+def output_path(directory, file, suffix="filtered", output_format=DEFAULT_FORMAT):
+    """
+    This function returns the path the data of a file is saved to. The partitioned format writes every file into one dataset, partitioned by sample (the file name without its extension).
+
+    Parameters:
+    directory (str): The directory to save the data in.
+    file (str): The file the data was read from.
+    suffix (str): The suffix added to the file name (ex. filtered).
+    output_format (str): The output format, one of FORMATS.
+
+    Returns:
+    path (pathlib.Path): The path of the saved data. For the partitioned format this is the directory of the partition.
+    """
+
+    if output_format not in FORMATS:
+        raise ValueError(f"Unknown output format {output_format}, expected one of: {', '.join(FORMATS)}")
+
+    if output_format == "partitioned":
+        return Path(directory) / f"{suffix}{FORMATS[output_format]}" / f"Sample={Path(file).stem}"
+
+    return Path(directory) / f"{Path(file).stem}_{suffix}{FORMATS[output_format]}"
+
+
+def to_arrow_table(df):
+    """
+    This function converts a dataframe to an Arrow table whose schema does not depend on the number of categories, so chunks of the same file can be written to one Parquet file.
+
+    Parameters:
+    df (pandas.DataFrame): The dataframe to convert.
+
+    Returns:
+    table (pyarrow.Table): The Arrow table.
+    """
+
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+
+    # Categorical codes are stored with the smallest integer type that fits, which differs between chunks
+    schema = pa.schema(
+        [field.with_type(pa.dictionary(pa.int32(), field.type.value_type)) if pa.types.is_dictionary(field.type) else field for field in table.schema],
+        metadata=table.schema.metadata,
+    )
+
+    return table.cast(schema)
+
+
+class OutputWriter:
+    """
+    Writes one dataframe per input file in the selected format. Writes happen in a background thread in the order they were requested, so the next file can be analyzed while the previous one is written. Errors raised while writing are raised again by close.
+
+    Parameters:
+    directory (str): The directory to save the data in.
+    output_format (str): The output format, one of FORMATS.
+    suffix (str): The suffix added to the file names (ex. filtered).
+    background (bool): Whether to write in a background thread.
+    max_pending (int): The number of dataframes waiting to be written before write blocks.
+    """
+
+    def __init__(self, directory, output_format=DEFAULT_FORMAT, suffix="filtered", background=True, max_pending=DEFAULT_MAX_PENDING):
+        if output_format not in FORMATS:
+            raise ValueError(f"Unknown output format {output_format}, expected one of: {', '.join(FORMATS)}")
+
+        self.directory = Path(directory)
+        self.output_format = output_format
+        self.suffix = suffix
+        self.max_pending = max_pending
+
+        self._executor = ThreadPoolExecutor(max_workers=1) if background else None
+        self._pending = []
+        self._parquet_writers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def path(self, file):
+        return output_path(self.directory, file, self.suffix, self.output_format)
+
+    def write(self, df, file, append=False):
+        """
+        This function queues a dataframe to be saved as the data of a file.
+
+        Parameters:
+        df (pandas.DataFrame): The dataframe to save.
+        file (str): The file the data was read from.
+        append (bool): Whether to append the dataframe to the data already written for the file in this writer, for example the next chunk of a streamed file.
+        """
+
+        if self._executor is None:
+            self._write(df, file, append)
+            return
+
+        # Wait for the oldest write so at most max_pending dataframes are held in memory
+        while len(self._pending) >= self.max_pending:
+            self._pending.pop(0).result()
+
+        self._pending.append(self._executor.submit(self._write, df, file, append))
+
+    def _write(self, df, file, append):
+        with profiling.stage(f"write_{self.output_format}", file, len(df)):
+            self._write_frame(df, file, append)
+
+    def _write_frame(self, df, file, append):
+        path = self.path(file)
+
+        if self.output_format == "partitioned":
+            import pyarrow.parquet as pq
+
+            # Every write is a new part of the partition of the sample. Parts are numbered so they are read back in order.
+            path.mkdir(parents=True, exist_ok=True)
+
+            parts = sorted(path.glob("part-*.parquet"))
+
+            if not append:
+                for part in parts:
+                    part.unlink()
+                parts = []
+
+            pq.write_table(to_arrow_table(df), path / f"part-{len(parts):05d}.parquet")
+            return
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        if self.output_format == "parquet":
+            import pyarrow.parquet as pq
+
+            table = to_arrow_table(df)
+
+            if not append:
+                self._close_parquet_writer(file)
+                self._parquet_writers[file] = pq.ParquetWriter(path, table.schema)
+
+            self._parquet_writers[file].write_table(table)
+            return
+
+        # Appending to a gzip file adds a new gzip member, which is read back as one file
+        df.to_csv(path, mode="a" if append else "w", header=not append, index=False)
+
+    def _close_parquet_writer(self, file):
+        parquet_writer = self._parquet_writers.pop(file, None)
+
+        if parquet_writer is not None:
+            parquet_writer.close()
+
+    def _close_parquet_writers(self):
+        for file in list(self._parquet_writers):
+            self._close_parquet_writer(file)
+
+    def close(self):
+        """
+        This function waits for the queued dataframes to be written and closes the open files. The first error raised while writing is raised again.
+        """
+
+        try:
+            for future in self._pending:
+                future.result()
+        finally:
+            self._pending = []
+
+            if self._executor is None:
+                self._close_parquet_writers()
+            else:
+                # Parquet writers are only used from the writing thread
+                self._executor.submit(self._close_parquet_writers).result()
+                self._executor.shutdown()
+                self._executor = None